@@ -0,0 +1,32 @@
+import os
+import sys
+import json
+
+import azure.functions as func
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+
+import function_entry  # noqa: E402  (standard library only at import; heavy modules load on first use)
+
+app = func.FunctionApp(http_auth_level=func.AuthLevel.FUNCTION)
+
+def _respond(route, req):
+    try:
+        payload = req.get_json() if req.get_body() else {}
+    except ValueError:
+        return func.HttpResponse(json.dumps({'error': 'body must be JSON'}), status_code=400,
+                                 mimetype="application/json")
+    status, body = function_entry.handle(route, payload)
+    return func.HttpResponse(json.dumps(body), status_code=status, mimetype="application/json")
+
+@app.route(route="portfolio", methods=["POST"])
+def portfolio(req: func.HttpRequest) -> func.HttpResponse:
+    return _respond('portfolio', req)
+
+@app.route(route="predict", methods=["POST"])
+def predict(req: func.HttpRequest) -> func.HttpResponse:
+    return _respond('predict', req)
+
+@app.route(route="health", methods=["GET"], auth_level=func.AuthLevel.ANONYMOUS)
+def health(req: func.HttpRequest) -> func.HttpResponse:
+    return _respond('health', req)
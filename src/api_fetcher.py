@@ -1,10 +1,168 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 
+from instrumentation import timed
+from response_cache import resolve_cache
+
 # Set up logging for better error tracking
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def fetch_earnings_data(symbol, token, api_url, period="1y"):
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Upper bound (seconds) on a server-requested Retry-After wait
+MAX_RETRY_AFTER = 30.0
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session(pool_size=16):
+    """
+    Return the shared keep-alive session used for all API requests.
+
+    :param pool_size: Maximum number of pooled connections per host
+    :return: requests.Session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+    return _session
+
+def _earnings_url(symbol, token, api_url, period):
+    return f"{api_url}/stock/{symbol}/earnings/{period}?token={token}"
+
+def _get_with_retries(session, url, symbol, retries, backoff, timeout):
+    """
+    Blocking GET with jittered exponential backoff on 429/5xx and network errors.
+
+    :return: JSON response or None if request fails
+    """
+    for attempt in range(retries + 1):
+        try:
+            response = session.get(url, timeout=timeout)
+        except requests.RequestException as e:
+            if attempt == retries:
+                # Handle network errors or timeouts
+                logging.error(f"Request failed for {symbol}: {str(e)}")
+                return None
+        else:
+            if response.status_code == 200:
+                try:
+                    data = response.json()
+                except ValueError as e:
+                    # A malformed body must not escape into the caller's fan-out
+                    logging.error(f"Malformed JSON response for {symbol}: {str(e)}")
+                    return None
+                logging.info(f"Successfully fetched earnings data for {symbol}")
+                return data
+            if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                logging.error(f"Failed to fetch data for {symbol}. Status code: {response.status_code}")
+                return None
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                time.sleep(min(float(retry_after), MAX_RETRY_AFTER))
+                continue
+        # Full jitter: sleep a random fraction of the exponential backoff window
+        time.sleep(random.uniform(0, backoff * (2 ** attempt)))
+    return None
+
+async def fetch_earnings_data_many(symbols, token, api_url, period="1y", max_per_host=8, retries=3,
+                                   backoff=0.5, timeout=10, session=None, cache=None):
+    """
+    Fetch earnings data for many symbols concurrently, yielding results as they complete.
+
+    Requests share a keep-alive connection pool and are limited to `max_per_host` in flight per host.
+    Symbols found in the response cache are yielded first without touching the network.
+
+    :param symbols: Iterable of stock symbols
+    :param token: API token for authentication
+    :param api_url: URL of the API endpoint
+    :param period: Time period for earnings data, default is '1y' for one year
+    :param max_per_host: Maximum concurrent requests per host
+    :param retries: Number of retries for 429/5xx responses and network errors
+    :param backoff: Base backoff in seconds, doubled on every attempt and jittered
+    :param timeout: Per-request timeout in seconds
+    :param session: Optional requests.Session, defaults to the shared pooled session
+    :param cache: Optional ResponseCache, None uses the default cache and False disables caching
+    :return: Async generator of (symbol, JSON response or None) tuples in completion order
+    """
+    symbols = list(dict.fromkeys(symbols))
+    cache = resolve_cache(cache)
+    if cache is not None:
+        remaining = []
+        for symbol in symbols:
+            cached = cache.get('earnings', symbol, period, source=api_url)
+            if cached is not None:
+                yield symbol, cached
+            else:
+                remaining.append(symbol)
+        symbols = remaining
+    if not symbols:
+        return
+    session = session or get_session(pool_size=max_per_host)
+    loop = asyncio.get_running_loop()
+    host_limits = {}
+    executor = ThreadPoolExecutor(max_workers=max(1, min(len(symbols), max_per_host * 4)))
+
+    async def fetch(symbol):
+        url = _earnings_url(symbol, token, api_url, period)
+        host = urlsplit(url).netloc
+        if host not in host_limits:
+            host_limits[host] = asyncio.Semaphore(max_per_host)
+        async with host_limits[host]:
+            data = await loop.run_in_executor(
+                executor, _get_with_retries, session, url, symbol, retries, backoff, timeout)
+        if cache is not None:
+            cache.put('earnings', symbol, period, data, source=api_url)
+        return symbol, data
+
+    tasks = [asyncio.ensure_future(fetch(symbol)) for symbol in symbols]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        executor.shutdown(wait=False)
+
+def fetch_earnings_data_bulk(symbols, token, api_url, period="1y", **kwargs):
+    """
+    Blocking helper around fetch_earnings_data_many that collects all results.
+
+    :param symbols: Iterable of stock symbols
+    :param token: API token for authentication
+    :param api_url: URL of the API endpoint
+    :param period: Time period for earnings data, default is '1y' for one year
+    :param kwargs: Extra options passed to fetch_earnings_data_many
+    :return: Dictionary of symbol -> JSON response or None
+    """
+    async def collect():
+        return {symbol: data async for symbol, data in
+                fetch_earnings_data_many(symbols, token, api_url, period, **kwargs)}
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(collect())
+
+    # Already inside an event loop (e.g. a notebook): run on a separate thread
+    with ThreadPoolExecutor(max_workers=1) as runner:
+        return runner.submit(asyncio.run, collect()).result()
+
+@timed("fetch_earnings_data")
+def fetch_earnings_data(symbol, token, api_url, period="1y", cache=None):
     """
     Fetch earnings data for a given stock symbol from the specified API.
 
@@ -12,29 +170,11 @@ def fetch_earnings_data(symbol, token, api_url, period="1y"):
     :param token: API token for authentication
     :param api_url: URL of the API endpoint
     :param period: Time period for earnings data, default is '1y' for one year
+    :param cache: Optional ResponseCache, None uses the default cache and False disables caching
     :return: JSON response or None if request fails
     """
-    # Construct the URL with the period parameter
-    url = f"{api_url}/stock/{symbol}/earnings/{period}?token={token}"
-    
-    try:
-        # Make the API request
-        response = requests.get(url, timeout=10)  # Added timeout for request
-        
-        # Check if the request was successful
-        if response.status_code == 200:
-            # Log success and return data
-            logging.info(f"Successfully fetched earnings data for {symbol}")
-            return response.json()
-        else:
-            # Log the error with status code
-            logging.error(f"Failed to fetch data for {symbol}. Status code: {response.status_code}")
-            return None
-    
-    except requests.RequestException as e:
-        # Handle network errors or timeouts
-        logging.error(f"Request failed for {symbol}: {str(e)}")
-        return None
+    return fetch_earnings_data_bulk([symbol], token, api_url, period, cache=cache).get(symbol)
 
 # Example usage
-# data = fetch_earnings_data('AAPL', 'YOUR_API_TOKEN', 'https://cloud.iexapis.com/stable')
\ No newline at end of file
+# data = fetch_earnings_data('AAPL', 'YOUR_API_TOKEN', 'https://cloud.iexapis.com/stable')
+# all_data = fetch_earnings_data_bulk(['AAPL', 'MSFT'], 'YOUR_API_TOKEN', 'https://cloud.iexapis.com/stable')
@@ -0,0 +1,238 @@
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from portfolio_valuation import PortfolioBook
+
+# Set up logging for better error tracking
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+TRADING_DAYS = 252
+
+@dataclass
+class MarketData:
+    """
+    Aligned price history: close[t, i] is the close of symbols[i] on dates[t] (NaN if missing).
+    """
+    dates: np.ndarray
+    symbols: List[str]
+    close: np.ndarray
+
+    def subset(self, start: int, stop: int) -> "MarketData":
+        """
+        :return: MarketData restricted to bars [start, stop)
+        """
+        return MarketData(self.dates[start:stop], self.symbols, self.close[start:stop])
+
+def market_data_from_bars(bars: pd.DataFrame) -> MarketData:
+    """
+    Build aligned price arrays from long bars.
+
+    :param bars: DataFrame with columns date, symbol and close
+    :return: MarketData
+    """
+    close = bars.pivot_table(index='date', columns='symbol', values='close', aggfunc='last').sort_index()
+    return MarketData(close.index.to_numpy(), [str(s) for s in close.columns], close.to_numpy(dtype=float, copy=True))
+
+def load_market_data(path: str) -> MarketData:
+    """
+    Load price history from a local file so backtests run offline.
+
+    :param path: .npz written by save_market_data, or a CSV/Parquet of long bars (date, symbol, close)
+    :return: MarketData
+    """
+    if path.endswith(".npz"):
+        with np.load(path, allow_pickle=False) as data:
+            return MarketData(data['dates'], [str(s) for s in data['symbols']], data['close'])
+    if path.endswith(".parquet"):
+        bars = pd.read_parquet(path)
+    else:
+        bars = pd.read_csv(path, parse_dates=['date'])
+    return market_data_from_bars(bars)
+
+def save_market_data(market: MarketData, path: str) -> None:
+    """
+    Save price history as an .npz for fast offline reloads.
+
+    :param market: MarketData
+    :param path: Destination path ending in .npz
+    """
+    np.savez(path, dates=market.dates, symbols=np.asarray(market.symbols, dtype=str), close=market.close)
+
+@dataclass
+class RebalanceParams:
+    """
+    Rebalancing rule.
+
+    target_weights: symbol -> weight; symbols not listed get 0, None means equal weight
+    rebalance_every: rebalance on a fixed schedule every N bars (0 disables the schedule)
+    drift_band: rebalance whenever any weight drifts more than this from its target
+    signal_cutoff: symbols whose earnings-model signal is below this get no allocation
+    signal_tilt: target weights are scaled by (1 + signal_tilt * clip(signal, -1, 1))
+    commission_bps: transaction cost in basis points of traded notional
+    lot_size: shares are traded in multiples of this
+    """
+    target_weights: Optional[Dict[str, float]] = None
+    rebalance_every: int = 21
+    drift_band: float = 0.05
+    signal_cutoff: Optional[float] = None
+    signal_tilt: float = 0.0
+    commission_bps: float = 1.0
+    lot_size: int = 1
+
+@dataclass
+class BacktestResult:
+    """
+    Per-bar state of a backtest, in preallocated arrays.
+    """
+    dates: np.ndarray
+    symbols: List[str]
+    positions: np.ndarray
+    cash: np.ndarray
+    equity: np.ndarray
+    turnover: np.ndarray
+    costs: np.ndarray
+    rebalances: np.ndarray
+    metrics: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def pnl(self) -> np.ndarray:
+        """
+        :return: Per-bar change in equity
+        """
+        return np.diff(self.equity, prepend=self.equity[0])
+
+def performance_metrics(equity: np.ndarray, periods_per_year: int = TRADING_DAYS) -> Dict[str, float]:
+    """
+    Summary statistics of an equity curve.
+
+    :param equity: Equity per bar
+    :param periods_per_year: Bars per year, for annualisation
+    :return: Dictionary with total_return, cagr, volatility, sharpe and max_drawdown
+    """
+    equity = np.asarray(equity, dtype=float)
+    if len(equity) < 2 or equity[0] <= 0:
+        return {'total_return': 0.0, 'cagr': 0.0, 'volatility': 0.0, 'sharpe': 0.0, 'max_drawdown': 0.0}
+    returns = equity[1:] / equity[:-1] - 1
+    years = len(returns) / periods_per_year
+    total_return = equity[-1] / equity[0] - 1
+    volatility = float(returns.std(ddof=1) * np.sqrt(periods_per_year)) if len(returns) > 1 else 0.0
+    mean = float(returns.mean() * periods_per_year)
+    peak = np.maximum.accumulate(equity)
+    return {
+        'total_return': float(total_return),
+        'cagr': float((equity[-1] / equity[0]) ** (1 / years) - 1) if years > 0 and equity[-1] > 0 else -1.0,
+        'volatility': volatility,
+        'sharpe': mean / volatility if volatility > 0 else 0.0,
+        'max_drawdown': float(((peak - equity) / peak).max()),
+    }
+
+def _target_vector(symbols: List[str], params: RebalanceParams) -> np.ndarray:
+    if params.target_weights is None:
+        return np.full(len(symbols), 1.0 / len(symbols))
+    target = np.array([params.target_weights.get(s, 0.0) for s in symbols], dtype=float)
+    if target.sum() > 1 + 1e-9:
+        raise ValueError("Target weights must not sum to more than 1.")
+    return target
+
+def run_backtest(market: MarketData, params: Optional[RebalanceParams] = None,
+                 holdings: Optional[Dict[str, Dict[str, float]]] = None, initial_cash: float = 0.0,
+                 signal: Optional[np.ndarray] = None) -> BacktestResult:
+    """
+    Replay bars through the holdings model, applying the rebalance rule at each bar.
+
+    :param market: Price history
+    :param params: RebalanceParams, defaults to monthly equal-weight with a 5% drift band
+    :param holdings: Starting holdings in the trading_script `portfolio` format ({symbol: {"shares", "purchase_price"}})
+    :param initial_cash: Starting cash
+    :param signal: Optional (n_bars, n_symbols) earnings-model signal known at each bar's close (NaN = no view)
+    :return: BacktestResult
+    """
+    params = params or RebalanceParams()
+    n_bars, n_symbols = market.close.shape
+    if signal is not None and signal.shape != market.close.shape:
+        raise ValueError("signal must have the same shape as the price matrix.")
+
+    # Carry the last known price forward; symbols before their first price are untradable
+    prices = pd.DataFrame(market.close).ffill().to_numpy()
+    base_target = _target_vector(market.symbols, params)
+    cost_rate = params.commission_bps / 10000.0
+    lot = max(1, int(params.lot_size))
+
+    positions = np.zeros((n_bars, n_symbols))
+    cash = np.zeros(n_bars)
+    equity = np.zeros(n_bars)
+    turnover = np.zeros(n_bars)
+    costs = np.zeros(n_bars)
+    rebalances = np.zeros(n_bars, dtype=bool)
+
+    current = np.zeros(n_symbols)
+    if holdings:
+        book = PortfolioBook.from_dict(holdings)
+        positions_by_symbol = dict(zip(book.symbols, book.shares))
+        current = np.array([positions_by_symbol.get(s, 0.0) for s in market.symbols], dtype=float)
+    current_cash = float(initial_cash)
+
+    for t in range(n_bars):
+        price = prices[t]
+        tradable = ~np.isnan(price)
+        px = np.where(tradable, price, 0.0)
+        holdings_value = current * px
+        value = holdings_value.sum() + current_cash
+
+        if value > 0:
+            target = np.where(tradable, base_target, 0.0)
+            if signal is not None:
+                view = signal[t]
+                has_view = ~np.isnan(view)
+                if params.signal_tilt:
+                    target = np.where(has_view, target * (1 + params.signal_tilt * np.clip(view, -1, 1)), target)
+                if params.signal_cutoff is not None:
+                    target = np.where(has_view & (view < params.signal_cutoff), 0.0, target)
+                total = target.sum()
+                if total > 1:
+                    target = target / total
+            weights = holdings_value / value
+            scheduled = params.rebalance_every > 0 and t % params.rebalance_every == 0
+            if scheduled or np.abs(weights - target).max() > params.drift_band:
+                # Leave room for costs so cash does not go negative
+                budget = value / (1 + cost_rate)
+                desired = np.zeros(n_symbols)
+                np.floor_divide(target * budget, px * lot, out=desired, where=tradable & (px > 0))
+                desired *= lot
+                desired = np.where(tradable, desired, current)
+                trade = desired - current
+                notional = np.abs(trade) @ px
+                cost = notional * cost_rate
+                current_cash -= trade @ px + cost
+                current = desired
+                turnover[t] = notional / value
+                costs[t] = cost
+                rebalances[t] = True
+
+        positions[t] = current
+        cash[t] = current_cash
+        equity[t] = current @ px + current_cash
+
+    return BacktestResult(market.dates, market.symbols, positions, cash, equity, turnover, costs, rebalances,
+                          performance_metrics(equity))
+
+# Example usage: 10 years x 500 symbols of synthetic daily bars
+if __name__ == "__main__":
+    from feature_pipeline import synthetic_bars
+
+    market = market_data_from_bars(synthetic_bars(500, TRADING_DAYS * 10))
+    rng = np.random.default_rng(1)
+    signal = rng.normal(0, 0.5, size=market.close.shape)
+
+    start = time.perf_counter()
+    result = run_backtest(market, RebalanceParams(signal_tilt=0.5, signal_cutoff=-0.8), initial_cash=1_000_000.0,
+                          signal=signal)
+    elapsed = time.perf_counter() - start
+    print(f"Backtested {market.close.shape[0]} bars x {market.close.shape[1]} symbols in {elapsed:.2f}s "
+          f"({int(result.rebalances.sum())} rebalances)")
+    print({key: round(value, 4) for key, value in result.metrics.items()})
@@ -0,0 +1,210 @@
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+from api_fetcher import fetch_earnings_data_bulk
+from data_processor import process_earnings_data
+from earnings_store import EarningsStore
+from earningsPredictionModel import FEATURES, fit_earnings_model, validate_params
+from model_registry import ModelRegistry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+MAX_POOL_RESTARTS = 2
+
+@dataclass
+class TrainingRegistry:
+    """
+    Outcome of a universe-scale training run.
+
+    models: symbol -> fitted LinearRegression
+    metrics: symbol -> {'mse', 'r2', 'n_samples', 'seconds'}
+    errors: symbol -> reason the symbol produced no model
+    """
+    models: Dict[str, Any] = field(default_factory=dict)
+    metrics: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    total_seconds: float = 0.0
+
+    def summary(self) -> Dict[str, float]:
+        """
+        :return: Dictionary with model/error counts and wall-clock time
+        """
+        return {
+            'trained': len(self.models),
+            'failed': len(self.errors),
+            'total_seconds': self.total_seconds,
+        }
+
+# Per-worker store handle, opened once by the pool initializer
+_worker_store: Optional[EarningsStore] = None
+
+def _init_worker(store_root: str) -> None:
+    global _worker_store
+    _worker_store = EarningsStore(store_root)
+    # Per-symbol INFO logs from thousands of workers drown everything else
+    logging.getLogger().setLevel(logging.WARNING)
+
+def _train_symbol(symbol: str) -> Dict[str, Any]:
+    """
+    Train one symbol inside a worker, reading its features from the memory-mapped store.
+
+    :param symbol: Stock symbol
+    :return: Dictionary with the model (or None), metrics and an error message if any
+    """
+    start = time.perf_counter()
+    try:
+        data = _worker_store.load_frame(symbol, columns=FEATURES + ['actualEPS'])
+        result = fit_earnings_model(data, symbol)
+        if result is None:
+            return {'symbol': symbol, 'model': None, 'error': 'insufficient or incomplete data',
+                    'seconds': time.perf_counter() - start}
+        model, mse, r2 = result
+        return {'symbol': symbol, 'model': model, 'mse': float(mse), 'r2': float(r2), 'n_samples': len(data),
+                'seconds': time.perf_counter() - start}
+    except Exception as e:
+        return {'symbol': symbol, 'model': None, 'error': f"{type(e).__name__}: {e}",
+                'seconds': time.perf_counter() - start}
+
+def load_universe(symbols: Iterable[str], token: str, api_url: str, period: str = "1y",
+                  store: Optional[EarningsStore] = None, refresh: bool = False) -> Dict[str, str]:
+    """
+    Make sure every symbol has fresh processed earnings data for `period` in the store.
+
+    Symbols that are missing, stored for another period or older than the store's max_age
+    are fetched concurrently and processed once in the parent process.
+
+    :param symbols: Stock symbols
+    :param token: API token for authentication
+    :param api_url: URL of the API endpoint
+    :param period: Time period for earnings data
+    :param store: EarningsStore to fill, defaults to the default store location
+    :param refresh: Refetch symbols even if fresh data is stored
+    :return: Dictionary of symbol -> error message for symbols that could not be loaded
+    """
+    store = store or EarningsStore()
+    errors = {}
+    to_fetch = []
+    for symbol in symbols:
+        try:
+            if refresh or not store.is_fresh(symbol, period):
+                to_fetch.append(symbol)
+        except ValueError as e:
+            errors[symbol] = f"invalid symbol: {e}"
+    if not to_fetch:
+        return errors
+    logger.info(f"Fetching earnings data for {len(to_fetch)} symbols")
+    raw = fetch_earnings_data_bulk(to_fetch, token, api_url, period)
+    for symbol in to_fetch:
+        if raw.get(symbol) is None:
+            errors[symbol] = 'no data available'
+            continue
+        try:
+            store.write(symbol, process_earnings_data(raw[symbol]), period)
+        except Exception as e:
+            errors[symbol] = f"processing failed: {type(e).__name__}: {e}"
+    return errors
+
+def _run_pool(symbols: List[str], store_root: str, workers: int, registry: TrainingRegistry) -> List[str]:
+    """
+    Train symbols in one process pool, recording results in the registry.
+
+    :return: Symbols left unfinished because the pool broke
+    """
+    unfinished = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(store_root,)) as pool:
+        futures = {pool.submit(_train_symbol, symbol): symbol for symbol in symbols}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                outcome = future.result()
+            except BrokenProcessPool:
+                unfinished.append(symbol)
+                continue
+            except Exception as e:
+                registry.errors[symbol] = f"{type(e).__name__}: {e}"
+                continue
+            if outcome['model'] is None:
+                registry.errors[symbol] = outcome['error']
+                continue
+            registry.models[symbol] = outcome['model']
+            registry.metrics[symbol] = {key: outcome[key] for key in ('mse', 'r2', 'n_samples', 'seconds')}
+    if unfinished:
+        logger.warning(f"Worker pool broke with {len(unfinished)} symbols unfinished")
+    return unfinished
+
+def train_universe(symbols: List[str], token: str, api_url: str, period: str = "1y",
+                   store: Optional[EarningsStore] = None, max_workers: Optional[int] = None,
+                   refresh: bool = False, model_registry: Optional[ModelRegistry] = None) -> TrainingRegistry:
+    """
+    Train one earnings model per symbol across a process pool.
+
+    Features are shared through the on-disk EarningsStore, which workers memory-map, so only
+    symbol names travel to the workers and only fitted models and metrics travel back.
+    A failing symbol is recorded in `errors` and does not affect the rest of the batch.
+
+    :param symbols: Stock symbols to train
+    :param token: API token for authentication
+    :param api_url: URL of the API endpoint
+    :param period: Time period for earnings data, default is '1y' for one year
+    :param store: EarningsStore holding processed data, defaults to the default store location
+    :param max_workers: Worker processes, defaults to os.cpu_count()
+    :param refresh: Refetch symbols even if fresh data is stored
+    :param model_registry: Optional ModelRegistry; fitted models are saved to it as a new version
+    :return: TrainingRegistry with models, per-symbol metrics and errors
+    """
+    start = time.perf_counter()
+    store = store or EarningsStore()
+    registry = TrainingRegistry()
+    valid = []
+    for symbol in dict.fromkeys(symbols):
+        try:
+            validate_params(symbol, token, api_url, period)
+        except ValueError as e:
+            registry.errors[symbol] = f"invalid parameters: {e}"
+            continue
+        valid.append(symbol)
+    if valid:
+        registry.errors.update(load_universe(valid, token, api_url, period, store=store, refresh=refresh))
+
+    trainable = [symbol for symbol in valid if symbol not in registry.errors]
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(trainable) or 1))
+    # A crashed worker breaks the whole pool and every future in it. Bisect the unfinished
+    # symbols into fresh pools so innocent symbols still train and only the crasher fails.
+    groups = [trainable] if trainable else []
+    attempts: Dict[str, int] = {}
+    while groups:
+        group = groups.pop()
+        unfinished = _run_pool(group, store.root, min(workers, len(group)), registry)
+        if not unfinished:
+            continue
+        if len(unfinished) > 1:
+            middle = len(unfinished) // 2
+            groups.extend([unfinished[middle:], unfinished[:middle]])
+            continue
+        symbol = unfinished[0]
+        attempts[symbol] = attempts.get(symbol, 0) + 1
+        if attempts[symbol] > MAX_POOL_RESTARTS:
+            registry.errors[symbol] = 'worker crashed repeatedly'
+        else:
+            groups.append(unfinished)
+    if model_registry is not None and registry.models:
+        model_registry.save_sklearn(registry.models, registry.metrics)
+
+    registry.total_seconds = time.perf_counter() - start
+    logger.info(f"Trained {len(registry.models)} models, {len(registry.errors)} failed, "
+                f"in {registry.total_seconds:.2f}s")
+    return registry
+
+# Example usage
+if __name__ == "__main__":
+    token = 'YOUR_API_TOKEN'
+    api_url = 'https://cloud.iexapis.com/stable'
+    registry = train_universe(['AAPL', 'MSFT', 'TSLA'], token, api_url)
+    print(registry.summary())
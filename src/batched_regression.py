@@ -0,0 +1,247 @@
+import time
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from earningsPredictionModel import FEATURES, MIN_SAMPLES
+from instrumentation import timed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+@dataclass
+class BatchedFit:
+    """
+    Per-symbol linear regression results, stored as aligned arrays.
+
+    coef has shape (n_symbols, n_features); intercept, mse, r2 and n_samples have shape (n_symbols,).
+    """
+    symbols: List[str]
+    coef: np.ndarray
+    intercept: np.ndarray
+    mse: np.ndarray
+    r2: np.ndarray
+    n_samples: np.ndarray
+    features: List[str] = field(default_factory=lambda: list(FEATURES))
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+
+    def index(self, symbol: str) -> int:
+        """
+        :param symbol: Stock symbol
+        :return: Row of the symbol in the coefficient arrays
+        :raises KeyError: If the symbol was not fitted
+        """
+        return self._positions[symbol]
+
+    def predict(self, symbol: str, X) -> np.ndarray:
+        """
+        :param symbol: Stock symbol
+        :param X: Feature matrix of shape (n, n_features)
+        :return: Predictions of shape (n,)
+        """
+        i = self.index(symbol)
+        return np.asarray(X, dtype=float) @ self.coef[i] + self.intercept[i]
+
+    def to_sklearn(self, symbol: str):
+        """
+        Build an equivalent fitted sklearn LinearRegression for one symbol.
+
+        :param symbol: Stock symbol
+        :return: LinearRegression with coef_ and intercept_ set
+        """
+        from sklearn.linear_model import LinearRegression
+
+        i = self.index(symbol)
+        model = LinearRegression()
+        model.coef_ = self.coef[i].copy()
+        model.intercept_ = float(self.intercept[i])
+        model.n_features_in_ = len(self.features)
+        model.feature_names_in_ = np.asarray(self.features, dtype=object)
+        return model
+
+@lru_cache(maxsize=1024)
+def holdout_indices(n_samples: int, test_size: float = 0.2, random_state: int = 42) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Train/test row indices identical to sklearn's train_test_split(shuffle=True) for an integer random_state.
+
+    :param n_samples: Number of rows
+    :param test_size: Fraction of rows held out
+    :param random_state: Seed
+    :return: Tuple of (train indices, test indices)
+    """
+    n_test = int(np.ceil(test_size * n_samples))
+    n_train = n_samples - n_test
+    permutation = np.random.RandomState(random_state).permutation(n_samples)
+    return permutation[n_test:n_test + n_train], permutation[:n_test]
+
+def _solve_group(X: np.ndarray, y: np.ndarray, train: np.ndarray, test: np.ndarray, tol: float):
+    """
+    Fit every symbol in a group of equal-length datasets at once.
+
+    :param X: Array of shape (n_symbols, n_samples, n_features)
+    :param y: Array of shape (n_symbols, n_samples)
+    :param tol: Relative singular value cutoff, as LinearRegression(tol=...) passes to lstsq
+    :return: Tuple of (coef, intercept, mse, r2) arrays
+    """
+    X_train, y_train = X[:, train], y[:, train]
+    X_test, y_test = X[:, test], y[:, test]
+
+    # Center like sklearn, then take the minimum-norm least-squares solution via a batched pseudo-inverse
+    x_mean = X_train.mean(axis=1)
+    y_mean = y_train.mean(axis=1)
+    Xc = X_train - x_mean[:, None, :]
+    yc = y_train - y_mean[:, None]
+    coef = np.einsum('spn,sn->sp', np.linalg.pinv(Xc, rcond=tol), yc)
+    intercept = y_mean - np.einsum('sp,sp->s', x_mean, coef)
+
+    residual = y_test - (np.einsum('snp,sp->sn', X_test, coef) + intercept[:, None])
+    ss_res = np.einsum('sn,sn->s', residual, residual)
+    mse = ss_res / len(test)
+    centered = y_test - y_test.mean(axis=1, keepdims=True)
+    ss_tot = np.einsum('sn,sn->s', centered, centered)
+    # sklearn's r2_score convention for a constant target: 1.0 for a perfect fit, otherwise 0.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r2 = np.where(ss_tot != 0, 1 - ss_res / ss_tot, np.where(ss_res == 0, 1.0, 0.0))
+    return coef, intercept, mse, r2
+
+@timed("model_fit_batched")
+def fit_batched(datasets: Dict[str, Tuple[np.ndarray, np.ndarray]], test_size: float = 0.2,
+                random_state: int = 42, min_samples: int = MIN_SAMPLES,
+                features: Optional[List[str]] = None, tol: float = 1e-6) -> BatchedFit:
+    """
+    Fit one linear regression per symbol, solving all symbols together with vectorized NumPy.
+
+    Datasets are grouped by row count so each group is a dense (symbols, rows, features) stack
+    sharing one holdout split, which reproduces train_test_split(test_size, random_state).
+
+    :param datasets: Dictionary of symbol -> (X of shape (n, n_features), y of shape (n,))
+    :param test_size: Fraction of rows held out for scoring
+    :param random_state: Seed for the holdout split
+    :param min_samples: Symbols with fewer rows are reported in errors
+    :param features: Feature names, defaults to the earnings model FEATURES
+    :param tol: Relative singular value cutoff, matching LinearRegression's default
+    :return: BatchedFit
+    """
+    features = list(features or FEATURES)
+    n_features = len(features)
+    errors = {}
+    groups: Dict[int, List[str]] = {}
+    for symbol, (X, y) in datasets.items():
+        n = len(y)
+        if n < min_samples:
+            errors[symbol] = f"insufficient data: {n} samples"
+        elif np.isnan(X).any() or np.isnan(y).any():
+            errors[symbol] = "missing values in features or target"
+        else:
+            groups.setdefault(n, []).append(symbol)
+
+    symbols, coefs, intercepts, mses, r2s, counts = [], [], [], [], [], []
+    for n, members in groups.items():
+        X = np.stack([np.asarray(datasets[s][0], dtype=float).reshape(n, n_features) for s in members])
+        y = np.stack([np.asarray(datasets[s][1], dtype=float) for s in members])
+        train, test = holdout_indices(n, test_size, random_state)
+        coef, intercept, mse, r2 = _solve_group(X, y, train, test, tol)
+        symbols.extend(members)
+        coefs.append(coef)
+        intercepts.append(intercept)
+        mses.append(mse)
+        r2s.append(r2)
+        counts.append(np.full(len(members), n))
+
+    def join(parts, shape):
+        return np.concatenate(parts) if parts else np.empty(shape)
+
+    return BatchedFit(
+        symbols=symbols,
+        coef=join(coefs, (0, n_features)),
+        intercept=join(intercepts, (0,)),
+        mse=join(mses, (0,)),
+        r2=join(r2s, (0,)),
+        n_samples=join(counts, (0,)).astype(int),
+        features=features,
+        errors=errors,
+    )
+
+def fit_store_batched(store, symbols: Optional[List[str]] = None, **kwargs) -> BatchedFit:
+    """
+    Batched fit over features memory-mapped from an EarningsStore.
+
+    :param store: EarningsStore
+    :param symbols: Symbols to fit, defaults to every stored symbol
+    :param kwargs: Extra options passed to fit_batched
+    :return: BatchedFit
+    """
+    symbols = symbols if symbols is not None else store.symbols()
+    return fit_batched({symbol: store.load_features(symbol) for symbol in symbols}, **kwargs)
+
+def synthetic_datasets(n_symbols: int, n_quarters: int = 40, seed: int = 0) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Random earnings-like regression problems for benchmarking.
+
+    :return: Dictionary of symbol -> (X, y)
+    """
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_symbols, n_quarters, 2))
+    X[:, :, 0] = rng.lognormal(20, 1, size=(n_symbols, n_quarters))
+    X[:, :, 1] = rng.normal(0, 0.1, size=(n_symbols, n_quarters))
+    beta = rng.normal(size=(n_symbols, 2)) * np.array([1e-9, 1.0])
+    y = np.einsum('snp,sp->sn', X, beta) + rng.normal(0, 0.05, size=(n_symbols, n_quarters))
+    return {f"SYM{i}": (X[i], y[i]) for i in range(n_symbols)}
+
+def benchmark(scales=(1000, 10000), n_quarters: int = 40, sklearn_sample: int = 500) -> List[Dict[str, float]]:
+    """
+    Compare the batched solver against the per-symbol sklearn path.
+
+    The sklearn loop is timed on `sklearn_sample` symbols and extrapolated linearly.
+
+    :return: List of result dictionaries, one per scale
+    """
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import mean_squared_error, r2_score
+    from sklearn.model_selection import train_test_split
+
+    results = []
+    for n_symbols in scales:
+        datasets = synthetic_datasets(n_symbols, n_quarters)
+        start = time.perf_counter()
+        fit = fit_batched(datasets)
+        batched_seconds = time.perf_counter() - start
+
+        sample = list(datasets)[:min(sklearn_sample, n_symbols)]
+        max_coef_diff = 0.0
+        start = time.perf_counter()
+        for symbol in sample:
+            X, y = datasets[symbol]
+            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+            model = LinearRegression().fit(X_train, y_train)
+            y_pred = model.predict(X_test)
+            mean_squared_error(y_test, y_pred)
+            r2_score(y_test, y_pred)
+            i = fit.index(symbol)
+            # Compare contributions to the prediction so tiny, truncated coefficients do not dominate
+            diff = np.abs(fit.coef[i] - model.coef_) * np.abs(X).mean(axis=0) / max(np.abs(y).mean(), 1e-12)
+            max_coef_diff = max(max_coef_diff, float(diff.max()))
+        sklearn_seconds = (time.perf_counter() - start) / len(sample) * n_symbols
+
+        results.append({
+            'symbols': n_symbols,
+            'batched_seconds': batched_seconds,
+            'sklearn_seconds_estimated': sklearn_seconds,
+            'speedup': sklearn_seconds / batched_seconds,
+            'max_coef_diff': max_coef_diff,
+        })
+    return results
+
+# Example usage: benchmark at 1k and 10k symbols
+if __name__ == "__main__":
+    for row in benchmark():
+        print(f"{row['symbols']:>6} symbols: batched {row['batched_seconds']:.3f}s, "
+              f"sklearn ~{row['sklearn_seconds_estimated']:.2f}s, speedup {row['speedup']:.0f}x, "
+              f"max coef diff {row['max_coef_diff']:.2e}")
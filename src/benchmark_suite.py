@@ -0,0 +1,369 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+
+# Synthetic data generators
+
+def synthetic_earnings(n_symbols: int, n_quarters: int = 40, seed: int = 0) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Raw earnings records shaped like the API response, N symbols x M quarters.
+
+    Revenue is formatted with '$' and ',' and quarters arrive newest first, as from the API.
+
+    :return: Dictionary of symbol -> list of record dictionaries
+    """
+    rng = np.random.default_rng(seed)
+    quarters = pd.date_range("2000-03-31", periods=n_quarters, freq="QE").strftime("%Y-%m-%d").tolist()[::-1]
+    estimated = rng.uniform(0.5, 5.0, size=(n_symbols, n_quarters))
+    actual = estimated * (1 + rng.normal(0.02, 0.1, size=estimated.shape))
+    revenue = rng.uniform(1e8, 1e11, size=estimated.shape)
+    data = {}
+    for i in range(n_symbols):
+        data[f"SYM{i}"] = [{
+            'actualEPS': float(actual[i, q]),
+            'estimatedEPS': float(estimated[i, q]),
+            'surprise': float(actual[i, q] - estimated[i, q]),
+            'revenue': f"${revenue[i, q]:,.0f}",
+            'fiscalPeriod': quarters[q],
+        } for q in range(n_quarters)]
+    return data
+
+def synthetic_portfolio(n_positions: int, seed: int = 0):
+    """
+    An N-position portfolio in the trading_script format with current prices (1% missing).
+
+    :return: Tuple of (portfolio dictionary, prices dictionary)
+    """
+    rng = np.random.default_rng(seed)
+    symbols = [f"SYM{i}" for i in range(n_positions)]
+    shares = rng.integers(1, 1000, n_positions)
+    purchase = rng.uniform(10, 500, n_positions)
+    current = purchase * rng.lognormal(0, 0.2, n_positions)
+    portfolio = {s: {'shares': int(n), 'purchase_price': float(p)} for s, n, p in zip(symbols, shares, purchase)}
+    prices = {s: (None if rng.random() < 0.01 else float(c)) for s, c in zip(symbols, current)}
+    return portfolio, prices
+
+def synthetic_articles(k: int, unique_ratio: float = 0.3, seed: int = 0) -> List[str]:
+    """
+    K news descriptions with a share of repeats, as seen across overlapping symbol queries.
+    """
+    from sentiment import synthetic_headlines
+    return synthetic_headlines(k, unique_ratio, seed)
+
+# Cases
+
+@dataclass
+class BenchmarkCase:
+    """
+    One timed hot path.
+
+    setup: scale parameter -> state (not timed)
+    run: state -> None (timed)
+    items: scale parameter -> units of work per run, for throughput
+    unit: name of the unit of work
+    """
+    name: str
+    scales: Dict[str, int]
+    setup: Callable[[int], Any]
+    run: Callable[[Any], None]
+    items: Callable[[int], int]
+    unit: str
+
+def _process_earnings_setup(n):
+    return list(synthetic_earnings(n, 40).values())
+
+def _process_earnings_run(records):
+    from data_processor import process_earnings_data
+    for raw in records:
+        process_earnings_data(raw)
+
+def _portfolio_run(state):
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    from trading_script import calculate_portfolio_value
+    portfolio, prices = state
+    calculate_portfolio_value(prices, portfolio)
+
+def _sentiment_run(texts):
+    from sentiment import SentimentEngine
+    # A fresh engine per run so the cache starts cold, as in a new batch job
+    engine = SentimentEngine(parallel_threshold=len(texts) + 1)
+    engine.score_texts(texts)
+
+def _fit_setup(n):
+    from data_processor import process_earnings_data
+    return [(symbol, process_earnings_data(raw)) for symbol, raw in synthetic_earnings(n, 40).items()]
+
+def _fit_run(frames):
+    from earningsPredictionModel import fit_earnings_model
+    for symbol, frame in frames:
+        fit_earnings_model(frame, symbol)
+
+def _fit_batched_setup(n):
+    from batched_regression import synthetic_datasets
+    return synthetic_datasets(n, 40)
+
+def _fit_batched_run(datasets):
+    from batched_regression import fit_batched
+    fit_batched(datasets)
+
+def _features_setup(n):
+    from feature_pipeline import synthetic_bars
+    return synthetic_bars(n, 252 * 2)
+
+def _features_run(bars):
+    from feature_pipeline import build_features
+    build_features(bars)
+
+def _backtest_setup(n):
+    from backtester import market_data_from_bars
+    from feature_pipeline import synthetic_bars
+    return market_data_from_bars(synthetic_bars(n, 252 * 10))
+
+def _backtest_run(market):
+    from backtester import run_backtest
+    run_backtest(market, initial_cash=1_000_000.0)
+
+def _rebalancer_setup(n):
+    from rebalancer import IncrementalRebalancer
+    rng = np.random.default_rng(0)
+    symbols = [f"SYM{i}" for i in range(n)]
+    prices = rng.uniform(20, 500, n)
+    shares = np.floor(1e9 / n / prices)
+    rebalancer = IncrementalRebalancer(symbols, shares, prices, {s: 1.0 / n for s in symbols},
+                                       cash=1e9 - shares @ prices, band=0.1 / n)
+    which = rng.integers(0, n, 50000)
+    return rebalancer, [symbols[i] for i in which], prices[which] * np.exp(rng.normal(0, 0.01, 50000))
+
+def _rebalancer_run(state):
+    rebalancer, symbols, prices = state
+    for symbol, price in zip(symbols, prices):
+        if rebalancer.on_tick(symbol, price):
+            rebalancer.cancel_pending()
+
+CASES = [
+    BenchmarkCase('process_earnings_data', {'small': 100, 'medium': 1000, 'large': 5000},
+                  _process_earnings_setup, _process_earnings_run, lambda n: n * 40, 'records'),
+    BenchmarkCase('calculate_portfolio_value', {'small': 1000, 'medium': 10000, 'large': 100000},
+                  synthetic_portfolio, _portfolio_run, lambda n: n, 'positions'),
+    BenchmarkCase('sentiment_score_texts', {'small': 1000, 'medium': 10000, 'large': 50000},
+                  synthetic_articles, _sentiment_run, lambda k: k, 'articles'),
+    BenchmarkCase('fit_earnings_model', {'small': 50, 'medium': 500, 'large': 2000},
+                  _fit_setup, _fit_run, lambda n: n, 'models'),
+    BenchmarkCase('fit_batched', {'small': 1000, 'medium': 10000, 'large': 50000},
+                  _fit_batched_setup, _fit_batched_run, lambda n: n, 'models'),
+    BenchmarkCase('build_features', {'small': 50, 'medium': 500, 'large': 1000},
+                  _features_setup, _features_run, lambda n: n * 252 * 2, 'bars'),
+    BenchmarkCase('run_backtest', {'small': 50, 'medium': 500, 'large': 1000},
+                  _backtest_setup, _backtest_run, lambda n: n * 252 * 10, 'bars'),
+    BenchmarkCase('rebalancer_on_tick', {'small': 1000, 'medium': 10000, 'large': 100000},
+                  _rebalancer_setup, _rebalancer_run, lambda n: 50000, 'ticks'),
+]
+
+def calibrate(repeat: int = 5) -> float:
+    """
+    Time a fixed reference workload (interpreter-bound loop plus NumPy sorting and matrix
+    products, the same mix as the cases) on this machine, in this process.
+
+    Throughputs are divided by the reference speed, so reports from hosts of different speed,
+    or from one host under different load, remain comparable.
+
+    :param repeat: Timed runs; the median is reported
+    :return: Median seconds per reference run
+    """
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(size=(150, 150))
+    values = rng.normal(size=100_000)
+    timings = []
+    for _ in range(repeat + 1):
+        start = time.perf_counter()
+        table = {}
+        for i in range(100_000):
+            table[i % 997] = table.get(i % 997, 0.0) + i * 0.5
+        np.sort(values)
+        for _ in range(5):
+            matrix @ matrix
+        timings.append(time.perf_counter() - start)
+    # The first run is a warm-up
+    return float(np.median(timings[1:]))
+
+def run_case(case: BenchmarkCase, scale: str, repeat: int = 5, memory: bool = True,
+             min_time: float = 0.2) -> Dict[str, Any]:
+    """
+    Time one case at one scale and optionally measure its peak Python heap allocation.
+
+    Runs shorter than min_time are looped, so every timing is long enough that timer
+    resolution and scheduler jitter stay small against it.
+
+    :param case: BenchmarkCase
+    :param scale: Scale name (key of case.scales)
+    :param repeat: Timed samples; the median is reported
+    :param memory: Run once more under tracemalloc for the peak allocation
+    :param min_time: Minimum seconds per timed sample
+    :return: Result dictionary; 'spread' is the interquartile range of the samples relative to the median
+    """
+    n = case.scales[scale]
+    state = case.setup(n)
+    # Warm-up run: imports, caches, lazy initialisation; also sizes the inner loop
+    start = time.perf_counter()
+    case.run(state)
+    first = time.perf_counter() - start
+    loops = max(1, int(np.ceil(min_time / first))) if first > 0 else 1
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            case.run(state)
+        timings.append((time.perf_counter() - start) / loops)
+    median = float(np.median(timings))
+    q1, q3 = np.percentile(timings, [25, 75])
+    result = {
+        'case': case.name,
+        'scale': scale,
+        'size': n,
+        'items': case.items(n),
+        'unit': case.unit,
+        'loops': loops,
+        'seconds_median': median,
+        'seconds_min': float(min(timings)),
+        'spread': float((q3 - q1) / median) if median > 0 else 0.0,
+        'throughput': case.items(n) / median if median > 0 else float('inf'),
+    }
+    if memory:
+        tracemalloc.start()
+        case.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['peak_mb'] = peak / 2 ** 20
+    return result
+
+def run_suite(scales=('small',), cases: Optional[List[str]] = None, repeat: int = 5, memory: bool = True) -> Dict[str, Any]:
+    """
+    Run the selected cases at the selected scales.
+
+    The calibration workload is timed before and after the cases, and every result also carries
+    its throughput relative to it ('relative_throughput': items per calibration run).
+
+    :param scales: Scale names to run
+    :param cases: Case names to run, None runs all
+    :param repeat: Timed samples per case and scale
+    :param memory: Measure peak allocations with tracemalloc
+    :return: Dictionary with environment metadata and a list of results
+    """
+    selected = [case for case in CASES if cases is None or case.name in cases]
+    unknown = set(cases or []) - {case.name for case in CASES}
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases: {sorted(unknown)}")
+    # Per-symbol INFO logs would dominate the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    before = calibrate()
+    results = []
+    for case in selected:
+        for scale in scales:
+            result = run_case(case, scale, repeat, memory)
+            print(f"{case.name:<28} {scale:<7} {result['size']:>7} -> {result['seconds_median'] * 1000:10.1f} ms  "
+                  f"{result['throughput']:>14,.0f} {case.unit}/s  {result.get('peak_mb', float('nan')):8.1f} MB")
+            results.append(result)
+    calibration = float(np.median([before, calibrate()]))
+    for result in results:
+        result['relative_throughput'] = result['throughput'] * calibration
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'calibration_seconds': calibration,
+        },
+        'results': results,
+    }
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.2) -> List[Dict[str, Any]]:
+    """
+    Compare calibrated throughput against a baseline report.
+
+    Throughput relative to the calibration workload is compared when both reports have it
+    (raw throughput otherwise). A case regresses when it drops by more than the threshold
+    plus the relative spread measured in both runs, so noisy cases need a larger drop.
+
+    :param report: Output of run_suite
+    :param baseline: Earlier output of run_suite
+    :param threshold: Allowed fractional throughput drop on top of the measured noise
+    :return: One row per case/scale present in both, with the ratio, the allowed drop and a 'regressed' flag
+    """
+    reference = {(row['case'], row['scale']): row for row in baseline.get('results', [])}
+    rows = []
+    for row in report['results']:
+        base = reference.get((row['case'], row['scale']))
+        if base is None:
+            continue
+        metric = 'relative_throughput' if 'relative_throughput' in row and 'relative_throughput' in base else 'throughput'
+        ratio = row[metric] / base[metric] if base[metric] else float('inf')
+        allowed = min(threshold + row.get('spread', 0.0) + base.get('spread', 0.0), 0.9)
+        rows.append({'case': row['case'], 'scale': row['scale'], 'metric': metric, 'baseline': base[metric],
+                     'current': row[metric], 'ratio': ratio, 'allowed_drop': allowed,
+                     'regressed': ratio < 1 - allowed})
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the project's hot paths.")
+    parser.add_argument('--scales', default='small', help="Comma-separated scales: small, medium, large")
+    parser.add_argument('--cases', default=None, help="Comma-separated case names (default: all)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-memory', action='store_true', help="Skip tracemalloc peak measurement")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Allowed throughput drop on top of the measured run-to-run spread")
+    parser.add_argument('--update-baseline', action='store_true', help="Write this run as the new baseline")
+    args = parser.parse_args(argv)
+
+    report = run_suite(args.scales.split(','), args.cases.split(',') if args.cases else None, args.repeat,
+                       not args.no_memory)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        rows = compare(report, json.load(f), args.threshold)
+    regressed = [row for row in rows if row['regressed']]
+    for row in rows:
+        flag = "REGRESSED" if row['regressed'] else "ok"
+        print(f"{row['case']:<28} {row['scale']:<7} {row['ratio']:6.2f}x baseline "
+              f"(allowed drop {row['allowed_drop']:.0%})  {flag}")
+    if regressed:
+        print(f"{len(regressed)} case(s) regressed beyond the allowed drop")
+        return 1
+    return 0
+
+# Example usage: python src/benchmark_suite.py --scales small,medium
+if __name__ == "__main__":
+    sys.exit(main())
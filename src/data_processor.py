@@ -1,16 +1,15 @@
 import pandas as pd
 import numpy as np
 
-def process_earnings_data(data):
+from instrumentation import timed
+
+def _add_derived_columns(df):
     """
-    Process the fetched earnings data into a DataFrame, handling potential missing values and adding calculated fields.
+    Add the required raw columns if missing and compute Surprise_Ratio, Revenue and Date in place.
 
-    :param data: Raw JSON data from the API, expected to be a list of dictionaries
-    :return: Processed DataFrame
+    :param df: DataFrame built from raw API records
+    :return: The same DataFrame
     """
-    # Convert list of dictionaries to DataFrame
-    df = pd.DataFrame(data)
-    
     # Ensure necessary columns exist, if not, create them with NaN
     required_columns = ['actualEPS', 'estimatedEPS', 'revenue', 'surprise', 'fiscalPeriod']
     for col in required_columns:
@@ -22,7 +21,7 @@ def process_earnings_data(data):
     df['Surprise_Ratio'] = df['Surprise_Ratio'].replace([np.inf, -np.inf], np.nan)  # Handle division by zero
     
     # Convert revenue to numeric, assuming it might come as string with '$' or ','
-    df['Revenue'] = df['revenue'].replace('[\$,]', '', regex=True).astype(float)
+    df['Revenue'] = df['revenue'].replace(r'[\$,]', '', regex=True).astype(float)
     
     # Calculate MarketCap if available from another source or API call (this part is commented out as we don't have this data)
     # df['MarketCap'] = ... # You would need to fetch or calculate this
@@ -33,20 +32,88 @@ def process_earnings_data(data):
     # Clean up any unwanted columns or add more processing here
     # For example, you might want to convert 'fiscalPeriod' to datetime if needed
     df['Date'] = pd.to_datetime(df['fiscalPeriod'], format='%Y-%m-%d', errors='coerce')
+    return df
+
+@timed("process_earnings_data")
+def process_earnings_data(data):
+    """
+    Process the fetched earnings data into a DataFrame, handling potential missing values and adding calculated fields.
+
+    :param data: Raw JSON data from the API, expected to be a list of dictionaries
+    :return: Processed DataFrame
+    """
+    # Convert list of dictionaries to DataFrame
+    df = _add_derived_columns(pd.DataFrame(data))
     
     # Drop rows with all NaN values if any
     df = df.dropna(how='all')
     
-    # Sort by date if 'Date' column exists
+    # Sort by date if 'Date' column exists (stable, so rows sharing a date keep their API order)
     if 'Date' in df.columns:
-        df = df.sort_values('Date')
+        df = df.sort_values('Date', kind='stable')
     
     # Reset index after sorting/dropping
     df = df.reset_index(drop=True)
     
     return df
 
+def process_earnings_data_incremental(processed, new_data):
+    """
+    Merge new raw earnings records into an already-processed DataFrame.
+
+    Derived columns are computed for the new rows only, and the rows are merged into the
+    existing Date order with a single positional take instead of re-sorting the whole frame.
+    The result equals process_earnings_data(old_raw + new_data) when both share the same raw fields.
+
+    :param processed: DataFrame previously returned by process_earnings_data (sorted by Date)
+    :param new_data: Raw JSON records for the new periods, expected to be a list of dictionaries
+    :return: Processed DataFrame covering both old and new records
+    """
+    if not new_data:
+        return processed
+    new_rows = _add_derived_columns(pd.DataFrame(new_data)).dropna(how='all')
+    if processed is None or processed.empty:
+        return new_rows.sort_values('Date', kind='stable').reset_index(drop=True)
+    
+    new_rows = new_rows.sort_values('Date', kind='stable')
+    combined = pd.concat([processed, new_rows], ignore_index=True)
+    
+    old_dates = processed['Date'].to_numpy()
+    new_dates = new_rows['Date'].to_numpy()
+    n_old, n_new = len(old_dates), len(new_dates)
+    # Fast path: every new period is later than the stored history (the nightly case)
+    if n_new == 0 or (not np.isnat(old_dates[-1]) and not np.isnat(new_dates[0]) and new_dates[0] >= old_dates[-1]) \
+            or np.isnat(new_dates).all() and not np.isnat(old_dates).any():
+        return combined
+    
+    # Positions of new rows among the old ones; NaT sorts last, ties go after existing rows
+    insert_at = np.searchsorted(old_dates, new_dates, side='right')
+    new_positions = insert_at + np.arange(n_new)
+    order = np.empty(n_old + n_new, dtype=np.intp)
+    is_new = np.zeros(n_old + n_new, dtype=bool)
+    is_new[new_positions] = True
+    order[new_positions] = np.arange(n_old, n_old + n_new)
+    order[~is_new] = np.arange(n_old)
+    return combined.take(order).reset_index(drop=True)
+
+def verify_incremental(old_data, new_data):
+    """
+    Check that the incremental path reproduces a full recompute exactly.
+
+    :param old_data: Raw records already processed
+    :param new_data: Raw records arriving later
+    :return: True if both paths produce identical DataFrames
+    """
+    full = process_earnings_data(list(old_data) + list(new_data))
+    incremental = process_earnings_data_incremental(process_earnings_data(old_data), new_data)
+    try:
+        pd.testing.assert_frame_equal(incremental, full, check_dtype=True)
+    except AssertionError:
+        return False
+    return True
+
 # Example usage
 # Assuming 'data_from_api' is the result from your fetch_earnings_data function
 # data_from_api = fetch_earnings_data('AAPL', 'YOUR_API_TOKEN', 'https://cloud.iexapis.com/stable')
-# processed_data = process_earnings_data(data_from_api)
\ No newline at end of file
+# processed_data = process_earnings_data(data_from_api)
+# processed_data = process_earnings_data_incremental(processed_data, new_quarters_from_api)
\ No newline at end of file
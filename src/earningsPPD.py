@@ -1,15 +1,38 @@
-# src/predict.py
+import sys
+
 import pandas as pd
-from sklearn.externals import joblib
 
-# Load the trained model
-model = joblib.load('../models/saved_model.pkl')
+from model_registry import ModelRegistry
+
+def predict_csv(csv_path, symbol=None, registry=None):
+    """
+    Predict earnings for the rows of a processed-data CSV using saved models.
+
+    :param csv_path: Path to a CSV with the model feature columns (and optionally a 'symbol' column)
+    :param symbol: Symbol whose model to use when the CSV has no 'symbol' column
+    :param registry: ModelRegistry to load models from, defaults to the ../models registry
+    :return: Series of predictions aligned with the CSV rows
+    """
+    registry = registry or ModelRegistry()
+    new_data = pd.read_csv(csv_path)
+
+    if 'symbol' not in new_data.columns:
+        if symbol is None:
+            raise ValueError("CSV has no 'symbol' column; pass the symbol whose model to use.")
+        return pd.Series(registry.predict(symbol, new_data), index=new_data.index)
+
+    predictions = pd.Series(index=new_data.index, dtype=float)
+    for row_symbol, rows in new_data.groupby('symbol'):
+        predictions[rows.index] = registry.predict(row_symbol, rows)
+    return predictions
 
-# Load new data for prediction
-new_data = pd.read_csv('../data/processed/new_data.csv')
+if __name__ == "__main__":
+    # Usage: python earningsPPD.py [SYMBOL] [CSV_PATH]
+    symbol = sys.argv[1] if len(sys.argv) > 1 else None
+    csv_path = sys.argv[2] if len(sys.argv) > 2 else '../data/processed/new_data.csv'
 
-# Make predictions
-predictions = model.predict(new_data)
+    # Make predictions
+    predictions = predict_csv(csv_path, symbol)
 
-# Output predictions
-print(predictions)
+    # Output predictions
+    print(predictions)
@@ -4,16 +4,21 @@ from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error, r2_score
 from sklearn.exceptions import NotFittedError
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import logging
 
 from api_fetcher import fetch_earnings_data
 from data_processor import process_earnings_data
+from earnings_store import EarningsStore
+from instrumentation import timed
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+FEATURES = ['Revenue', 'Surprise_Ratio']
+MIN_SAMPLES = 10  # Example threshold, adjust based on your needs
+
 def validate_params(symbol: str, token: str, api_url: str, period: str = "1y") -> None:
     """
     Validate input parameters for the earnings prediction model.
@@ -33,7 +38,60 @@ def validate_params(symbol: str, token: str, api_url: str, period: str = "1y") -
     if period not in ["1d", "1m", "3m", "6m", "1y", "2y", "5y", "10y", "ytd", "max"]:
         raise ValueError("Invalid period. Choose from '1d', '1m', '3m', '6m', '1y', '2y', '5y', '10y', 'ytd', 'max'.")
 
-def earnings_prediction_model(symbol: str, token: str, api_url: str, period: str = "1y") -> Optional[LinearRegression]:
+@timed("model_fit")
+def fit_earnings_model(data: pd.DataFrame, symbol: str) -> Optional[Tuple[LinearRegression, float, float]]:
+    """
+    Train and evaluate the earnings regression on an already-processed DataFrame.
+
+    :param data: Processed earnings DataFrame (see process_earnings_data)
+    :param symbol: Stock symbol, used for logging
+    :return: Tuple of (model, test MSE, test R^2) or None if the data is unsuitable
+    """
+    # Check if necessary columns exist in the processed data
+    features = FEATURES
+    if not all(feature in data.columns for feature in features):
+        logger.error(f"Required features {features} are not all present in the data for {symbol}")
+        return None
+    
+    # Prepare features and target
+    X = data[features]
+    y = data['actualEPS']
+    
+    # Check for sufficient data
+    if len(X) < MIN_SAMPLES:
+        logger.warning(f"Insufficient data for {symbol} to train the model. Only {len(X)} samples available.")
+        return None
+    
+    # Split the data into training and testing sets
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    
+    # Train the model
+    logger.info(f"Training model for {symbol}")
+    model = LinearRegression()
+    model.fit(X_train, y_train)
+    
+    # Make predictions
+    y_pred = model.predict(X_test)
+    
+    # Evaluate the model
+    mse = mean_squared_error(y_test, y_pred)
+    r2 = r2_score(y_test, y_pred)
+    
+    logger.info(f"Model evaluation for {symbol}:")
+    logger.info(f"Mean Squared Error: {mse}")
+    logger.info(f"R^2 Score: {r2}")
+    
+    # Check if the model is properly fitted
+    try:
+        model.predict(X_test)
+    except NotFittedError:
+        logger.error("Model was not fitted properly.")
+        return None
+    
+    return model, mse, r2
+
+def earnings_prediction_model(symbol: str, token: str, api_url: str, period: str = "1y",
+                              store: Optional[EarningsStore] = None) -> Optional[LinearRegression]:
     """
     Fetch, process, and predict earnings for a given stock symbol.
 
@@ -41,66 +99,34 @@ def earnings_prediction_model(symbol: str, token: str, api_url: str, period: str
     :param token: API token for authentication
     :param api_url: URL of the API endpoint
     :param period: Time period for earnings data, default is '1y' for one year
+    :param store: Optional EarningsStore; fresh stored data for the same period is used instead of
+                  refetching and reprocessing, and freshly processed data is written back to it
     :return: Trained LinearRegression model or None if data fetching or processing fails
     """
     try:
         # Validate parameters
         validate_params(symbol, token, api_url, period)
         
-        # Fetch data
-        logger.info(f"Fetching earnings data for {symbol}")
-        raw_data = fetch_earnings_data(symbol, token, api_url, period)
-        
-        if raw_data is None:
-            logger.warning(f"No data available for {symbol}")
-            return None
-        
-        # Process data
-        logger.info(f"Processing data for {symbol}")
-        data = process_earnings_data(raw_data)
-        
-        # Check if necessary columns exist in the processed data
-        features = ['Revenue', 'Surprise_Ratio']
-        if not all(feature in data.columns for feature in features):
-            logger.error(f"Required features {features} are not all present in the data for {symbol}")
-            return None
-        
-        # Prepare features and target
-        X = data[features]
-        y = data['actualEPS']
-        
-        # Check for sufficient data
-        if len(X) < 10:  # Example threshold, adjust based on your needs
-            logger.warning(f"Insufficient data for {symbol} to train the model. Only {len(X)} samples available.")
-            return None
-        
-        # Split the data into training and testing sets
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        # Train the model
-        logger.info(f"Training model for {symbol}")
-        model = LinearRegression()
-        model.fit(X_train, y_train)
-        
-        # Make predictions
-        y_pred = model.predict(X_test)
-        
-        # Evaluate the model
-        mse = mean_squared_error(y_test, y_pred)
-        r2 = r2_score(y_test, y_pred)
-        
-        logger.info(f"Model evaluation for {symbol}:")
-        logger.info(f"Mean Squared Error: {mse}")
-        logger.info(f"R^2 Score: {r2}")
-        
-        # Check if the model is properly fitted
-        try:
-            model.predict(X_test)
-        except NotFittedError:
-            logger.error("Model was not fitted properly.")
-            return None
+        if store is not None and store.is_fresh(symbol, period):
+            logger.info(f"Loading stored earnings data for {symbol}")
+            data = store.load_frame(symbol)
+        else:
+            # Fetch data
+            logger.info(f"Fetching earnings data for {symbol}")
+            raw_data = fetch_earnings_data(symbol, token, api_url, period)
+            
+            if raw_data is None:
+                logger.warning(f"No data available for {symbol}")
+                return None
+            
+            # Process data
+            logger.info(f"Processing data for {symbol}")
+            data = process_earnings_data(raw_data)
+            if store is not None:
+                store.write(symbol, data, period)
         
-        return model
+        result = fit_earnings_model(data, symbol)
+        return result[0] if result else None
     
     except Exception as e:
         logger.error(f"An error occurred while processing {symbol}: {str(e)}")
@@ -0,0 +1,306 @@
+import os
+import re
+import json
+import time
+import shutil
+import tempfile
+import threading
+import logging
+
+import numpy as np
+import pandas as pd
+
+from data_processor import process_earnings_data
+from model_registry import _lock_file, _unlock_file
+
+# Set up logging for better error tracking
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "balancing-wheel", "earnings_store")
+
+# Stored data older than this (seconds) is refetched; new quarters are reported at most daily
+DEFAULT_MAX_AGE = 24 * 3600
+# Ticker-like names only: symbols become directory names
+SYMBOL_PATTERN = re.compile(r"^[A-Za-z0-9^][A-Za-z0-9.^=_-]{0,31}$")
+
+# Times a read re-resolves CURRENT when the version it resolved was removed under it
+READ_ATTEMPTS = 3
+
+FEATURE_COLUMNS = ['Revenue', 'Surprise_Ratio']
+TARGET_COLUMN = 'actualEPS'
+
+class EarningsStore:
+    """
+    Persistent columnar store for processed earnings frames, one partition per symbol.
+
+    Each partition holds one .npy file per column inside a versioned directory; a CURRENT
+    file names the live version and is swapped atomically on every write, under a file lock
+    shared by all processes. The previous version is kept until the next write, so a reader
+    that resolved CURRENT just before a swap can still open it, and readers holding
+    memory-mapped arrays from an older version are never disturbed.
+
+    Each version records the period it was fetched for and when, so callers can tell
+    (is_fresh) whether stored data still answers a request or must be refetched.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, max_age=DEFAULT_MAX_AGE):
+        """
+        :param root: Store directory, created if missing
+        :param max_age: Seconds after which stored data is no longer fresh, None to never expire
+        """
+        self.root = root
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _partition(self, symbol):
+        if not isinstance(symbol, str) or not SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"Invalid symbol for the earnings store: {symbol!r}")
+        return os.path.join(self.root, symbol)
+
+    def _current_version(self, symbol):
+        try:
+            with open(os.path.join(self._partition(symbol), "CURRENT"), "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def symbols(self):
+        """
+        :return: Sorted list of symbols with a stored partition
+        """
+        return sorted(name for name in os.listdir(self.root)
+                      if SYMBOL_PATTERN.match(name) and self._current_version(name))
+
+    def has(self, symbol):
+        """
+        :param symbol: Stock symbol
+        :return: True if a partition exists for the symbol
+        """
+        return self._current_version(symbol) is not None
+
+    def metadata(self, symbol):
+        """
+        :param symbol: Stock symbol
+        :return: Dictionary with the stored 'period', 'fetched_at' (epoch seconds) and 'rows'
+        """
+        meta = self._read(symbol, lambda directory, meta: meta)
+        return {'period': meta.get('period'), 'fetched_at': meta.get('fetched_at'), 'rows': meta['rows']}
+
+    def is_fresh(self, symbol, period=None, max_age=None):
+        """
+        Whether stored data can be used instead of refetching.
+
+        :param symbol: Stock symbol
+        :param period: Period the caller needs; data stored for another period is not fresh
+        :param max_age: Maximum age in seconds, defaults to the store's max_age
+        :return: True if a partition exists, matches the period and has not expired
+        """
+        if not self.has(symbol):
+            return False
+        meta = self.metadata(symbol)
+        if period is not None and meta['period'] != period:
+            return False
+        max_age = self.max_age if max_age is None else max_age
+        if max_age is not None and (meta['fetched_at'] is None or time.time() - meta['fetched_at'] > max_age):
+            return False
+        return True
+
+    def _read_meta(self, symbol):
+        version = self._current_version(symbol)
+        if version is None:
+            raise KeyError(f"No stored earnings data for {symbol}")
+        directory = os.path.join(self._partition(symbol), version)
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            return directory, json.load(f)
+
+    def _read(self, symbol, read):
+        """
+        Run read(directory, meta) against the live version, re-resolving CURRENT if writers in
+        other processes removed the resolved version before it was opened.
+        """
+        for attempt in range(READ_ATTEMPTS):
+            try:
+                return read(*self._read_meta(symbol))
+            except FileNotFoundError:
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+
+    def write(self, symbol, df, period=None, fetched_at=None):
+        """
+        Replace the partition for a symbol with a processed earnings frame.
+
+        :param symbol: Stock symbol
+        :param df: DataFrame as returned by process_earnings_data
+        :param period: Period the data was fetched for
+        :param fetched_at: Epoch seconds the data was fetched, defaults to now
+        """
+        partition = self._partition(symbol)
+        os.makedirs(partition, exist_ok=True)
+        # Built under a temporary name so a concurrent writer's cleanup never sees it half-written
+        directory = tempfile.mkdtemp(dir=partition, prefix=".tmp-")
+        columns = []
+        for name in df.columns:
+            values, mask, kind = _encode_column(df[name])
+            np.save(os.path.join(directory, f"{name}.npy"), values, allow_pickle=False)
+            if mask is not None:
+                np.save(os.path.join(directory, f"{name}.mask.npy"), mask, allow_pickle=False)
+            columns.append({'name': name, 'kind': kind, 'dtype': str(df[name].dtype), 'has_mask': mask is not None})
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({'symbol': symbol, 'rows': len(df), 'columns': columns, 'period': period,
+                       'fetched_at': time.time() if fetched_at is None else fetched_at}, f)
+
+        with self._lock, open(os.path.join(partition, ".lock"), "a+b") as lock_file:
+            _lock_file(lock_file)
+            try:
+                version = "v-" + os.path.basename(directory)[len(".tmp-"):]
+                os.replace(directory, os.path.join(partition, version))
+                previous = self._current_version(symbol)
+                fd, tmp_path = tempfile.mkstemp(dir=partition, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(version)
+                os.replace(tmp_path, os.path.join(partition, "CURRENT"))
+                # Keep the live and the previous version; anything older (including versions
+                # orphaned by concurrent or crashed writers) is removed. Open memory maps keep
+                # the unlinked files alive until they are released.
+                for name in os.listdir(partition):
+                    if name.startswith("v-") and name not in (version, previous):
+                        shutil.rmtree(os.path.join(partition, name), ignore_errors=True)
+            finally:
+                _unlock_file(lock_file)
+
+    def load_columns(self, symbol, columns=None):
+        """
+        Memory-map stored columns without copying.
+
+        String columns come back as fixed-width unicode arrays with '' for missing values.
+
+        :param symbol: Stock symbol
+        :param columns: Optional list of column names, defaults to all columns
+        :return: Dictionary of column name -> read-only NumPy array
+        """
+        def read(directory, meta):
+            names = [c['name'] for c in meta['columns']]
+            wanted = names if columns is None else columns
+            missing = [name for name in wanted if name not in names]
+            if missing:
+                raise KeyError(f"Columns {missing} are not stored for {symbol}")
+            return {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in wanted}
+        return self._read(symbol, read)
+
+    def load_frame(self, symbol, columns=None):
+        """
+        Load a stored partition back into a DataFrame.
+
+        Numeric, datetime and string columns round-trip exactly; mixed-type object
+        columns (e.g. raw 'revenue') come back as strings.
+
+        :param symbol: Stock symbol
+        :param columns: Optional list of column names, defaults to all columns
+        :return: DataFrame
+        """
+        def read(directory, meta):
+            data = {}
+            for column in meta['columns']:
+                name = column['name']
+                if columns is not None and name not in columns:
+                    continue
+                values = np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')
+                mask = None
+                if column['has_mask']:
+                    mask = np.load(os.path.join(directory, f"{name}.mask.npy"))
+                data[name] = _decode_column(values, mask, column['kind'], column.get('dtype', 'object'))
+            return pd.DataFrame(data, columns=[c for c in data])
+        return self._read(symbol, read)
+
+    def load_features(self, symbol, features=FEATURE_COLUMNS, target=TARGET_COLUMN):
+        """
+        Memory-mapped feature matrix and target vector for model training and prediction.
+
+        :param symbol: Stock symbol
+        :param features: Feature column names
+        :param target: Target column name
+        :return: Tuple of (X as an (n, len(features)) float array, y as an (n,) float array)
+        """
+        arrays = self.load_columns(symbol, list(features) + [target])
+        X = np.column_stack([arrays[name] for name in features]) if features else np.empty((len(arrays[target]), 0))
+        return X, arrays[target]
+
+    def append(self, symbol, df, period=None):
+        """
+        Incrementally add new fiscal periods for a symbol.
+
+        Rows whose Date is already stored are replaced by the new values; the result stays sorted by Date.
+
+        :param symbol: Stock symbol
+        :param df: Processed DataFrame holding only the new periods
+        :param period: Period the new data was fetched for, defaults to the stored period
+        :return: Number of rows in the partition after the append
+        """
+        if not self.has(symbol):
+            self.write(symbol, df.reset_index(drop=True), period)
+            return len(df)
+        if period is None:
+            period = self.metadata(symbol)['period']
+        existing = self.load_frame(symbol)
+        if 'Date' in df.columns and 'Date' in existing.columns:
+            existing = existing[~existing['Date'].isin(df['Date'].dropna())]
+        combined = pd.concat([existing, df], ignore_index=True)
+        if 'Date' in combined.columns:
+            combined = combined.sort_values('Date', kind='stable')
+        combined = combined.reset_index(drop=True)
+        self.write(symbol, combined, period)
+        return len(combined)
+
+    def update(self, symbol, raw_records, period=None):
+        """
+        Process only new raw API records and append them to the symbol's partition.
+
+        :param symbol: Stock symbol
+        :param raw_records: Raw JSON records for the new fiscal periods
+        :param period: Period the records were fetched for, defaults to the stored period
+        :return: Number of rows in the partition after the update
+        """
+        if not raw_records:
+            return self.metadata(symbol)['rows'] if self.has(symbol) else 0
+        return self.append(symbol, process_earnings_data(raw_records), period)
+
+    def delete(self, symbol):
+        """
+        Remove a symbol's partition.
+
+        :param symbol: Stock symbol
+        """
+        shutil.rmtree(self._partition(symbol), ignore_errors=True)
+
+def _encode_column(series):
+    """
+    Convert a Series into a NumPy array that can be stored without pickling.
+
+    :return: Tuple of (values, null mask or None, kind)
+    """
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return series.to_numpy(dtype=bool), None, 'bool'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return series.to_numpy(), None, 'datetime'
+    if pd.api.types.is_numeric_dtype(dtype):
+        return series.to_numpy(dtype=float if series.isna().any() else dtype), None, 'numeric'
+    mask = series.isna().to_numpy()
+    values = np.asarray(series.astype(object).where(~mask, '').map(str).to_numpy(dtype=str))
+    if values.dtype.itemsize == 0:
+        values = values.astype('U1')
+    return values, (mask if mask.any() else None), 'string'
+
+def _decode_column(values, mask, kind, dtype):
+    if kind != 'string':
+        return values
+    decoded = pd.Series(values, dtype=object)
+    if mask is not None:
+        decoded[mask] = None
+    return decoded if dtype == 'object' else decoded.astype(dtype)
+
+# Example usage
+# store = EarningsStore()
+# store.write('AAPL', process_earnings_data(fetch_earnings_data('AAPL', 'YOUR_API_TOKEN', 'https://cloud.iexapis.com/stable')), period='1y')
+# X, y = store.load_features('AAPL')
@@ -1,26 +1,34 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error, r2_score
-from textblob import TextBlob
 import requests
 # import json (commented out as it is not used)
 import logging
 
+from response_cache import resolve_cache
+from sentiment import get_default_engine
+from news_stream import NewsIngestor, news_sentiment_history
+from feature_pipeline import FEATURE_COLUMNS, build_features, fetch_bars, get_forest, latest_features, set_forest, train_forest
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def fetch_stock_data(symbol, api_key, source='NASDAQ'):
+def fetch_stock_data(symbol, api_key, source='NASDAQ', cache=None):
     """
     Fetch stock data from NASDAQ or any other open API.
     
     :param symbol: Stock symbol like 'SNOW' for Snowflake
     :param api_key: API key for authentication
     :param source: Data source, default is NASDAQ
+    :param cache: Optional ResponseCache, None uses the default cache and False disables caching
     :return: Dictionary containing stock data or None if fetch fails
     """
+    cache = resolve_cache(cache)
+    if cache is not None:
+        cached = cache.get('stock_data', symbol, 'latest', source=source)
+        if cached is not None:
+            return cached
+
     if source == 'NASDAQ':
         url = f'https://www.nasdaq.com/api/v1/historical/{symbol}/stocks'
     else:
@@ -32,27 +40,21 @@ def fetch_stock_data(symbol, api_key, source='NASDAQ'):
     try:
         response = requests.get(url, params=params)
         response.raise_for_status()
-        return response.json()
+        data = response.json()
+        if cache is not None:
+            cache.put('stock_data', symbol, 'latest', data, source=source)
+        return data
     except requests.RequestException as e:
         logger.error(f"Failed to fetch data for {symbol}: {e}")
         return None
-    
-    def analyze_sentiment(text):
-        """
-        Analyze sentiment of text using TextBlob.
-        
-        :param text: Text to analyze
-        :return: Sentiment polarity (-1 to 1)
-        """
-        blob = TextBlob(text)
-        return blob.sentiment.polarity
-
-def fetch_and_analyze_news(symbol, api_key):
+
+def fetch_and_analyze_news(symbol, api_key, engine=None):
     """
     Fetch news related to the stock and analyze sentiment.
     
     :param symbol: Stock symbol
     :param api_key: API key for news API
+    :param engine: Optional SentimentEngine, defaults to the shared engine
     :return: Average sentiment score from news articles
     """
     url = f'https://newsapi.org/v2/everything?q={symbol}&apiKey={api_key}'
@@ -61,57 +63,70 @@ def fetch_and_analyze_news(symbol, api_key):
         response.raise_for_status()
         news_data = response.json()
         articles = news_data.get('articles', [])
-        sentiments = [analyze_sentiment(article['description']) for article in articles if article.get('description')]
-        return np.mean(sentiments) if sentiments else 0
+        descriptions = [article['description'] for article in articles if article.get('description')]
+        sentiments = (engine or get_default_engine()).score_texts(descriptions)
+        return np.mean(sentiments) if len(sentiments) else 0
     except requests.RequestException as e:
         logger.error(f"Failed to fetch news for {symbol}: {e}")
         return 0
-    def prepare_data(stock_data, news_sentiment):
-        """
-        Prepare data for model training, combining stock metrics with news sentiment.
-        
-        :param stock_data: Dictionary containing stock data
-        :param news_sentiment: Average sentiment from news
-        :return: DataFrame with features
-        """
-        # Example features, adjust based on actual data structure
-        features = {
-            'Open': stock_data['open'],
-            'High': stock_data['high'],
-            'Low': stock_data['low'],
-            'Close': stock_data['close'],
-            'Volume': stock_data['volume'],
-            'News_Sentiment': news_sentiment
-        }
-        return pd.DataFrame([features])
-
-def train_model(X, y):
+
+_news_ingestor = None
+
+def stream_news_sentiment(symbol, api_key, ingestor=None):
     """
-    Train a Random Forest model for stock prediction.
-    
-    :param X: Features DataFrame
-    :param y: Target variable (e.g., future stock price or movement)
-    :return: Trained model
+    Ingest only unseen news for the stock and return its rolling, time-decayed sentiment.
+
+    Unlike fetch_and_analyze_news, repeated calls do not rescore articles already seen.
+
+    :param symbol: Stock symbol
+    :param api_key: API key for news API
+    :param ingestor: Optional NewsIngestor, defaults to a process-wide one
+    :return: Decayed average sentiment score
     """
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    model = RandomForestRegressor(n_estimators=100, random_state=42)
-    model.fit(X_train, y_train)
+    global _news_ingestor
+    if ingestor is None:
+        if _news_ingestor is None:
+            _news_ingestor = NewsIngestor()
+        ingestor = _news_ingestor
+    ingestor.ingest(symbol, api_key)
+    return ingestor.sentiment(symbol)
 
-    # Evaluate model
-    y_pred = model.predict(X_test)
-    mse = mean_squared_error(y_test, y_pred)
-    r2 = r2_score(y_test, y_pred)
+def train_universe_forest(symbols, news_api_key, bars=None, engine=None, **kwargs):
+    """
+    Train the shared forest once over every symbol's history, with dated news sentiment
+    joined onto the bars, and install it for reuse (see feature_pipeline.set_forest).
 
-    logger.info(f"Model Performance - MSE: {mse}, R2 Score: {r2}")
-    return model
+    :param symbols: Stock symbols of the universe
+    :param news_api_key: API key for news data
+    :param bars: Optional historical OHLCV bars for the universe, fetched with yfinance if omitted
+    :param engine: Optional SentimentEngine, defaults to the shared engine
+    :param kwargs: Extra options passed to train_forest
+    :return: Fitted forest, or None if no bars are available
+    """
+    if bars is None:
+        bars = fetch_bars(list(symbols))
+    if bars.empty:
+        return None
+    rows = []
+    for symbol in symbols:
+        rows.extend(news_sentiment_history(symbol, news_api_key, engine=engine))
+    sentiment = pd.DataFrame(rows, columns=['date', 'symbol', 'sentiment'])
+    if len(sentiment):
+        sentiment['date'] = pd.to_datetime(sentiment['date'])
+    logger.info(f"Training forest over {bars['symbol'].nunique()} symbols with {len(sentiment)} days of news sentiment")
+    forest = train_forest(build_features(bars, sentiment=sentiment), **kwargs)
+    set_forest(forest)
+    return forest
 
-def stock_analysis(symbol, stock_api_key, news_api_key):
+def stock_analysis(symbol, stock_api_key, news_api_key, bars=None, model=None):
     """
     Analyze a given stock, considering financial data, news sentiment, and provide investment advice.
     
     :param symbol: Stock symbol to analyze
     :param stock_api_key: API key for stock data
     :param news_api_key: API key for news data
+    :param bars: Optional historical OHLCV bars (see feature_pipeline), fetched with yfinance if omitted
+    :param model: Optional pre-trained forest, defaults to the shared forest (see train_universe_forest)
     :return: Analysis summary
     """
     # Fetch stock data
@@ -121,36 +136,62 @@ def stock_analysis(symbol, stock_api_key, news_api_key):
     # Fetch and analyze news sentiment
     news_sentiment = fetch_and_analyze_news(symbol, news_api_key)
     
-    # Prepare data
-    features_df = prepare_data(stock_data, news_sentiment)
-    
-    # Here you would typically have historical data to train the model, 
-    # but for this example, we'll simulate with dummy data
-    # y = stock_data['future_price'] or some other target metric
-    y = np.random.rand(len(features_df))  # Placeholder for actual target
+    # Build rolling features from historical bars instead of a single quote
+    if bars is None:
+        bars = fetch_bars([symbol])
+    symbol_bars = bars[bars['symbol'] == symbol] if not bars.empty else bars
+    if symbol_bars.empty:
+        return "Failed to fetch historical bars."
+    features_df = latest_features(symbol_bars, news_sentiment)
     
-    # Train the model (in practice, you'd use historical data)
-    model = train_model(features_df, y)
+    # Reuse the shared forest; without one, train it over every symbol in `bars`
+    model = model or get_forest() or train_universe_forest(sorted(bars['symbol'].unique()), news_api_key, bars)
     
-    # Predict future movement or price
-    prediction = model.predict(features_df)
+    # Predict the forward return
+    prediction = model.predict(features_df[FEATURE_COLUMNS])
 
     # Simplified analysis
     analysis = {
         'Symbol': symbol,
         'Current Price': stock_data['close'],
         'News Sentiment': news_sentiment,
-        'Predicted Movement': 'Up' if prediction[0] > stock_data['close'] else 'Down',
-        'Investment Recommendation': 'Consider Buying' if prediction[0] > stock_data['close'] and news_sentiment > 0 else 'Hold/Sell'
+        'Predicted Movement': 'Up' if prediction[0] > 0 else 'Down',
+        'Investment Recommendation': 'Consider Buying' if prediction[0] > 0 and news_sentiment > 0 else 'Hold/Sell'
     }
     
     return analysis
 
+def analyze_universe(symbols, stock_api_key, news_api_key, bars=None):
+    """
+    Analyze many stocks: fetch their bars once, train the shared forest once over all of them,
+    then run stock_analysis for each symbol with that forest.
+
+    :param symbols: Stock symbols to analyze
+    :param stock_api_key: API key for stock data
+    :param news_api_key: API key for news data
+    :param bars: Optional historical OHLCV bars for all symbols, fetched with yfinance if omitted
+    :return: Dictionary of symbol -> analysis summary
+    """
+    if bars is None:
+        bars = fetch_bars(list(symbols))
+    if bars.empty:
+        return {symbol: "Failed to fetch historical bars." for symbol in symbols}
+    model = train_universe_forest(symbols, news_api_key, bars)
+    results = {}
+    for symbol in symbols:
+        # One bad symbol must not abort the rest of the universe
+        try:
+            results[symbol] = stock_analysis(symbol, stock_api_key, news_api_key, bars=bars, model=model)
+        except Exception as e:
+            logger.error(f"Analysis failed for {symbol}: {e}")
+            results[symbol] = f"Analysis failed: {e}"
+    return results
+
 # Example usage
 if __name__ == "__main__":
-    symbol = 'SNOW'  # Snowflake
+    symbols = ['SNOW', 'AAPL', 'MSFT']
     stock_api_key = 'YOUR_STOCK_API_KEY'
     news_api_key = 'YOUR_NEWS_API_KEY'
     
-    result = stock_analysis(symbol, stock_api_key, news_api_key)
-    print(result)
\ No newline at end of file
+    for symbol, result in analyze_universe(symbols, stock_api_key, news_api_key).items():
+        print(symbol, result)
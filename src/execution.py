@@ -0,0 +1,467 @@
+import time
+import uuid
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import requests
+
+from api_fetcher import get_session
+from rebalancer import Order
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = {'new', 'accepted', 'pending_new', 'partially_filled'}
+
+@dataclass
+class OrderTicket:
+    """
+    Lifecycle of one submitted order.
+
+    status: 'pending' until acknowledged (or, after an unconfirmed submission, until the broker is
+    asked about it), then the broker's status ('accepted', 'partially_filled', 'filled', 'canceled',
+    'rejected', ...), or 'failed' if the order provably never reached the broker
+    """
+    order: Order
+    client_order_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    broker_id: Optional[str] = None
+    status: str = 'pending'
+    filled_quantity: float = 0.0
+    average_price: Optional[float] = None
+    error: Optional[str] = None
+    submitted_at: float = 0.0
+    acked_at: Optional[float] = None
+    filled_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.status == 'pending' or self.status in OPEN_STATUSES
+
+class TokenBucket:
+    """
+    Local rate limiter: `rate` tokens per second, bursts of up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        :param rate: Tokens added per second
+        :param capacity: Maximum stored tokens, defaults to one second's worth
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Wait until `tokens` are available and take them.
+        """
+        if tokens > self.capacity:
+            raise ValueError("Cannot acquire more tokens than the bucket holds.")
+        async with self._lock:
+            self._refill()
+            while self.tokens < tokens:
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= tokens
+
+class BrokerAdapter(ABC):
+    """
+    Interface every broker implementation provides to the ExecutionEngine.
+    """
+
+    # Orders the broker accepts in one submission call
+    max_batch_size: int = 1
+
+    def requests_for(self, n_orders: int) -> int:
+        """
+        :return: API requests (rate-limit tokens) needed to submit n_orders in one batch
+        """
+        return n_orders if self.max_batch_size == 1 else 1
+
+    @abstractmethod
+    async def submit_batch(self, tickets: List[OrderTicket]) -> None:
+        """
+        Submit up to max_batch_size orders, filling in broker_id/status (or error) on each ticket.
+        """
+
+    @abstractmethod
+    async def refresh(self, tickets: List[OrderTicket]) -> None:
+        """
+        Update status, filled quantity and average price of open tickets.
+        """
+
+    @abstractmethod
+    async def cancel(self, ticket: OrderTicket) -> None:
+        """
+        Request cancellation of an open order.
+        """
+
+    def close(self) -> None:
+        """
+        Release connections and background resources.
+        """
+
+class AlpacaBroker(BrokerAdapter):
+    """
+    Alpaca Trading API v2 over a persistent keep-alive session.
+
+    Alpaca takes one order per POST, so a batch is sent as concurrent requests over the pooled
+    connections; open orders are refreshed with one list call per poll, plus a lookup by client
+    order id for any ticket too old to appear in that list.
+    """
+
+    # Orders returned by one list call (the API maximum)
+    list_limit = 500
+
+    max_batch_size = 1
+
+    def __init__(self, key_id: str, secret_key: str, base_url: str = "https://paper-api.alpaca.markets",
+                 max_in_flight: int = 8, timeout: float = 10.0, session: Optional[requests.Session] = None):
+        """
+        :param key_id: APCA-API-KEY-ID
+        :param secret_key: APCA-API-SECRET-KEY
+        :param base_url: Trading API host, defaults to paper trading
+        :param max_in_flight: Concurrent requests (should not exceed the session's pool size)
+        :param timeout: Per-request timeout in seconds
+        :param session: requests.Session, defaults to the shared pooled session
+        """
+        if not key_id or not secret_key:
+            raise ValueError("Alpaca key id and secret key must be non-empty strings.")
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'APCA-API-KEY-ID': key_id, 'APCA-API-SECRET-KEY': secret_key}
+        self.timeout = timeout
+        self.session = session or get_session(pool_size=max_in_flight)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+
+    def _post_order(self, ticket: OrderTicket) -> None:
+        """
+        Place one order. Only an answer that proves the order was not placed (a 4xx response, or a
+        failure before the request left) ends the ticket; after a timeout, a dropped connection, a
+        5xx or an unreadable body the order may be live, so the ticket stays 'pending' and refresh()
+        reconciles it by client order id.
+        """
+        order = ticket.order
+        payload = {'symbol': order.symbol, 'qty': str(order.quantity), 'side': order.side, 'type': 'market',
+                   'time_in_force': 'day', 'client_order_id': ticket.client_order_id}
+        try:
+            response = self.session.post(f"{self.base_url}/v2/orders", json=payload, headers=self.headers,
+                                         timeout=self.timeout)
+        except requests.exceptions.ConnectTimeout as e:
+            ticket.status, ticket.error = 'failed', str(e)
+            return
+        except (requests.Timeout, requests.ConnectionError) as e:
+            ticket.error = f"unconfirmed: {e}"
+            logger.warning(f"Order {ticket.client_order_id} unconfirmed, reconciling on refresh: {e}")
+            return
+        except requests.RequestException as e:
+            ticket.status, ticket.error = 'failed', str(e)
+            return
+        if 400 <= response.status_code < 500:
+            ticket.status, ticket.error = 'rejected', f"HTTP {response.status_code}: {response.text[:200]}"
+            return
+        try:
+            if response.status_code != 200:
+                raise ValueError(f"HTTP {response.status_code}: {response.text[:200]}")
+            data = response.json()
+        except ValueError as e:
+            ticket.error = f"unconfirmed: {e}"
+            logger.warning(f"Order {ticket.client_order_id} unconfirmed, reconciling on refresh: {e}")
+            return
+        self._update(ticket, data)
+
+    @staticmethod
+    def _update(ticket: OrderTicket, data: Dict) -> None:
+        ticket.broker_id = data.get('id', ticket.broker_id)
+        ticket.status = data.get('status', ticket.status)
+        ticket.filled_quantity = float(data.get('filled_qty') or 0.0)
+        if data.get('filled_avg_price'):
+            ticket.average_price = float(data['filled_avg_price'])
+
+    async def submit_batch(self, tickets: List[OrderTicket]) -> None:
+        async def one(ticket):
+            async with self._in_flight:
+                try:
+                    await asyncio.to_thread(self._post_order, ticket)
+                except Exception as e:
+                    ticket.status, ticket.error = 'failed', f"{type(e).__name__}: {e}"
+        await asyncio.gather(*(one(ticket) for ticket in tickets))
+
+    async def _get(self, path: str, params: Optional[Dict] = None, not_found=None):
+        """
+        :param not_found: Value returned for a 404 response
+        :return: Decoded JSON body, or None if the request failed
+        """
+        try:
+            response = await asyncio.to_thread(self.session.get, f"{self.base_url}{path}", params=params,
+                                               headers=self.headers, timeout=self.timeout)
+            if response.status_code == 404:
+                return not_found
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning(f"Failed to refresh Alpaca orders ({path}): {e}")
+            return None
+
+    async def refresh(self, tickets: List[OrderTicket]) -> None:
+        recent = await self._get("/v2/orders", {'status': 'all', 'limit': self.list_limit, 'direction': 'desc'})
+        if recent is None:
+            return
+        by_id = {item.get('client_order_id'): item for item in recent}
+        missing = []
+        for ticket in tickets:
+            if ticket.client_order_id in by_id:
+                self._update(ticket, by_id[ticket.client_order_id])
+            elif ticket.is_open:
+                missing.append(ticket)
+
+        # Older than the newest `list_limit` orders, or never confirmed: look each one up by its client order id
+        async def lookup(ticket):
+            async with self._in_flight:
+                data = await self._get("/v2/orders:by_client_order_id", {'client_order_id': ticket.client_order_id},
+                                       not_found={})
+            if data:
+                self._update(ticket, data)
+            elif data is not None and ticket.status == 'pending' \
+                    and time.monotonic() - ticket.submitted_at > 2 * self.timeout:
+                # Unconfirmed and still unknown to Alpaca well after the POST gave up: it was never placed
+                ticket.status = 'failed'
+                ticket.error = f"{ticket.error or 'unconfirmed'}; order not found at broker"
+        if missing:
+            await asyncio.gather(*(lookup(ticket) for ticket in missing))
+
+    async def cancel(self, ticket: OrderTicket) -> None:
+        if ticket.broker_id is None:
+            return
+        await asyncio.to_thread(self.session.delete, f"{self.base_url}/v2/orders/{ticket.broker_id}",
+                                headers=self.headers, timeout=self.timeout)
+
+class PaperBroker(BrokerAdapter):
+    """
+    Local in-memory broker for tests and benchmarks: acknowledges after `ack_latency`
+    and fills at the order's reference price (plus slippage) after `fill_latency`.
+    """
+
+    def __init__(self, ack_latency: float = 0.001, fill_latency: float = 0.0, max_batch_size: int = 100,
+                 slippage_bps: float = 0.0, reject_symbols: Iterable[str] = ()):
+        """
+        :param ack_latency: Seconds per submission call before orders are acknowledged
+        :param fill_latency: Seconds after acknowledgement before an order is filled
+        :param max_batch_size: Orders accepted per submission call
+        :param slippage_bps: Fill price offset against the order side, in basis points
+        :param reject_symbols: Symbols whose orders are rejected
+        """
+        self.ack_latency = ack_latency
+        self.fill_latency = fill_latency
+        self.max_batch_size = max_batch_size
+        self.slippage = slippage_bps / 10000.0
+        self.reject_symbols = set(reject_symbols)
+        self.calls = 0
+        self._sequence = 0
+
+    async def submit_batch(self, tickets: List[OrderTicket]) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.ack_latency)
+        now = time.monotonic()
+        for ticket in tickets:
+            if ticket.order.symbol in self.reject_symbols:
+                ticket.status, ticket.error = 'rejected', 'symbol not tradable'
+                continue
+            self._sequence += 1
+            ticket.broker_id = f"paper-{self._sequence}"
+            ticket.status = 'accepted'
+            ticket.acked_at = now
+            if self.fill_latency <= 0:
+                self._fill(ticket, now)
+
+    def _fill(self, ticket: OrderTicket, now: float) -> None:
+        order = ticket.order
+        direction = 1 if order.side == 'buy' else -1
+        ticket.status = 'filled'
+        ticket.filled_quantity = order.quantity
+        ticket.average_price = order.price * (1 + direction * self.slippage)
+        ticket.filled_at = now
+
+    async def refresh(self, tickets: List[OrderTicket]) -> None:
+        now = time.monotonic()
+        for ticket in tickets:
+            if ticket.status == 'accepted' and ticket.acked_at is not None and now - ticket.acked_at >= self.fill_latency:
+                self._fill(ticket, now)
+
+    async def cancel(self, ticket: OrderTicket) -> None:
+        if ticket.is_open:
+            ticket.status = 'canceled'
+
+class ExecutionEngine:
+    """
+    Submits orders asynchronously through a BrokerAdapter and tracks them until they are done.
+
+    Orders are grouped into broker-sized batches, every call is paced by a token bucket, and a
+    single poller refreshes all open tickets per interval instead of one poll per order.
+    """
+
+    def __init__(self, broker: BrokerAdapter, rate_limiter: Optional[TokenBucket] = None,
+                 max_concurrent_batches: int = 4, poll_interval: float = 0.5,
+                 on_fill: Optional[Callable[[List[Order]], None]] = None, latency_window: int = 100000):
+        """
+        :param broker: BrokerAdapter implementation
+        :param rate_limiter: TokenBucket pacing API requests, defaults to 200 requests per minute
+        :param max_concurrent_batches: Submission calls in flight at once
+        :param poll_interval: Seconds between refreshes of open orders
+        :param on_fill: Callback receiving fills (Order with filled quantity and price), e.g. IncrementalRebalancer.apply_fills
+        :param latency_window: Number of recent submit-to-ack latencies kept for percentiles
+        """
+        self.broker = broker
+        self.rate_limiter = rate_limiter or TokenBucket(rate=200 / 60, capacity=200)
+        self.poll_interval = poll_interval
+        self.on_fill = on_fill
+        self._batches = asyncio.Semaphore(max_concurrent_batches)
+        self.open: Dict[str, OrderTicket] = {}
+        self._ack_latencies = deque(maxlen=latency_window)
+        self._poller: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.rejected = 0
+        self.filled = 0
+
+    async def _submit_chunk(self, chunk: List[OrderTicket]) -> None:
+        await self.rate_limiter.acquire(self.broker.requests_for(len(chunk)))
+        async with self._batches:
+            for ticket in chunk:
+                ticket.submitted_at = time.monotonic()
+            try:
+                await self.broker.submit_batch(chunk)
+            except Exception as e:
+                # Tickets the broker never answered would otherwise stay 'pending' forever
+                logger.error(f"Submitting a batch of {len(chunk)} orders failed: {e}")
+                for ticket in chunk:
+                    if ticket.status == 'pending':
+                        ticket.status, ticket.error = 'failed', f"{type(e).__name__}: {e}"
+        now = time.monotonic()
+        for ticket in chunk:
+            if ticket.status in ('rejected', 'failed'):
+                self.rejected += 1
+                logger.warning(f"Order {ticket.order} rejected: {ticket.error}")
+                continue
+            self.open[ticket.client_order_id] = ticket
+            if ticket.status == 'pending':
+                # Outcome unknown (e.g. timed out after sending): tracked until refresh() settles it
+                continue
+            if ticket.acked_at is None:
+                ticket.acked_at = now
+            self._ack_latencies.append(ticket.acked_at - ticket.submitted_at)
+        self._collect_fills(chunk)
+
+    async def submit(self, orders: Iterable[Order]) -> List[OrderTicket]:
+        """
+        Submit orders and return once the broker has acknowledged (or rejected) every one.
+
+        :param orders: Orders to place
+        :return: One OrderTicket per order; fills are tracked in the background
+        """
+        tickets = [OrderTicket(order) for order in orders]
+        size = max(1, self.broker.max_batch_size)
+        chunks = [tickets[i:i + size] for i in range(0, len(tickets), size)]
+        self.submitted += len(tickets)
+        await asyncio.gather(*(self._submit_chunk(chunk) for chunk in chunks))
+        if self.open and (self._poller is None or self._poller.done()):
+            self._poller = asyncio.create_task(self._poll())
+        return tickets
+
+    def _collect_fills(self, tickets: List[OrderTicket]) -> None:
+        fills = []
+        for ticket in tickets:
+            if ticket.client_order_id in self.open and not ticket.is_open:
+                del self.open[ticket.client_order_id]
+                if ticket.status in ('rejected', 'failed'):
+                    self.rejected += 1
+                    logger.warning(f"Order {ticket.order} rejected: {ticket.error}")
+                if ticket.filled_quantity > 0:
+                    self.filled += 1
+                    fills.append(Order(ticket.order.symbol, ticket.order.side, ticket.filled_quantity,
+                                       ticket.average_price if ticket.average_price is not None else ticket.order.price))
+        if fills and self.on_fill is not None:
+            self.on_fill(fills)
+
+    async def _poll(self) -> None:
+        while self.open:
+            await asyncio.sleep(self.poll_interval)
+            tickets = list(self.open.values())
+            await self.rate_limiter.acquire(1)
+            await self.broker.refresh(tickets)
+            self._collect_fills(tickets)
+
+    async def wait_done(self, tickets: List[OrderTicket], timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every ticket is filled, canceled or rejected.
+
+        :return: True if all tickets finished before the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while any(ticket.is_open for ticket in tickets):
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(min(self.poll_interval, 0.01))
+        return True
+
+    async def close(self) -> None:
+        """
+        Stop fill tracking and release the broker.
+        """
+        if self._poller is not None:
+            self._poller.cancel()
+        self.broker.close()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        :return: Order counters and submit-to-ack latency percentiles in milliseconds
+        """
+        latencies = np.fromiter(self._ack_latencies, dtype=float)
+        stats = {'submitted': self.submitted, 'rejected': self.rejected, 'filled': self.filled, 'open': len(self.open)}
+        if len(latencies):
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            stats.update({'ack_p50_ms': float(p50), 'ack_p99_ms': float(p99)})
+        else:
+            stats.update({'ack_p50_ms': 0.0, 'ack_p99_ms': 0.0})
+        return stats
+
+def benchmark(n_orders: int = 20000, ack_latency: float = 0.002, batch_sizes=(1, 10, 100)) -> List[Dict[str, float]]:
+    """
+    Offline throughput and submit-to-ack latency against the paper broker at several batch sizes.
+
+    :return: List of result dictionaries, one per batch size
+    """
+    rng = np.random.default_rng(0)
+    orders = [Order(f"SYM{i % 500}", 'buy' if rng.random() < 0.5 else 'sell', float(rng.integers(1, 100)),
+                    float(rng.uniform(10, 500))) for i in range(n_orders)]
+    results = []
+    for batch_size in batch_sizes:
+        async def run():
+            broker = PaperBroker(ack_latency=ack_latency, max_batch_size=batch_size)
+            engine = ExecutionEngine(broker, TokenBucket(rate=1e6, capacity=1e6), max_concurrent_batches=16)
+            start = time.perf_counter()
+            tickets = await engine.submit(orders)
+            await engine.wait_done(tickets)
+            elapsed = time.perf_counter() - start
+            await engine.close()
+            return dict(engine.stats(), batch_size=batch_size, calls=broker.calls, seconds=elapsed,
+                        orders_per_second=n_orders / elapsed)
+        results.append(asyncio.run(run()))
+    return results
+
+# Example usage: paper-broker benchmark
+if __name__ == "__main__":
+    for row in benchmark():
+        print(f"batch {row['batch_size']:>3}: {row['orders_per_second']:,.0f} orders/s over {row['calls']} calls, "
+              f"ack p50 {row['ack_p50_ms']:.2f}ms p99 {row['ack_p99_ms']:.2f}ms, filled {row['filled']}")
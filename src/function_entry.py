@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# Only the standard library is imported here. NumPy, pandas, yfinance and the project modules
+# that depend on them are imported on first use, so the Functions host can load this module
+# (and answer health checks) without paying for them.
+
+# Set up logging for better error tracking
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PRICE_MAX_AGE = float(os.environ.get("TRADING_PRICE_MAX_AGE", "60"))
+
+class WarmState:
+    """
+    State kept across invocations served by the same worker process: the prediction service
+    (all models loaded once), a price table with per-symbol fetch times, and portfolio books.
+    """
+
+    def __init__(self, registry_root: Optional[str] = None, transport=None):
+        """
+        :param registry_root: Model registry directory, defaults to TRADING_MODEL_DIR or the repo's models/
+        :param transport: Optional price transport (see price_fetcher), defaults to yfinance
+        """
+        self.registry_root = registry_root or os.environ.get("TRADING_MODEL_DIR")
+        self.transport = transport
+        self.created_at = time.time()
+        self.invocations = 0
+        self.prices: Dict[str, Tuple[float, float]] = {}
+        self._books: Dict[str, Any] = {}
+        self._service = None
+        self._lock = threading.Lock()
+
+    @property
+    def service(self):
+        """
+        PredictionService over every registry model, created on first use.
+        """
+        if self._service is None:
+            with self._lock:
+                if self._service is None:
+                    from model_registry import ModelRegistry
+                    from prediction_service import PredictionService
+
+                    registry = ModelRegistry(self.registry_root) if self.registry_root else ModelRegistry()
+                    self._service = PredictionService(registry)
+        return self._service
+
+    def book(self, portfolio: Dict[str, Dict[str, float]]):
+        """
+        :param portfolio: {symbol: {"shares", "purchase_price"}}
+        :return: Cached PortfolioBook for an identical portfolio, built on first sight
+        """
+        from portfolio_valuation import PortfolioBook
+
+        key = hashlib.blake2b(json.dumps(portfolio, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+        book = self._books.get(key)
+        if book is None:
+            if len(self._books) >= 64:
+                self._books.clear()
+            book = self._books[key] = PortfolioBook.from_dict(portfolio)
+        return book
+
+    def latest_prices(self, symbols, max_age: float = PRICE_MAX_AGE) -> Dict[str, Optional[float]]:
+        """
+        Prices no older than max_age seconds; only stale or unknown symbols are fetched.
+
+        :param symbols: Stock symbols
+        :param max_age: Seconds a cached price stays usable
+        :return: Dictionary of symbol -> price (None if unavailable)
+        """
+        from price_fetcher import fetch_prices_batched
+
+        now = time.time()
+        stale = [s for s in symbols if s not in self.prices or now - self.prices[s][1] > max_age]
+        if stale:
+            for symbol, price in fetch_prices_batched(stale, transport=self.transport).items():
+                if price is not None:
+                    self.prices[symbol] = (price, now)
+        return {s: self.prices[s][0] if s in self.prices else None for s in symbols}
+
+_state: Optional[WarmState] = None
+
+def get_state() -> WarmState:
+    """
+    Return this worker's warm state, creating it on the first invocation.
+    """
+    global _state
+    if _state is None:
+        _state = WarmState()
+    return _state
+
+def reset_state(state: Optional[WarmState] = None) -> None:
+    """
+    Replace (or drop) the warm state, e.g. to inject a transport or registry in tests.
+    """
+    global _state
+    _state = state
+
+def valuate(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Value a portfolio at current prices.
+
+    :param payload: {"portfolio": {symbol: {"shares", "purchase_price"}}, "max_price_age": seconds (optional)}
+    :return: Dictionary with total_value, gains and per-holding breakdown
+    """
+    from portfolio_valuation import valuation_totals, valuation_to_breakdown
+
+    portfolio = payload.get('portfolio')
+    if not isinstance(portfolio, dict) or not portfolio:
+        raise ValueError("payload must contain a non-empty 'portfolio' mapping.")
+    state = get_state()
+    book = state.book(portfolio)
+    prices = state.latest_prices(list(book.symbols), float(payload.get('max_price_age', PRICE_MAX_AGE)))
+    valuation = book.valuate(prices)
+    total_value, gains = valuation_totals(valuation)
+    return {'total_value': total_value, 'gains': gains, 'breakdown': valuation_to_breakdown(valuation)}
+
+def predict(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Earnings predictions from the registry models.
+
+    :param payload: {"requests": [{"symbol": "AAPL", "features": [...]}, ...]}
+    :return: {"predictions": [...]} with null for symbols without a model
+    """
+    import math
+
+    requests_ = payload.get('requests')
+    if not isinstance(requests_, list):
+        raise ValueError("payload must contain a 'requests' list.")
+    if not requests_:
+        return {'predictions': []}
+    predictions = get_state().service.predict_batch([item['symbol'] for item in requests_],
+                                                    [item['features'] for item in requests_])
+    return {'predictions': [None if math.isnan(p) else float(p) for p in predictions]}
+
+ROUTES = {'portfolio': valuate, 'predict': predict}
+
+def handle(route: str, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    """
+    Framework-independent invocation entry point used by the Azure Functions app.
+
+    :param route: 'portfolio', 'predict' or 'health'
+    :param payload: Decoded JSON request body
+    :return: Tuple of (HTTP status code, JSON-serialisable body)
+    """
+    if route == 'health':
+        state = _state
+        return 200, {'status': 'ok', 'warm': state is not None,
+                     'invocations': state.invocations if state else 0}
+    handler = ROUTES.get(route)
+    if handler is None:
+        return 404, {'error': f"unknown route '{route}'"}
+    start = time.perf_counter()
+    state = get_state()
+    cold = state.invocations == 0
+    state.invocations += 1
+    try:
+        body = handler(payload or {})
+    except (KeyError, TypeError, ValueError) as e:
+        return 400, {'error': f"bad request: {e}"}
+    body['invocation'] = {'cold': cold, 'seconds': time.perf_counter() - start}
+    return 200, body
+
+# Startup benchmark
+
+_STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src!r})
+{import_line}
+imported = time.perf_counter()
+timings = {{'import_seconds': imported - start}}
+{invoke}
+print(json.dumps(timings))
+"""
+
+_INVOKE = """
+from price_fetcher import FakePriceTransport
+function_entry.reset_state(function_entry.WarmState(registry_root={registry!r}, transport=FakePriceTransport()))
+payload = {{'portfolio': {{f'SYM{{i}}': {{'shares': 10, 'purchase_price': 100.0}} for i in range(50)}}}}
+requests = {{'requests': [{{'symbol': f'SYM{{i}}', 'features': [1e9, 0.05]}} for i in range(50)]}}
+for label in ('first', 'warm'):
+    t = time.perf_counter()
+    function_entry.handle('portfolio', payload)
+    function_entry.handle('predict', requests)
+    timings[label + '_invocation_seconds'] = time.perf_counter() - t
+"""
+
+def startup_benchmark(runs: int = 3) -> Dict[str, Dict[str, float]]:
+    """
+    Measure, in fresh interpreters, the import time of this entry point versus the eager
+    trading_script import, and the first (cold) and second (warm) invocation latency.
+
+    Prices come from the local fake transport and models from a temporary registry, so the
+    benchmark runs offline.
+
+    :param runs: Fresh interpreters per measurement; the median is reported
+    :return: Dictionary of measurement -> median seconds
+    """
+    import statistics
+    import subprocess
+    import tempfile
+
+    import numpy as np
+
+    from model_registry import ModelRegistry
+
+    src = os.path.dirname(os.path.abspath(__file__))
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="startup-registry-") as registry_root:
+        ModelRegistry(registry_root).save_linear([f"SYM{i}" for i in range(50)], np.ones((50, 2)), np.zeros(50),
+                                                 features=['Revenue', 'Surprise_Ratio'])
+        probes = {
+            'trading_script': _STARTUP_PROBE.format(src=src, import_line=f"sys.path.insert(0, {os.path.dirname(src)!r}); import trading_script", invoke=""),
+            'function_entry': _STARTUP_PROBE.format(src=src, import_line="import function_entry",
+                                                    invoke=_INVOKE.format(registry=registry_root)),
+        }
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE="0")
+        for name, code in probes.items():
+            samples = []
+            for _ in range(runs):
+                output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=env, check=True)
+                samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+            results[name] = {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+    return results
+
+# Example usage: startup benchmark
+if __name__ == "__main__":
+    for name, timings in startup_benchmark().items():
+        print(name, {key: f"{value * 1000:.0f} ms" for key, value in timings.items()})
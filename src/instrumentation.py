@@ -0,0 +1,331 @@
+import os
+import sys
+import json
+import time
+import bisect
+import functools
+import threading
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+PREFIX = "trading_"
+
+# Checked on every instrumented call; a plain module global keeps the disabled path to one lookup
+_enabled = os.environ.get("TRADING_METRICS", "").lower() in ("1", "true", "yes")
+_lock = threading.Lock()
+_timers: Dict[str, "Timer"] = {}
+_counters: Dict[str, float] = {}
+
+class Timer:
+    """
+    Aggregated timings of one instrumented operation: count, sum, max, errors and a histogram.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds: float, error: bool = False) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if error:
+            self.errors += 1
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum_seconds': self.total,
+            'mean_seconds': self.total / self.count if self.count else 0.0,
+            'max_seconds': self.max,
+            'errors': self.errors,
+            'buckets': {str(bound): n for bound, n in zip(BUCKETS + ('+Inf',), self.buckets)},
+        }
+
+def enable() -> None:
+    """
+    Start recording metrics (also enabled by setting TRADING_METRICS=1).
+    """
+    global _enabled
+    _enabled = True
+
+def disable() -> None:
+    """
+    Stop recording metrics; instrumented calls go straight through.
+    """
+    global _enabled
+    _enabled = False
+
+def is_enabled() -> bool:
+    return _enabled
+
+def reset() -> None:
+    """
+    Drop every recorded timer and counter.
+    """
+    with _lock:
+        _timers.clear()
+        _counters.clear()
+
+def observe(name: str, seconds: float, error: bool = False) -> None:
+    """
+    Record one timing for `name`.
+    """
+    with _lock:
+        timer = _timers.get(name)
+        if timer is None:
+            timer = _timers[name] = Timer()
+        timer.observe(seconds, error)
+
+def count(name: str, n: float = 1) -> None:
+    """
+    Add `n` to the counter `name` (no-op while disabled).
+    """
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def timed(name: str) -> Callable:
+    """
+    Decorator recording the duration (and failure) of every call under `name`.
+
+    :param name: Metric name, e.g. 'process_earnings_data'
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                observe(name, time.perf_counter() - start, error)
+        return wrapper
+    return decorate
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(name: str):
+    """
+    Context manager timing a block under `name`.
+
+    :param name: Metric name
+    :return: Context manager (a shared no-op while disabled)
+    """
+    return _Span(name) if _enabled else _NOOP_SPAN
+
+def snapshot() -> Dict[str, Any]:
+    """
+    :return: Dictionary with every timer and counter
+    """
+    with _lock:
+        return {
+            'timestamp': time.time(),
+            'timers': {name: timer.to_dict() for name, timer in _timers.items()},
+            'counters': dict(_counters),
+        }
+
+def write_json(path: str) -> None:
+    """
+    Write the current snapshot to a local JSON file (atomically).
+
+    :param path: Destination file
+    """
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot(), f, indent=2)
+    os.replace(tmp, path)
+
+def to_prometheus() -> str:
+    """
+    :return: Current metrics in the Prometheus text exposition format
+    """
+    lines = []
+    with _lock:
+        for name, timer in sorted(_timers.items()):
+            metric = f"{PREFIX}{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ('+Inf',), timer.buckets):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{metric}_sum {timer.total}")
+            lines.append(f"{metric}_count {timer.count}")
+            lines.append(f"# TYPE {PREFIX}{name}_errors_total counter")
+            lines.append(f"{PREFIX}{name}_errors_total {timer.errors}")
+        for name, value in sorted(_counters.items()):
+            lines.append(f"# TYPE {PREFIX}{name}_total counter")
+            lines.append(f"{PREFIX}{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread samples the stacks of all other threads every
+    `interval` seconds. Output is in the collapsed-stack format read by flamegraph tools.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """
+        :param interval: Seconds between samples
+        """
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def top(self, n: int = 15) -> Dict[str, int]:
+        """
+        :return: The n functions seen most often at the top of a stack, with sample counts
+        """
+        leaves = Counter()
+        for stack, hits in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += hits
+        return dict(leaves.most_common(n))
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, hits in self.stacks.most_common():
+                f.write(f"{stack} {hits}\n")
+
+@contextmanager
+def profile_run(path: Optional[str] = None, interval: float = 0.005):
+    """
+    Sample-profile the enclosed run. Triggered per run, e.g. when TRADING_PROFILE is set:
+
+        with profile_run(os.environ.get("TRADING_PROFILE")):
+            main()
+
+    :param path: Collapsed-stack output file; None (or empty) disables profiling
+    :param interval: Seconds between samples
+    """
+    if not path:
+        yield None
+        return
+    profiler = SamplingProfiler(interval).start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.write_collapsed(path)
+        logger.info(f"Wrote {profiler.samples} profile samples to {path}; hottest: {list(profiler.top(5))}")
+
+def write_metrics(path: str) -> None:
+    """
+    Export metrics to a file: Prometheus text for a .prom/.txt path, JSON otherwise.
+    """
+    if path.endswith((".prom", ".txt")):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(to_prometheus())
+        os.replace(tmp, path)
+    else:
+        write_json(path)
+
+@contextmanager
+def instrument_run(metrics_path: Optional[str] = None, profile_path: Optional[str] = None):
+    """
+    Instrument one run of a script: record metrics and export them at the end, and optionally
+    sample-profile it. Both default to off and are switched on per run through the environment:
+    TRADING_METRICS_FILE (export path) and TRADING_PROFILE (collapsed-stack path).
+
+    :param metrics_path: Metrics export file, overrides TRADING_METRICS_FILE
+    :param profile_path: Profile output file, overrides TRADING_PROFILE
+    """
+    metrics_path = metrics_path or os.environ.get("TRADING_METRICS_FILE")
+    profile_path = profile_path or os.environ.get("TRADING_PROFILE")
+    if metrics_path:
+        enable()
+    try:
+        with profile_run(profile_path):
+            yield
+    finally:
+        if metrics_path:
+            write_metrics(metrics_path)
+            logger.info(f"Wrote run metrics to {metrics_path}")
+
+# Example usage: overhead of an instrumented call, disabled vs enabled
+if __name__ == "__main__":
+    def plain(x):
+        return x
+
+    instrumented = timed("noop")(plain)
+    n = 1_000_000
+    for label, func in (("plain", plain), ("disabled", instrumented)):
+        start = time.perf_counter()
+        for i in range(n):
+            func(i)
+        print(f"{label:>9}: {(time.perf_counter() - start) / n * 1e9:.0f} ns/call")
+    enable()
+    start = time.perf_counter()
+    for i in range(n):
+        instrumented(i)
+    print(f"{'enabled':>9}: {(time.perf_counter() - start) / n * 1e9:.0f} ns/call")
+    print(to_prometheus())
@@ -0,0 +1,331 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from instrumentation import timed
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "models")
+
+def _lock_file(f) -> None:
+    """
+    Block until this process holds an exclusive lock on an open file.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        # Windows: msvcrt retries for about 10 seconds before raising
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+def _unlock_file(f) -> None:
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+class LinearModel:
+    """
+    Lightweight fitted linear model backed by rows of a registry version's arrays.
+    """
+
+    def __init__(self, symbol: str, coef: np.ndarray, intercept: float, features: List[str], version: int):
+        self.symbol = symbol
+        self.coef = coef
+        self.intercept = intercept
+        self.features = features
+        self.version = version
+
+    @timed("model_predict")
+    def predict(self, X) -> np.ndarray:
+        """
+        :param X: DataFrame containing the feature columns, or an (n, n_features) array
+        :return: Predictions of shape (n,)
+        """
+        if hasattr(X, "columns"):
+            X = X[self.features].to_numpy(dtype=float)
+        return np.asarray(X, dtype=float) @ self.coef + self.intercept
+
+    def __repr__(self):
+        return f"LinearModel(symbol={self.symbol!r}, version={self.version})"
+
+class ModelRegistry:
+    """
+    Versioned store of per-symbol earnings models.
+
+    Every save writes a new version directory holding one coefficient matrix and one intercept
+    vector for all symbols in that save. index.json maps each symbol to the versions that
+    contain it, so a symbol's latest model can come from any version. Version arrays are
+    memory-mapped on first use and loaded models are kept in an in-process LRU.
+    """
+
+    def __init__(self, root: str = DEFAULT_REGISTRY_DIR, cache_size: int = 4096):
+        """
+        :param root: Registry directory, created if missing
+        :param cache_size: Maximum number of models kept in the in-process LRU
+        """
+        self.root = root
+        self.cache_size = cache_size
+        self._lock = threading.RLock()
+        self._models: "OrderedDict[tuple, LinearModel]" = OrderedDict()
+        self._arrays: Dict[int, Dict[str, object]] = {}
+        self._index = None
+        os.makedirs(root, exist_ok=True)
+
+    # Index handling
+
+    def _index_path(self) -> str:
+        return os.path.join(self.root, "index.json")
+
+    def _load_index(self) -> Dict[str, object]:
+        if self._index is None:
+            try:
+                with open(self._index_path(), "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except FileNotFoundError:
+                self._index = {'next_version': 1, 'symbols': {}}
+        return self._index
+
+    def _write_index(self, index: Dict[str, object]) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self._index_path())
+        self._index = index
+
+    @contextmanager
+    def _exclusive(self):
+        """
+        Hold the registry for a read-modify-write of the index, across threads and processes.
+
+        The on-disk index is re-read under the lock, so a version assigned by another process
+        since this one last looked is never reused or dropped.
+        """
+        with self._lock, open(os.path.join(self.root, ".lock"), "a+b") as lock_file:
+            _lock_file(lock_file)
+            try:
+                self._index = None
+                yield
+            finally:
+                _unlock_file(lock_file)
+
+    def refresh(self) -> None:
+        """
+        Re-read the index from disk, e.g. after another process saved new models.
+        """
+        with self._lock:
+            self._index = None
+            self._models.clear()
+
+    # Saving
+
+    def save_linear(self, symbols: List[str], coef: np.ndarray, intercept: np.ndarray,
+                    features: Optional[List[str]] = None, metrics: Optional[Dict[str, Dict[str, float]]] = None) -> int:
+        """
+        Save linear models for many symbols as one new version.
+
+        :param symbols: Stock symbols, aligned with the rows of coef and intercept
+        :param coef: Array of shape (n_symbols, n_features)
+        :param intercept: Array of shape (n_symbols,)
+        :param features: Feature names, defaults to the earnings model FEATURES
+        :param metrics: Optional symbol -> metrics dictionary stored alongside the version
+        :return: The new version number
+        """
+        coef = np.asarray(coef, dtype=float)
+        intercept = np.asarray(intercept, dtype=float)
+        if coef.ndim != 2 or len(coef) != len(symbols) or intercept.shape != (len(symbols),):
+            raise ValueError("coef must be (n_symbols, n_features) and intercept (n_symbols,).")
+        if not features:
+            # Imported here: the earnings model module pulls in sklearn, which serving does not need
+            from earningsPredictionModel import FEATURES
+            features = FEATURES
+        features = list(features)
+
+        with self._exclusive():
+            index = json.loads(json.dumps(self._load_index()))
+            # Skip past version directories a crashed save left without an index entry
+            version = max([index['next_version']] + [v + 1 for v in self._existing_versions()])
+            tmp_dir = tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+            try:
+                np.save(os.path.join(tmp_dir, "coef.npy"), coef, allow_pickle=False)
+                np.save(os.path.join(tmp_dir, "intercept.npy"), intercept, allow_pickle=False)
+                with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                    json.dump({'version': version, 'created_at': time.time(), 'features': features,
+                               'symbols': list(symbols), 'metrics': metrics or {}}, f)
+                os.replace(tmp_dir, self._version_dir(version))
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+
+            for row, symbol in enumerate(symbols):
+                index['symbols'].setdefault(symbol, []).append([version, row])
+            index['next_version'] = version + 1
+            self._write_index(index)
+            # The re-read index may also carry other processes' saves
+            self._models.clear()
+        logger.info(f"Saved {len(symbols)} models as version {version}")
+        return version
+
+    def save_batched_fit(self, fit) -> int:
+        """
+        Save every model of a BatchedFit (see batched_regression) as one version.
+
+        :return: The new version number
+        """
+        metrics = {symbol: {'mse': float(fit.mse[i]), 'r2': float(fit.r2[i]), 'n_samples': int(fit.n_samples[i])}
+                   for i, symbol in enumerate(fit.symbols)}
+        return self.save_linear(fit.symbols, fit.coef, fit.intercept, fit.features, metrics)
+
+    def save_sklearn(self, models: Dict[str, object], metrics: Optional[Dict[str, Dict[str, float]]] = None) -> int:
+        """
+        Save fitted sklearn LinearRegression models (e.g. TrainingRegistry.models) as one version.
+
+        :param models: Dictionary of symbol -> fitted LinearRegression
+        :param metrics: Optional symbol -> metrics dictionary
+        :return: The new version number
+        """
+        symbols = list(models)
+        if not symbols:
+            raise ValueError("No models to save.")
+        coef = np.stack([np.ravel(models[s].coef_) for s in symbols])
+        intercept = np.array([float(models[s].intercept_) for s in symbols])
+        first = models[symbols[0]]
+        features = list(getattr(first, 'feature_names_in_', [])) or None
+        return self.save_linear(symbols, coef, intercept, features, metrics)
+
+    # Loading
+
+    def _version_dir(self, version: int) -> str:
+        return os.path.join(self.root, f"v{version:06d}")
+
+    def _existing_versions(self) -> List[int]:
+        """
+        :return: Version numbers that have a directory on disk, whether or not the index references them
+        """
+        return [int(name[1:]) for name in os.listdir(self.root) if name.startswith("v") and name[1:].isdigit()]
+
+    def _version_arrays(self, version: int) -> Dict[str, object]:
+        arrays = self._arrays.get(version)
+        if arrays is None:
+            directory = self._version_dir(version)
+            with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = {
+                'coef': np.load(os.path.join(directory, "coef.npy"), mmap_mode='r'),
+                'intercept': np.load(os.path.join(directory, "intercept.npy"), mmap_mode='r'),
+                'meta': meta,
+            }
+            self._arrays[version] = arrays
+        return arrays
+
+    def symbols(self) -> List[str]:
+        """
+        :return: Sorted list of symbols with at least one saved model
+        """
+        with self._lock:
+            return sorted(self._load_index()['symbols'])
+
+    def versions(self, symbol: str) -> List[int]:
+        """
+        :param symbol: Stock symbol
+        :return: Versions containing a model for the symbol, oldest first
+        """
+        with self._lock:
+            return [version for version, _ in self._load_index()['symbols'].get(symbol, [])]
+
+    def load(self, symbol: str, version: Optional[int] = None) -> LinearModel:
+        """
+        Load a symbol's model, from the in-process LRU when possible.
+
+        :param symbol: Stock symbol
+        :param version: Specific version, defaults to the latest
+        :return: LinearModel
+        :raises KeyError: If no model exists for the symbol/version
+        """
+        key = (symbol, version)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+
+            entries = self._load_index()['symbols'].get(symbol)
+            if not entries:
+                raise KeyError(f"No saved model for {symbol}")
+            if version is None:
+                found_version, row = entries[-1]
+            else:
+                matches = [entry for entry in entries if entry[0] == version]
+                if not matches:
+                    raise KeyError(f"No model for {symbol} in version {version}")
+                found_version, row = matches[-1]
+
+            arrays = self._version_arrays(found_version)
+            model = LinearModel(symbol, arrays['coef'][row], float(arrays['intercept'][row]),
+                                arrays['meta']['features'], found_version)
+            self._models[key] = model
+            if len(self._models) > self.cache_size:
+                self._models.popitem(last=False)
+            return model
+
+    def metrics(self, symbol: str, version: Optional[int] = None) -> Dict[str, float]:
+        """
+        :param symbol: Stock symbol
+        :param version: Specific version, defaults to the latest
+        :return: Metrics stored with the model, or an empty dictionary
+        """
+        model = self.load(symbol, version)
+        return self._version_arrays(model.version)['meta']['metrics'].get(symbol, {})
+
+    def predict(self, symbol: str, X) -> np.ndarray:
+        """
+        Predict with a symbol's latest model without unpickling or retraining.
+
+        :param symbol: Stock symbol
+        :param X: DataFrame with the feature columns or an (n, n_features) array
+        :return: Predictions of shape (n,)
+        """
+        return self.load(symbol).predict(X)
+
+    def prune(self, keep: int = 3) -> List[int]:
+        """
+        Delete versions that are not among the newest `keep` versions of any symbol.
+
+        :param keep: Versions to keep per symbol, at least 1
+        :return: Deleted version numbers
+        """
+        if keep < 1:
+            raise ValueError("keep must be at least 1.")
+        with self._exclusive():
+            index = json.loads(json.dumps(self._load_index()))
+            live = set()
+            for symbol, entries in index['symbols'].items():
+                index['symbols'][symbol] = entries[-keep:]
+                live.update(version for version, _ in entries[-keep:])
+            all_versions = set(self._existing_versions())
+            dead = sorted(all_versions - live)
+            self._write_index(index)
+            for version in dead:
+                self._arrays.pop(version, None)
+                shutil.rmtree(self._version_dir(version), ignore_errors=True)
+            self._models.clear()
+        return dead
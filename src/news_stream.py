@@ -0,0 +1,269 @@
+import math
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import requests
+
+from sentiment import get_default_engine
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+NEWS_API_URL = 'https://newsapi.org/v2/everything'
+
+def _newsapi_fetch(url, params):
+    response = requests.get(url, params=params, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+def iter_news(symbol, api_key, page_size=100, max_pages=5, fetch=None, url=NEWS_API_URL):
+    """
+    Page through news results for a symbol, yielding one page of articles at a time.
+
+    :param symbol: Stock symbol
+    :param api_key: API key for news API
+    :param page_size: Articles per page
+    :param max_pages: Maximum number of pages to request
+    :param fetch: Callable (url, params) -> JSON page, defaults to a NewsAPI request
+    :param url: News API endpoint
+    :return: Generator of article lists
+    """
+    fetch = fetch or _newsapi_fetch
+    for page in range(1, max_pages + 1):
+        params = {'q': symbol, 'apiKey': api_key, 'pageSize': page_size, 'page': page, 'sortBy': 'publishedAt'}
+        try:
+            news_data = fetch(url, params)
+        except requests.RequestException as e:
+            logger.error(f"Failed to fetch news page {page} for {symbol}: {e}")
+            return
+        articles = news_data.get('articles', [])
+        if not articles:
+            return
+        yield articles
+        if len(articles) < page_size:
+            return
+
+class SeenSet:
+    """
+    Bounded set of article URL hashes; the least recently seen hashes are forgotten first.
+    Hashes can be scoped (e.g. per symbol) so one article matching several symbols counts
+    once for each of them.
+    """
+
+    def __init__(self, capacity=100000):
+        """
+        :param capacity: Maximum number of remembered articles
+        """
+        self.capacity = capacity
+        self._hashes = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(article, scope=""):
+        """
+        :param article: NewsAPI article dictionary
+        :param scope: Namespace of the hash, e.g. the symbol the article was fetched for
+        :return: 8-byte digest of the scope and article URL (or title and description if it has no URL)
+        """
+        identity = article.get('url') or f"{article.get('title')}|{article.get('description')}"
+        identity = f"{scope}\x00{identity}"
+        return hashlib.blake2b(identity.encode("utf-8"), digest_size=8).digest()
+
+    def add(self, article, scope=""):
+        """
+        Record an article.
+
+        :param article: NewsAPI article dictionary
+        :param scope: Namespace of the article, e.g. the symbol it was fetched for
+        :return: True if the article was new within the scope, False if it had been seen
+        """
+        key = self.key(article, scope)
+        with self._lock:
+            if key in self._hashes:
+                self._hashes.move_to_end(key)
+                return False
+            self._hashes[key] = None
+            if len(self._hashes) > self.capacity:
+                self._hashes.popitem(last=False)
+            return True
+
+    def __len__(self):
+        return len(self._hashes)
+
+class DecayedSentiment:
+    """
+    Exponentially time-decayed mean sentiment, updated in O(1) per article.
+    """
+
+    def __init__(self, half_life=6 * 3600):
+        """
+        :param half_life: Seconds after which an article's weight halves
+        """
+        self.decay = math.log(2) / half_life
+        self.weighted_sum = 0.0
+        self.weight = 0.0
+        self.last_time = None
+        self.count = 0
+
+    def update(self, score, timestamp):
+        """
+        Add one article's score.
+
+        :param score: Sentiment polarity
+        :param timestamp: Article time in epoch seconds
+        """
+        self.count += 1
+        if self.last_time is None:
+            self.last_time = timestamp
+        if timestamp >= self.last_time:
+            factor = math.exp(-self.decay * (timestamp - self.last_time))
+            self.weighted_sum = self.weighted_sum * factor + score
+            self.weight = self.weight * factor + 1.0
+            self.last_time = timestamp
+        else:
+            # Late (older) article: add it with the weight it would have by now
+            factor = math.exp(-self.decay * (self.last_time - timestamp))
+            self.weighted_sum += score * factor
+            self.weight += factor
+
+    def value(self):
+        """
+        :return: Decay-weighted mean sentiment, 0 when nothing has been seen
+        """
+        return self.weighted_sum / self.weight if self.weight > 0 else 0.0
+
+    def effective_weight(self, now=None):
+        """
+        :param now: Epoch seconds, defaults to the current time
+        :return: Total decayed weight at `now`, a measure of how much recent news backs value()
+        """
+        if self.last_time is None:
+            return 0.0
+        now = time.time() if now is None else now
+        return self.weight * math.exp(-self.decay * max(0.0, now - self.last_time))
+
+def _published_at(article, default):
+    raw = article.get('publishedAt')
+    if not raw:
+        return default
+    try:
+        return datetime.fromisoformat(raw.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return default
+
+def news_sentiment_history(symbol, api_key, engine=None, fetch=None, page_size=100, max_pages=5):
+    """
+    Daily mean sentiment of a symbol's news by publication date, for training.
+
+    :param symbol: Stock symbol
+    :param api_key: API key for news API
+    :param engine: SentimentEngine, defaults to the shared engine
+    :param fetch: Callable (url, params) -> JSON page, defaults to a NewsAPI request
+    :param page_size: Articles per page
+    :param max_pages: Maximum number of pages to request
+    :return: List of {'date', 'symbol', 'sentiment'} rows, one per UTC day with scored articles
+    """
+    engine = engine or get_default_engine()
+    texts, days = [], []
+    for page in iter_news(symbol, api_key, page_size, max_pages, fetch):
+        for article in page:
+            published = _published_at(article, None)
+            if published is not None and article.get('description'):
+                texts.append(article['description'])
+                days.append(datetime.fromtimestamp(published, timezone.utc).date().isoformat())
+    totals = {}
+    for day, score in zip(days, engine.score_texts(texts) if texts else []):
+        total, n = totals.get(day, (0.0, 0))
+        totals[day] = (total + float(score), n + 1)
+    return [{'date': day, 'symbol': symbol, 'sentiment': total / n} for day, (total, n) in sorted(totals.items())]
+
+class NewsIngestor:
+    """
+    Streaming news ingestion: pages through results, skips seen articles, scores only new ones
+    and keeps a rolling decayed sentiment per symbol.
+    """
+
+    def __init__(self, engine=None, seen=None, half_life=6 * 3600, fetch=None, page_size=100, max_pages=5):
+        """
+        :param engine: SentimentEngine, defaults to the shared engine
+        :param seen: SeenSet shared across symbols (hashes are scoped per symbol), defaults to a new one
+        :param half_life: Half-life in seconds of the per-symbol aggregates
+        :param fetch: Callable (url, params) -> JSON page, defaults to a NewsAPI request
+        :param page_size: Articles per page
+        :param max_pages: Maximum number of pages per ingest call
+        """
+        self.engine = engine or get_default_engine()
+        self.seen = seen or SeenSet()
+        self.half_life = half_life
+        self.fetch = fetch
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.aggregates = {}
+
+    def ingest(self, symbol, api_key):
+        """
+        Pull new articles for a symbol and fold them into its aggregate.
+
+        Paging stops at the first page containing only articles already seen for this symbol,
+        since results arrive newest first.
+
+        :param symbol: Stock symbol
+        :param api_key: API key for news API
+        :return: Number of new articles scored
+        """
+        aggregate = self.aggregates.setdefault(symbol, DecayedSentiment(self.half_life))
+        new_count = 0
+        now = time.time()
+        for page in iter_news(symbol, api_key, self.page_size, self.max_pages, self.fetch):
+            fresh = [article for article in page if self.seen.add(article, symbol)]
+            if not fresh:
+                break
+            texts = [article.get('description') or '' for article in fresh]
+            scored = [(article, text) for article, text in zip(fresh, texts) if text]
+            scores = self.engine.score_texts([text for _, text in scored])
+            for (article, _), score in zip(scored, scores):
+                aggregate.update(float(score), _published_at(article, now))
+            new_count += len(fresh)
+        return new_count
+
+    def sentiment(self, symbol):
+        """
+        :param symbol: Stock symbol
+        :return: Current decayed sentiment for the symbol, 0 if nothing was ingested
+        """
+        aggregate = self.aggregates.get(symbol)
+        return aggregate.value() if aggregate else 0.0
+
+class FakeNewsFeed:
+    """
+    Local NewsAPI stand-in serving pages from an in-memory article list, for tests.
+    """
+
+    def __init__(self, articles_by_symbol):
+        """
+        :param articles_by_symbol: Dictionary of symbol -> list of article dictionaries, newest first
+        """
+        self.articles_by_symbol = articles_by_symbol
+        self.requests = 0
+
+    def __call__(self, url, params):
+        self.requests += 1
+        articles = self.articles_by_symbol.get(params['q'], [])
+        start = (params['page'] - 1) * params['pageSize']
+        page = articles[start:start + params['pageSize']]
+        return {'status': 'ok', 'totalResults': len(articles), 'articles': page}
+
+# Example usage
+if __name__ == "__main__":
+    feed = FakeNewsFeed({'SNOW': [
+        {'url': f'https://example.com/{i}', 'description': 'Great earnings beat' if i % 2 else 'Weak guidance',
+         'publishedAt': f'2024-01-01T{23 - i % 24:02d}:00:00Z'} for i in range(250)
+    ]})
+    ingestor = NewsIngestor(fetch=feed)
+    print(ingestor.ingest('SNOW', 'KEY'), ingestor.sentiment('SNOW'), feed.requests)
+    print(ingestor.ingest('SNOW', 'KEY'), ingestor.sentiment('SNOW'), feed.requests)
@@ -0,0 +1,330 @@
+import os
+import json
+import warnings
+import time
+import hashlib
+import itertools
+import tempfile
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from multiprocessing import shared_memory
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtester import MarketData, RebalanceParams, run_backtest
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Trading bars covered by each `period` accepted by validate_params
+PERIOD_BARS = {'1d': 1, '1m': 21, '3m': 63, '6m': 126, '1y': 252, '2y': 504, '5y': 1260, '10y': 2520}
+REBALANCE_FIELDS = {f.name for f in fields(RebalanceParams)}
+
+def parameter_grid(**axes: Iterable[Any]) -> List[Dict[str, Any]]:
+    """
+    Cartesian product of parameter values.
+
+    :param axes: RebalanceParams field names (plus 'period') mapped to the values to try
+    :return: List of configuration dictionaries
+    """
+    unknown = set(axes) - REBALANCE_FIELDS - {'period'}
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(list(axes[n]) for n in names))]
+
+def walk_forward_windows(n_bars: int, train_bars: int, test_bars: int, step: Optional[int] = None) -> List[Tuple[int, int, int]]:
+    """
+    Rolling in-sample/out-of-sample windows.
+
+    :param n_bars: Length of the price history
+    :param train_bars: In-sample bars per window
+    :param test_bars: Out-of-sample bars per window
+    :param step: Bars between window starts, defaults to test_bars
+    :return: List of (train_start, train_end, test_end) bar indices
+    """
+    step = step or test_bars
+    windows = []
+    start = 0
+    while start + train_bars + test_bars <= n_bars:
+        windows.append((start, start + train_bars, start + train_bars + test_bars))
+        start += step
+    return windows
+
+def lookback_signal(close: np.ndarray, lookback: int) -> np.ndarray:
+    """
+    Default signal when no earnings-model signal is supplied: the trailing return over
+    `lookback` bars, standardised across symbols at each bar.
+
+    :param close: Price matrix (n_bars, n_symbols)
+    :param lookback: Bars of history behind each reading
+    :return: Signal matrix of the same shape, NaN during warm-up
+    """
+    trailing = pd.DataFrame(close).ffill().pct_change(lookback, fill_method=None).to_numpy()
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        # Warm-up rows are all NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = np.nanmean(trailing, axis=1, keepdims=True)
+        std = np.nanstd(trailing, axis=1, keepdims=True)
+        return (trailing - mean) / np.where(std > 0, std, np.nan)
+
+def data_fingerprint(market: MarketData, signals: Optional[Dict[str, np.ndarray]] = None,
+                     initial_cash: float = 0.0) -> str:
+    """
+    :return: Digest of everything besides the configuration that a backtest result depends on:
+             prices, symbols, precomputed signals and starting cash
+    """
+    digest = hashlib.blake2b(digest_size=10)
+    close = np.ascontiguousarray(market.close, dtype=np.float64)
+    digest.update(json.dumps({'shape': close.shape, 'symbols': list(market.symbols),
+                              'initial_cash': float(initial_cash)}).encode("utf-8"))
+    digest.update(close.tobytes())
+    for period in sorted(signals or {}):
+        digest.update(period.encode("utf-8"))
+        digest.update(np.ascontiguousarray(signals[period], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+def config_key(config: Dict[str, Any], window: Optional[Tuple[int, int]] = None, fingerprint: str = "") -> str:
+    """
+    :param fingerprint: data_fingerprint of the sweep's inputs, so results never carry over to other data
+    :return: Stable identifier of a configuration (and bar window) used for checkpointing
+    """
+    payload = json.dumps({'config': config, 'window': window, 'data': fingerprint}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=10).hexdigest()
+
+# Worker state, attached once per process by the pool initializer
+_worker_close: Optional[np.ndarray] = None
+_worker_symbols: Optional[List[str]] = None
+_worker_signals: Dict[str, np.ndarray] = {}
+_worker_options: Dict[str, Any] = {}
+_worker_segments: List[shared_memory.SharedMemory] = []
+
+def _attach(name: str, shape: Tuple[int, ...]) -> np.ndarray:
+    segment = shared_memory.SharedMemory(name=name)
+    _worker_segments.append(segment)
+    return np.ndarray(shape, dtype=np.float64, buffer=segment.buf)
+
+def _init_worker(close_name: str, shape: Tuple[int, int], symbols: List[str], signal_names: Dict[str, str],
+                 options: Dict[str, Any]) -> None:
+    global _worker_close, _worker_symbols, _worker_signals, _worker_options
+    _worker_close = _attach(close_name, shape)
+    _worker_symbols = symbols
+    _worker_signals = {period: _attach(name, shape) for period, name in signal_names.items()}
+    _worker_options = options
+    logging.getLogger().setLevel(logging.WARNING)
+
+def _signal_for(period: Optional[str]) -> Optional[np.ndarray]:
+    if period is None:
+        return None
+    if period not in _worker_signals:
+        if period not in PERIOD_BARS:
+            raise ValueError(f"Period '{period}' has no fixed bar length; supply a precomputed signal for it.")
+        _worker_signals[period] = lookback_signal(_worker_close, PERIOD_BARS[period])
+    return _worker_signals[period]
+
+def _run_task(task: Tuple[str, Dict[str, Any], int, int]) -> Dict[str, Any]:
+    key, config, start, stop = task
+    began = time.perf_counter()
+    try:
+        params = RebalanceParams(**{k: v for k, v in config.items() if k in REBALANCE_FIELDS})
+        signal = _signal_for(config.get('period'))
+        market = MarketData(np.arange(start, stop), _worker_symbols, _worker_close[start:stop])
+        result = run_backtest(market, params, initial_cash=_worker_options['initial_cash'],
+                              signal=None if signal is None else signal[start:stop])
+        return {'key': key, 'config': config, 'window': [start, stop], 'metrics': result.metrics,
+                'rebalances': int(result.rebalances.sum()), 'seconds': time.perf_counter() - began}
+    except Exception as e:
+        return {'key': key, 'config': config, 'window': [start, stop], 'error': f"{type(e).__name__}: {e}",
+                'seconds': time.perf_counter() - began}
+
+class SweepCheckpoint:
+    """
+    Append-only JSON-lines log of finished backtests, so an interrupted sweep resumes
+    where it stopped. Rows are keyed by config_key, which includes the data fingerprint, so
+    rows written for other prices, symbols or starting cash are never reused.
+    """
+
+    def __init__(self, path: Optional[str]):
+        """
+        :param path: Checkpoint file, or None to keep results in memory only
+        """
+        self.path = path
+        self.results: Dict[str, Dict[str, Any]] = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from an interrupted write
+                        continue
+                    self.results[row['key']] = row
+            logger.info(f"Resuming sweep with {len(self.results)} checkpointed results from {path}")
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.results
+
+    def add(self, row: Dict[str, Any], persist: bool = True) -> None:
+        """
+        :param row: Result row keyed by config_key
+        :param persist: Write the row to the checkpoint file; failed runs are kept in memory only so a resume retries them
+        """
+        self.results[row['key']] = row
+        if persist and self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(row, default=str) + "\n")
+
+def rank_results(results: Iterable[Dict[str, Any]], max_drawdown: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Order backtest results by Sharpe ratio (higher first), breaking ties by smaller drawdown.
+
+    :param results: Result rows from ParameterSweep.run
+    :param max_drawdown: Drop configurations whose drawdown exceeds this
+    :return: Sorted list of successful result rows
+    """
+    ok = [row for row in results if 'metrics' in row]
+    if max_drawdown is not None:
+        ok = [row for row in ok if row['metrics']['max_drawdown'] <= max_drawdown]
+    return sorted(ok, key=lambda row: (-row['metrics']['sharpe'], row['metrics']['max_drawdown']))
+
+class ParameterSweep:
+    """
+    Runs many backtests over one price history held in shared memory.
+
+    The price matrix (and any precomputed signals) are copied once into shared memory segments
+    that every worker process maps without copying; tasks carry only the configuration and bar window.
+    """
+
+    def __init__(self, market: MarketData, signals: Optional[Dict[str, np.ndarray]] = None,
+                 initial_cash: float = 1_000_000.0, max_workers: Optional[int] = None,
+                 checkpoint_path: Optional[str] = None):
+        """
+        :param market: Price history
+        :param signals: Optional precomputed earnings-model signals keyed by `period`; periods
+                        without one fall back to lookback_signal
+        :param initial_cash: Starting cash of every backtest
+        :param max_workers: Worker processes, defaults to os.cpu_count()
+        :param checkpoint_path: JSON-lines file used to checkpoint and resume results
+        """
+        self.market = market
+        self.signals = signals or {}
+        self.initial_cash = initial_cash
+        self.max_workers = max_workers
+        self.fingerprint = data_fingerprint(market, self.signals, initial_cash)
+        self.checkpoint = SweepCheckpoint(checkpoint_path)
+
+    def _share(self, array: np.ndarray, segments: List[shared_memory.SharedMemory]) -> str:
+        array = np.ascontiguousarray(array, dtype=np.float64)
+        segment = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        segments.append(segment)
+        np.ndarray(array.shape, dtype=np.float64, buffer=segment.buf)[...] = array
+        return segment.name
+
+    def run(self, configs: List[Dict[str, Any]], windows: Optional[List[Tuple[int, int]]] = None) -> List[Dict[str, Any]]:
+        """
+        Backtest every configuration on every bar window, skipping checkpointed work.
+
+        :param configs: Configuration dictionaries (see parameter_grid)
+        :param windows: List of (start, stop) bar ranges, defaults to the full history
+        :return: Result rows for every (configuration, window) pair
+        """
+        windows = windows or [(0, self.market.close.shape[0])]
+        return self.run_pairs([(config, window) for config in configs for window in windows])
+
+    def run_pairs(self, pairs: List[Tuple[Dict[str, Any], Tuple[int, int]]]) -> List[Dict[str, Any]]:
+        """
+        Backtest explicit (configuration, (start, stop)) pairs in one pool, skipping checkpointed work.
+
+        :return: Result rows aligned with pairs
+        """
+        tasks, keys = [], []
+        for config, (start, stop) in pairs:
+            key = config_key(config, (start, stop), self.fingerprint)
+            keys.append(key)
+            if key not in self.checkpoint:
+                tasks.append((key, config, start, stop))
+        logger.info(f"Sweep: {len(keys)} backtests, {len(keys) - len(tasks)} already checkpointed")
+
+        if tasks:
+            segments: List[shared_memory.SharedMemory] = []
+            try:
+                close_name = self._share(self.market.close, segments)
+                signal_names = {period: self._share(signal, segments) for period, signal in self.signals.items()}
+                initargs = (close_name, self.market.close.shape, self.market.symbols, signal_names,
+                            {'initial_cash': self.initial_cash})
+                workers = self.max_workers or os.cpu_count() or 1
+                chunksize = max(1, len(tasks) // (workers * 8))
+                started = time.perf_counter()
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+                    for row in pool.map(_run_task, tasks, chunksize=chunksize):
+                        if 'error' in row:
+                            logger.warning(f"Backtest {row['config']} on {row['window']} failed: {row['error']}")
+                        self.checkpoint.add(row, persist='error' not in row)
+                elapsed = time.perf_counter() - started
+                logger.info(f"Ran {len(tasks)} backtests in {elapsed:.1f}s ({len(tasks) / elapsed:.1f}/s)")
+            finally:
+                for segment in segments:
+                    segment.close()
+                    segment.unlink()
+        return [self.checkpoint.results[key] for key in keys]
+
+    def grid_search(self, configs: List[Dict[str, Any]], max_drawdown: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Backtest every configuration over the full history and rank them.
+
+        :return: Ranked result rows (see rank_results)
+        """
+        return rank_results(self.run(configs), max_drawdown)
+
+    def walk_forward(self, configs: List[Dict[str, Any]], train_bars: int, test_bars: int,
+                     step: Optional[int] = None, max_drawdown: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Walk-forward optimisation: pick the best configuration in each in-sample window and
+        score it on the following out-of-sample window.
+
+        :param configs: Configuration dictionaries (see parameter_grid)
+        :param train_bars: In-sample bars per window
+        :param test_bars: Out-of-sample bars per window
+        :param step: Bars between window starts, defaults to test_bars
+        :param max_drawdown: In-sample drawdown limit for eligible configurations
+        :return: Dictionary with per-window selections and the mean out-of-sample Sharpe
+        """
+        windows = walk_forward_windows(self.market.close.shape[0], train_bars, test_bars, step)
+        if not windows:
+            raise ValueError("Price history is shorter than one train + test window.")
+        in_sample = self.run(configs, [(start, mid) for start, mid, _ in windows])
+        by_window: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+        for row in in_sample:
+            by_window.setdefault(tuple(row['window']), []).append(row)
+
+        selections = []
+        for start, mid, end in windows:
+            ranked = rank_results(by_window.get((start, mid), []), max_drawdown)
+            if not ranked:
+                logger.warning(f"No eligible configuration for window {start}-{mid}")
+                continue
+            selections.append({'train': [start, mid], 'test': [mid, end], 'config': ranked[0]['config'],
+                               'in_sample': ranked[0]['metrics']})
+        out_of_sample = self.run_pairs([(s['config'], tuple(s['test'])) for s in selections])
+        for selection, row in zip(selections, out_of_sample):
+            selection['out_of_sample'] = row.get('metrics')
+        sharpes = [s['out_of_sample']['sharpe'] for s in selections if s['out_of_sample']]
+        return {'windows': selections, 'mean_oos_sharpe': float(np.mean(sharpes)) if sharpes else float('nan')}
+
+# Example usage: sweep drift bands, schedules, lookbacks and signal cutoffs over 10 years x 200 symbols
+if __name__ == "__main__":
+    from backtester import market_data_from_bars
+    from feature_pipeline import synthetic_bars
+
+    market = market_data_from_bars(synthetic_bars(200, 252 * 10))
+    grid = parameter_grid(drift_band=[0.02, 0.05, 0.1], rebalance_every=[0, 21, 63], period=['3m', '6m', '1y'],
+                          signal_tilt=[0.5], signal_cutoff=[None, -1.0, 0.0])
+    sweep = ParameterSweep(market, checkpoint_path=os.path.join(tempfile.gettempdir(), "sweep_checkpoint.jsonl"))
+    for row in sweep.grid_search(grid)[:5]:
+        print(row['config'], {k: round(v, 3) for k, v in row['metrics'].items()})
+    report = sweep.walk_forward(grid, train_bars=252 * 3, test_bars=252)
+    print(f"Walk-forward mean out-of-sample Sharpe: {report['mean_oos_sharpe']:.3f}")
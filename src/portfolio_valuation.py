@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+
+VALUATION_COLUMNS = ['current_price', 'shares', 'current_value', 'purchase_value', 'gain', 'percentage_gain']
+
+class PortfolioBook:
+    """
+    Columnar holdings model: shares and purchase prices stored in NumPy arrays indexed by symbol.
+    """
+
+    def __init__(self, symbols, shares, purchase_prices):
+        """
+        :param symbols: Sequence of stock symbols
+        :param shares: Sequence of share counts, aligned with symbols
+        :param purchase_prices: Sequence of purchase prices (cost basis per share), aligned with symbols
+        """
+        self.symbols = pd.Index(symbols, name='symbol')
+        self.shares = np.asarray(shares, dtype=float)
+        self.purchase_prices = np.asarray(purchase_prices, dtype=float)
+        if not (len(self.symbols) == len(self.shares) == len(self.purchase_prices)):
+            raise ValueError("symbols, shares and purchase_prices must have the same length.")
+        if not self.symbols.is_unique:
+            raise ValueError("Symbols in a portfolio book must be unique.")
+        self.purchase_values = self.shares * self.purchase_prices
+
+    @classmethod
+    def from_dict(cls, portfolio):
+        """
+        Build a book from the `{symbol: {"shares": ..., "purchase_price": ...}}` mapping.
+
+        :param portfolio: Dictionary containing shares and purchase price for each stock
+        :return: PortfolioBook
+        """
+        symbols = list(portfolio.keys())
+        shares = [portfolio[s]['shares'] for s in symbols]
+        purchase_prices = [portfolio[s]['purchase_price'] for s in symbols]
+        return cls(symbols, shares, purchase_prices)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def price_vector(self, prices):
+        """
+        Align prices to the book's symbol order.
+
+        :param prices: Dictionary or Series of symbol -> price, None or missing entries become NaN
+        :return: float64 NumPy array aligned with self.symbols
+        """
+        if isinstance(prices, pd.Series):
+            return prices.reindex(self.symbols).to_numpy(dtype=float, na_value=np.nan)
+        return np.array([prices.get(symbol) for symbol in self.symbols], dtype=float)
+
+    def valuate(self, prices):
+        """
+        Value the whole book in one vectorized pass.
+
+        :param prices: Dictionary or Series of current stock prices
+        :return: DataFrame indexed by symbol with float columns VALUATION_COLUMNS, NaN where price is missing
+        """
+        current_price = self.price_vector(prices)
+        current_value = self.shares * current_price
+        gain = current_value - self.purchase_values
+        with np.errstate(divide='ignore', invalid='ignore'):
+            percentage_gain = np.where(self.purchase_values != 0, gain / self.purchase_values * 100, 0.0)
+        # Keep NaN (not 0) for holdings without a price
+        percentage_gain[np.isnan(current_price)] = np.nan
+        return pd.DataFrame({
+            'current_price': current_price,
+            'shares': self.shares,
+            'current_value': current_value,
+            'purchase_value': self.purchase_values,
+            'gain': gain,
+            'percentage_gain': percentage_gain,
+        }, index=self.symbols)
+
+def valuation_totals(valuation):
+    """
+    Total value and gains over the priced holdings of a valuation frame.
+
+    :param valuation: DataFrame returned by PortfolioBook.valuate
+    :return: Tuple of (total_value, gains)
+    """
+    total_value = float(np.nansum(valuation['current_value'].to_numpy()))
+    gains = float(np.nansum(valuation['gain'].to_numpy()))
+    return total_value, gains
+
+def valuation_to_breakdown(valuation):
+    """
+    Compatibility shim: convert a valuation frame to the list-of-dicts breakdown used by display_portfolio.
+
+    Holdings without a price get the string "N/A" in their price-dependent fields.
+
+    :param valuation: DataFrame returned by PortfolioBook.valuate
+    :return: List of dictionaries with stock details
+    """
+    breakdown = []
+    missing = valuation['current_price'].isna().to_numpy()
+    records = valuation.to_dict('index')
+    for is_missing, (symbol, row) in zip(missing, records.items()):
+        shares = row['shares']
+        entry = {
+            'symbol': symbol,
+            'current_price': row['current_price'],
+            'shares': int(shares) if float(shares).is_integer() else shares,
+            'current_value': row['current_value'],
+            'purchase_value': row['purchase_value'],
+            'gain': row['gain'],
+            'percentage_gain': row['percentage_gain'],
+        }
+        if is_missing:
+            for key in ('current_price', 'current_value', 'gain', 'percentage_gain'):
+                entry[key] = "N/A"
+        breakdown.append(entry)
+    return breakdown
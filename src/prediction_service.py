@@ -0,0 +1,341 @@
+import json
+import time
+import queue
+import threading
+import logging
+from collections import deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import instrumentation
+from instrumentation import count, timed
+from model_registry import ModelRegistry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class PredictionService:
+    """
+    Long-lived earnings prediction component.
+
+    All linear models are loaded once into dense coefficient matrices (one per feature list),
+    so a micro-batch of requests for many symbols is answered with one vectorized multiply per
+    matrix. Requests can be made synchronously (predict_batch) or queued (submit) and coalesced by a background thread.
+    """
+
+    def __init__(self, registry: Optional[ModelRegistry] = None, max_batch_size: int = 1024,
+                 max_wait: float = 0.002, latency_window: int = 10000):
+        """
+        :param registry: ModelRegistry to load models from, defaults to the default registry
+        :param max_batch_size: Maximum queued requests answered in one vectorized call
+        :param max_wait: Seconds the batcher waits for more requests before running a partial batch
+        :param latency_window: Number of recent request latencies kept for percentiles
+        """
+        self.registry = registry or ModelRegistry()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: "queue.Queue" = queue.Queue()
+        self._latencies = deque(maxlen=latency_window)
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._errors = 0
+        self._started_at = time.monotonic()
+        self._worker = None
+        self._stopping = threading.Event()
+        self.reload()
+
+    def reload(self) -> None:
+        """
+        (Re)load the latest model of every symbol from the registry.
+
+        Models are grouped by feature list, with one dense coefficient matrix per group, so
+        symbols trained on different features can be served side by side.
+        """
+        self.registry.refresh()
+        symbols = self.registry.symbols()
+        grouped: Dict[Tuple[str, ...], List] = {}
+        for symbol in symbols:
+            model = self.registry.load(symbol)
+            grouped.setdefault(tuple(model.features), []).append((symbol, model))
+        positions = {}
+        groups = []
+        for g, (features, members) in enumerate(grouped.items()):
+            coef = np.empty((len(members), len(features)))
+            intercept = np.empty(len(members))
+            for row, (symbol, model) in enumerate(members):
+                coef[row] = model.coef
+                intercept[row] = model.intercept
+                positions[symbol] = (g, row)
+            groups.append((list(features), coef, intercept))
+        # Swap in one assignment so concurrent batches see a consistent snapshot
+        self._snapshot = (positions, groups)
+        logger.info(f"Loaded {len(symbols)} models in {len(groups)} feature group(s) for serving")
+
+    @property
+    def features(self) -> List[str]:
+        """
+        Feature list of the served models (the first group's if several feature lists are in use).
+        """
+        groups = self._snapshot[1]
+        return list(groups[0][0]) if groups else []
+
+    def features_for(self, symbol: str) -> Optional[List[str]]:
+        """
+        :return: Feature list expected for a symbol, or None if it has no model
+        """
+        location = self._snapshot[0].get(symbol)
+        return None if location is None else list(self._snapshot[1][location[0]][0])
+
+    def predict_batch(self, symbols: Sequence[str], X) -> np.ndarray:
+        """
+        Predict one row per request in a single vectorized call.
+
+        :param symbols: Symbol for each request
+        :param X: Array of shape (n_requests, n_features)
+        :return: Predictions of shape (n_requests,), NaN for symbols without a model
+        """
+        start = time.perf_counter()
+        predictions, known = self._vectorized(symbols, X)
+        self._record(len(symbols), time.perf_counter() - start, int((~known).sum()))
+        return predictions
+
+    @timed("model_predict_batch")
+    def _vectorized(self, symbols: Sequence[str], X) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row-wise dot product of each request with its symbol's coefficients, one vectorized
+        multiply per feature group.
+
+        :param X: Array of shape (n_requests, n_features), or a sequence of per-request vectors
+                  when symbols from groups of different widths are mixed
+        :return: Tuple of (predictions with NaN for unknown symbols, boolean mask of known symbols)
+        """
+        positions, groups = self._snapshot
+        count("predictions", len(symbols))
+        n = len(symbols)
+        if len(X) != n:
+            raise ValueError(f"Got {len(X)} feature vectors for {n} symbols.")
+        location = np.array([positions.get(symbol, (-1, -1)) for symbol in symbols], dtype=np.intp).reshape(n, 2)
+        predictions = np.full(n, np.nan)
+        for g, (_, coef, intercept) in enumerate(groups):
+            selected = np.flatnonzero(location[:, 0] == g)
+            if not len(selected):
+                continue
+            if isinstance(X, np.ndarray):
+                rows = X[selected]
+            else:
+                rows = [X[i] for i in selected]
+            rows = np.asarray(rows, dtype=float).reshape(len(selected), coef.shape[1])
+            r = location[selected, 1]
+            predictions[selected] = np.einsum('ij,ij->i', rows, coef[r]) + intercept[r]
+        return predictions, location[:, 0] >= 0
+
+    def _record(self, n_requests: int, seconds: float, errors: int = 0, latencies: Optional[List[float]] = None) -> None:
+        with self._stats_lock:
+            self._requests += n_requests
+            self._batches += 1
+            self._errors += errors
+            if latencies is None:
+                self._latencies.extend([seconds] * n_requests)
+            else:
+                self._latencies.extend(latencies)
+
+    # Micro-batching
+
+    def start(self) -> "PredictionService":
+        """
+        Start the background batcher used by submit().
+        """
+        if self._worker is None or not self._worker.is_alive():
+            self._stopping.clear()
+            self._worker = threading.Thread(target=self._run, name="prediction-batcher", daemon=True)
+            self._worker.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop the background batcher after draining queued requests.
+        """
+        self._stopping.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def submit(self, symbol: str, features) -> Future:
+        """
+        Queue one prediction request; it is answered together with other queued requests.
+
+        :param symbol: Stock symbol
+        :param features: Feature vector of length n_features
+        :return: Future resolving to the prediction (float), raising KeyError for unknown symbols
+                 or ValueError for a malformed feature vector
+        """
+        future = Future()
+        try:
+            vector = np.asarray(features, dtype=float)
+            expected = self.features_for(symbol)
+            if vector.ndim != 1 or (expected is not None and len(vector) != len(expected)):
+                raise ValueError(f"expected a flat vector of {len(expected) if expected else 'n'} features, "
+                                 f"got shape {vector.shape}")
+        except (TypeError, ValueError) as e:
+            # Rejected on its own future; it never reaches (and never fails) a shared batch
+            future.set_exception(ValueError(f"Malformed feature vector for {symbol}: {e}"))
+            self._record(1, 0.0, errors=1)
+            return future
+        if self._worker is None or not self._worker.is_alive():
+            self.start()
+        self._queue.put((symbol, vector, future, time.perf_counter()))
+        return future
+
+    def _run(self) -> None:
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._answer(batch)
+            except Exception as e:
+                # Never let one batch take the batcher down with its requests still pending
+                logger.exception("Prediction batch failed")
+                for item in batch:
+                    if not item[2].done():
+                        item[2].set_exception(e)
+
+    def _answer(self, batch: List[Tuple]) -> None:
+        try:
+            predictions, known = self._vectorized([item[0] for item in batch], [item[1] for item in batch])
+        except Exception:
+            if len(batch) == 1:
+                raise
+            # e.g. a reload changed a group's width mid-flight: answer one by one so only the
+            # affected requests fail
+            for item in batch:
+                try:
+                    self._answer([item])
+                except Exception as e:
+                    item[2].set_exception(e)
+                    self._record(1, 0.0, errors=1)
+            return
+        done = time.perf_counter()
+        for item, ok, value in zip(batch, known, predictions):
+            if ok:
+                item[2].set_result(float(value))
+            else:
+                item[2].set_exception(KeyError(f"No model for {item[0]}"))
+        self._record(len(batch), 0.0, errors=int((~known).sum()), latencies=[done - item[3] for item in batch])
+
+    # Metrics
+
+    def stats(self) -> Dict[str, float]:
+        """
+        :return: Request/batch/error counters, throughput and p50/p99 latency in milliseconds
+        """
+        with self._stats_lock:
+            latencies = np.fromiter(self._latencies, dtype=float)
+            elapsed = time.monotonic() - self._started_at
+            stats = {
+                'models': len(self._snapshot[0]),
+                'requests': self._requests,
+                'batches': self._batches,
+                'errors': self._errors,
+                'throughput_rps': self._requests / elapsed if elapsed > 0 else 0.0,
+            }
+        if len(latencies):
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            stats.update({'p50_ms': float(p50), 'p99_ms': float(p99)})
+        else:
+            stats.update({'p50_ms': 0.0, 'p99_ms': 0.0})
+        return stats
+
+def make_handler(service: PredictionService):
+    """
+    Build an HTTP request handler bound to a PredictionService.
+
+    POST /predict with {"requests": [{"symbol": "AAPL", "features": [...]}, ...]} returns
+    {"predictions": [...]} (null for unknown symbols); GET /metrics returns service stats and
+    GET /metrics/prometheus the instrumentation metrics in Prometheus text format.
+    """
+    class PredictionHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+        def _send_json(self, code, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send_json(200, service.stats())
+            elif self.path == "/metrics/prometheus":
+                body = instrumentation.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            elif self.path == "/health":
+                self._send_json(200, {'status': 'ok'})
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send_json(404, {'error': 'not found'})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                requests_ = payload['requests']
+                symbols = [item['symbol'] for item in requests_]
+                X = [item['features'] for item in requests_]
+                predictions = service.predict_batch(symbols, X) if symbols else np.empty(0)
+            except (KeyError, TypeError, ValueError) as e:
+                self._send_json(400, {'error': f"bad request: {e}"})
+                return
+            self._send_json(200, {'predictions': [None if np.isnan(p) else float(p) for p in predictions]})
+
+    return PredictionHandler
+
+def serve(service: PredictionService, host: str = "127.0.0.1", port: int = 8080) -> ThreadingHTTPServer:
+    """
+    Start the local HTTP front end on a background thread.
+
+    :param service: PredictionService to expose
+    :param host: Interface to bind
+    :param port: Port to bind, 0 picks a free port
+    :return: The running server; call shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    threading.Thread(target=server.serve_forever, name="prediction-http", daemon=True).start()
+    logger.info(f"Prediction service listening on http://{host}:{server.server_port}")
+    return server
+
+# Example usage
+if __name__ == "__main__":
+    service = PredictionService()
+    server = serve(service)
+    try:
+        while True:
+            time.sleep(60)
+            logger.info(f"Prediction stats: {service.stats()}")
+    except KeyboardInterrupt:
+        server.shutdown()
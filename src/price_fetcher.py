@@ -0,0 +1,203 @@
+import math
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from instrumentation import count, timed
+from response_cache import resolve_cache
+
+# Set up logging for better error tracking
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class YFinanceTransport:
+    """
+    Default transport: one multi-ticker yfinance download per batch.
+    """
+
+    # Identifies this provider in response cache keys; transports without one are never cached
+    source = "yfinance"
+
+    def __call__(self, symbols, period="1d"):
+        """
+        Download closing prices for a batch of symbols.
+
+        :param symbols: List of stock symbols
+        :param period: Time period for historical data
+        :return: Dictionary with stock symbols as keys and their latest prices (or None) as values
+        """
+        import pandas as pd
+        import yfinance as yf
+
+        data = yf.download(symbols, period=period, group_by="ticker", progress=False, threads=False)
+        prices = {}
+        for symbol in symbols:
+            try:
+                if isinstance(data.columns, pd.MultiIndex):
+                    closes = data[symbol]["Close"].dropna()
+                else:
+                    closes = data["Close"].dropna()
+            except KeyError:
+                closes = pd.Series(dtype=float)
+            prices[symbol] = float(closes.iloc[-1]) if not closes.empty else None
+        return prices
+
+class FakePriceTransport:
+    """
+    Local fake provider with injected latency, used for tests and benchmarks.
+
+    It has no cache `source`, so its prices never reach (or come from) the shared response cache.
+    """
+
+    def __init__(self, prices=None, latency=0.0, per_symbol_latency=0.0, failing_symbols=()):
+        """
+        :param prices: Dictionary of symbol -> price to serve, unknown symbols get 100.0
+        :param latency: Seconds to sleep per batch request
+        :param per_symbol_latency: Additional seconds to sleep per symbol in the batch
+        :param failing_symbols: Symbols that make any request containing them raise
+        """
+        self.prices = prices or {}
+        self.latency = latency
+        self.per_symbol_latency = per_symbol_latency
+        self.failing_symbols = set(failing_symbols)
+        self.calls = 0
+
+    def __call__(self, symbols, period="1d"):
+        self.calls += 1
+        time.sleep(self.latency + self.per_symbol_latency * len(symbols))
+        bad = self.failing_symbols.intersection(symbols)
+        if bad:
+            raise RuntimeError(f"Provider error for {sorted(bad)}")
+        return {symbol: self.prices.get(symbol, 100.0) for symbol in symbols}
+
+def _chunk(symbols, batch_size):
+    return [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+
+def _fetch_batch(transport, batch, period, started, key):
+    """
+    Fetch one batch, isolating per-symbol failures if the batch request fails as a whole.
+    """
+    started[key] = time.monotonic()
+    try:
+        result = transport(batch, period)
+    except Exception as e:
+        if len(batch) == 1:
+            logging.error(f"Error fetching data for {batch[0]}: {e}")
+            return {batch[0]: None}
+        # Retry symbols one at a time so one bad ticker does not poison the batch
+        logging.warning(f"Batch of {len(batch)} symbols failed ({e}), retrying individually")
+        result = {}
+        for symbol in batch:
+            try:
+                result.update(transport([symbol], period))
+            except Exception as symbol_error:
+                logging.error(f"Error fetching data for {symbol}: {symbol_error}")
+                result[symbol] = None
+    return {symbol: result.get(symbol) for symbol in batch}
+
+@timed("get_prices")
+def fetch_prices_batched(symbols, period="1d", transport=None, batch_size=50, max_workers=8, batch_timeout=30.0,
+                         cache=None):
+    """
+    Retrieve the latest closing prices for many symbols using concurrent multi-ticker batches.
+
+    Prices still fresh in the response cache are served from it; only the misses are fetched.
+    Only transports declaring a `source` attribute are cached, under that source, so prices
+    from fake or custom transports never mix with real ones.
+
+    :param symbols: List of stock symbols
+    :param period: Time period for historical data, default is '1d'
+    :param transport: Callable (symbols, period) -> {symbol: price}, defaults to YFinanceTransport
+    :param batch_size: Number of symbols per multi-ticker request
+    :param max_workers: Maximum number of batches in flight at once
+    :param batch_timeout: Seconds a running batch may take before its symbols are reported as None; the whole
+                          call is bounded by ceil(batches / workers) * batch_timeout, so batches still queued
+                          behind hung ones are reported as None too
+    :param cache: Optional ResponseCache, None uses the default cache and False disables caching
+    :return: Dictionary with stock symbols as keys and their latest prices (or None) as values
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1.")
+    if max_workers < 1:
+        raise ValueError("max_workers must be at least 1.")
+
+    transport = transport or YFinanceTransport()
+    symbols = list(dict.fromkeys(symbols))
+    prices = {symbol: None for symbol in symbols}
+    source = getattr(transport, 'source', None)
+    cache = resolve_cache(cache) if source else None
+    if cache is not None:
+        for symbol in symbols:
+            prices[symbol] = cache.get('prices', symbol, period, source)
+        missing = [symbol for symbol in symbols if prices[symbol] is None]
+    else:
+        missing = symbols
+    count("price_symbols", len(symbols))
+    count("price_cache_misses", len(missing))
+    if not missing:
+        return prices
+
+    batches = _chunk(missing, batch_size)
+    started = {}
+    workers = min(max_workers, len(batches))
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = {
+            executor.submit(_fetch_batch, transport, batch, period, started, i): i
+            for i, batch in enumerate(batches)
+        }
+        # Overall deadline: hung workers would otherwise keep queued batches from ever starting
+        deadline = time.monotonic() + math.ceil(len(batches) / workers) * batch_timeout
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=min(batch_timeout, 0.5), return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logging.error(f"Error fetching batch {futures[future]}: {e}")
+                    continue
+                prices.update(result)
+                if cache is not None:
+                    for symbol, price in result.items():
+                        cache.put('prices', symbol, period, price, source)
+
+            # Enforce the per-batch deadline, measured from when the batch actually started
+            now = time.monotonic()
+            for future in list(pending):
+                key = futures[future]
+                if key in started and now - started[key] > batch_timeout:
+                    logging.error(f"Batch {key} timed out after {batch_timeout}s: {batches[key]}")
+                    future.cancel()
+                    pending.discard(future)
+
+            if pending and now > deadline:
+                dropped = [symbol for future in pending for symbol in batches[futures[future]]]
+                logging.error(f"Price fetch deadline passed with {len(pending)} batches unfinished: {dropped}")
+                for future in pending:
+                    future.cancel()
+                break
+    finally:
+        # Do not block on abandoned (timed out) batches
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for symbol, price in prices.items():
+        if price is None:
+            logging.warning(f"No price data available for {symbol}")
+    return prices
+
+# Example usage: benchmark against the fake provider
+if __name__ == "__main__":
+    universe = [f"SYM{i}" for i in range(500)]
+    fake = FakePriceTransport(latency=0.2, per_symbol_latency=0.001)
+
+    start = time.perf_counter()
+    for symbol in universe[:20]:
+        fake([symbol])
+    serial_estimate = (time.perf_counter() - start) / 20 * len(universe)
+
+    start = time.perf_counter()
+    result = fetch_prices_batched(universe, transport=fake, batch_size=50, max_workers=8, cache=False)
+    elapsed = time.perf_counter() - start
+
+    print(f"Serial (estimated): {serial_estimate:.2f}s for {len(universe)} symbols")
+    print(f"Batched: {elapsed:.2f}s for {len(result)} symbols, {fake.calls - 20} requests")
@@ -0,0 +1,362 @@
+import json
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from portfolio_valuation import PortfolioBook
+
+# Set up logging for better error tracking
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# (symbol, price, exchange timestamp in epoch seconds)
+Quote = Tuple[str, float, float]
+
+class PriceTable:
+    """
+    Latest price plus a fixed-depth ring buffer of recent prices for every symbol.
+    """
+
+    def __init__(self, symbols: Iterable[str], depth: int = 256, initial_prices: Optional[Dict[str, float]] = None):
+        """
+        :param symbols: Stock symbols
+        :param depth: Recent prices kept per symbol
+        :param initial_prices: Optional symbol -> starting price
+        """
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.depth = depth
+        self.history = np.full((depth, len(self.symbols)), np.nan)
+        self.cursor = np.zeros(len(self.symbols), dtype=np.int64)
+        self.latest = np.full(len(self.symbols), np.nan)
+        self.updated_at = np.zeros(len(self.symbols))
+        for symbol, price in (initial_prices or {}).items():
+            if symbol in self.index and price is not None:
+                self.update(self.index[symbol], float(price), 0.0)
+
+    def update(self, i: int, price: float, timestamp: float) -> float:
+        """
+        Record a price for the symbol at position i.
+
+        :return: The previous latest price (NaN if none)
+        """
+        previous = self.latest[i]
+        self.history[self.cursor[i] % self.depth, i] = price
+        self.cursor[i] += 1
+        self.latest[i] = price
+        self.updated_at[i] = timestamp
+        return previous
+
+    def recent(self, symbol: str) -> np.ndarray:
+        """
+        :return: Recent prices of a symbol, oldest first
+        """
+        i = self.index[symbol]
+        n = int(min(self.cursor[i], self.depth))
+        order = (np.arange(self.cursor[i] - n, self.cursor[i])) % self.depth
+        return self.history[order, i].copy()
+
+class Subscription:
+    """
+    Coalescing mailbox for one subscriber: only the newest snapshot is kept, so a slow
+    subscriber never holds up the stream and never sees a backlog of stale values.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._event = asyncio.Event()
+        self.closed = False
+        self.delivered = 0
+        self.overwritten = 0
+
+    def publish(self, snapshot: Dict[str, Any]) -> None:
+        if self._event.is_set():
+            self.overwritten += 1
+        self._snapshot = snapshot
+        self._event.set()
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """
+        Wait for the next snapshot.
+
+        :return: The newest snapshot, or None once the stream has ended and the last one was read
+        """
+        if self.closed and self._snapshot is None:
+            return None
+        await self._event.wait()
+        self._event.clear()
+        snapshot, self._snapshot = self._snapshot, None
+        if snapshot is not None:
+            self.delivered += 1
+        return snapshot
+
+    def close(self) -> None:
+        # A pending final snapshot stays readable; get() returns None once it has been delivered
+        self.closed = True
+        self._event.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        snapshot = await self.get()
+        if snapshot is None:
+            raise StopAsyncIteration
+        return snapshot
+
+class StreamingPortfolio:
+    """
+    Long-running portfolio valuation driven by a quote stream.
+
+    A reader task moves quotes from the feed into a bounded queue; when the queue is full the
+    reader stops pulling from the feed (backpressure). The processor drains every queued quote
+    at once, updates the price table and the running value of each ticked holding in O(1),
+    and publishes one snapshot per drained burst (coalescing) to every subscriber.
+    """
+
+    def __init__(self, portfolio, initial_prices: Optional[Dict[str, float]] = None, queue_size: int = 10000,
+                 max_coalesce: int = 1000, depth: int = 256, latency_window: int = 100000):
+        """
+        :param portfolio: Dictionary containing shares and purchase price for each stock, or a PortfolioBook
+        :param initial_prices: Optional symbol -> price to start from (e.g. from get_prices)
+        :param queue_size: Quotes buffered between the feed and the processor
+        :param max_coalesce: Maximum quotes applied before a snapshot is published
+        :param depth: Recent prices kept per symbol in the price table
+        :param latency_window: Number of recent per-tick latencies kept for percentiles
+        """
+        self.book = portfolio if isinstance(portfolio, PortfolioBook) else PortfolioBook.from_dict(portfolio)
+        self.table = PriceTable(self.book.symbols, depth, initial_prices)
+        self.queue_size = queue_size
+        self.max_coalesce = max_coalesce
+        self.values = np.where(np.isnan(self.table.latest), 0.0, self.book.shares * self.table.latest)
+        self.total_value = float(self.values.sum())
+        self.priced_purchase_value = float(self.book.purchase_values[~np.isnan(self.table.latest)].sum())
+        self.subscribers: List[Subscription] = []
+        self._latencies = deque(maxlen=latency_window)
+        self.ticks = 0
+        self.unknown = 0
+        self.rejected = 0
+        self.snapshots = 0
+        self.seq = 0
+
+    def subscribe(self) -> Subscription:
+        """
+        :return: A new Subscription receiving every published snapshot (coalesced if slow)
+        """
+        subscription = Subscription()
+        self.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+        subscription.close()
+
+    def apply(self, symbol: str, price: float, timestamp: float) -> bool:
+        """
+        Apply one quote to the price table and running totals.
+
+        :return: False if the symbol is not held or the price is not a finite number
+        """
+        i = self.table.index.get(symbol)
+        if i is None:
+            self.unknown += 1
+            return False
+        if not math.isfinite(price):
+            # One NaN/inf would otherwise poison the running total for good
+            self.rejected += 1
+            return False
+        previous = self.table.update(i, price, timestamp)
+        value = self.book.shares[i] * price
+        self.total_value += value - self.values[i]
+        self.values[i] = value
+        if np.isnan(previous):
+            self.priced_purchase_value += self.book.purchase_values[i]
+        self.ticks += 1
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        :return: Dictionary with total value, gains over priced holdings, tick count and sequence number
+        """
+        return {
+            'seq': self.seq,
+            'time': time.time(),
+            'total_value': self.total_value,
+            'gains': self.total_value - self.priced_purchase_value,
+            'ticks': self.ticks,
+        }
+
+    def breakdown(self):
+        """
+        Full per-holding valuation at the latest prices (see PortfolioBook.valuate).
+        """
+        return self.book.valuate(dict(zip(self.table.symbols, self.table.latest)))
+
+    def _publish(self) -> None:
+        self.seq += 1
+        snapshot = self.snapshot()
+        for subscription in self.subscribers:
+            subscription.publish(snapshot)
+        self.snapshots += 1
+
+    async def _read(self, feed: AsyncIterator[Quote], queue: "asyncio.Queue") -> None:
+        try:
+            async for symbol, price, timestamp in feed:
+                # Blocks while the processor is behind, which stops reading the feed
+                await queue.put((symbol, float(price), timestamp, time.perf_counter()))
+        finally:
+            await queue.put(None)
+
+    async def run(self, feed: AsyncIterator[Quote]) -> None:
+        """
+        Consume a quote feed until it ends (or the task is cancelled).
+
+        :param feed: Async iterator of (symbol, price, timestamp) quotes
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        reader = asyncio.create_task(self._read(feed, queue))
+        received: List[float] = []
+        try:
+            while True:
+                item = await queue.get()
+                finished = item is None
+                received.clear()
+                while item is not None:
+                    symbol, price, timestamp, arrived = item
+                    self.apply(symbol, price, timestamp)
+                    received.append(arrived)
+                    if len(received) >= self.max_coalesce or queue.empty():
+                        break
+                    item = queue.get_nowait()
+                    finished = item is None
+                if received:
+                    self._publish()
+                    done = time.perf_counter()
+                    self._latencies.extend(done - arrived for arrived in received)
+                if finished:
+                    break
+            await reader
+        finally:
+            reader.cancel()
+            for subscription in self.subscribers:
+                subscription.close()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        :return: Tick/snapshot counters and per-tick latency percentiles in microseconds (queue wait included)
+        """
+        latencies = np.fromiter(self._latencies, dtype=float)
+        stats = {
+            'ticks': self.ticks,
+            'unknown_symbols': self.unknown,
+            'rejected_quotes': self.rejected,
+            'snapshots': self.snapshots,
+            'coalesced_ticks': self.ticks - self.snapshots,
+        }
+        if len(latencies):
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1e6
+            stats.update({'tick_latency_p50_us': float(p50), 'tick_latency_p99_us': float(p99)})
+        else:
+            stats.update({'tick_latency_p50_us': 0.0, 'tick_latency_p99_us': 0.0})
+        return stats
+
+async def simulated_quotes(prices: Dict[str, float], n_ticks: Optional[int] = None, rate: float = 1000.0,
+                           burst: int = 1, volatility: float = 0.0005, seed: int = 0) -> AsyncIterator[Quote]:
+    """
+    Local quote simulator: random-walk prices for the given symbols.
+
+    :param prices: symbol -> starting price
+    :param n_ticks: Quotes to emit, None streams forever
+    :param rate: Bursts per second, 0 emits as fast as the consumer accepts
+    :param burst: Quotes emitted back to back per burst
+    :param volatility: Log-return standard deviation per quote
+    :param seed: Random seed
+    :return: Async iterator of (symbol, price, timestamp)
+    """
+    rng = np.random.default_rng(seed)
+    symbols = list(prices)
+    current = np.array([prices[s] for s in symbols], dtype=float)
+    emitted = 0
+    while n_ticks is None or emitted < n_ticks:
+        count = burst if n_ticks is None else min(burst, n_ticks - emitted)
+        which = rng.integers(0, len(symbols), count)
+        moves = np.exp(rng.normal(0, volatility, count))
+        now = time.time()
+        for i, move in zip(which, moves):
+            current[i] *= move
+            yield symbols[i], float(current[i]), now
+        emitted += count
+        await asyncio.sleep(1.0 / rate if rate > 0 else 0)
+
+def _parse_trade_message(message: Any) -> List[Quote]:
+    # Alpaca-style frames: a JSON list of {"T": "t", "S": symbol, "p": price, "t": iso time}
+    quotes = []
+    for event in message if isinstance(message, list) else [message]:
+        if event.get('T') in ('t', 'q') and 'S' in event:
+            price = event.get('p', event.get('ap'))
+            if price is not None:
+                quotes.append((event['S'], float(price), time.time()))
+    return quotes
+
+async def websocket_quotes(url: str, subscribe_message: Optional[Dict[str, Any]] = None,
+                           parse: Callable[[Any], List[Quote]] = _parse_trade_message,
+                           reconnect_delay: float = 1.0) -> AsyncIterator[Quote]:
+    """
+    Quotes from a WebSocket feed, reconnecting on connection loss.
+
+    Requires the optional `websockets` package.
+
+    :param url: Feed URL
+    :param subscribe_message: JSON message sent after connecting (authentication/subscription)
+    :param parse: Callable turning one decoded JSON message into a list of quotes
+    :param reconnect_delay: Seconds to wait before reconnecting
+    :return: Async iterator of (symbol, price, timestamp)
+    """
+    import websockets
+
+    while True:
+        try:
+            async with websockets.connect(url) as socket:
+                if subscribe_message is not None:
+                    await socket.send(json.dumps(subscribe_message))
+                async for raw in socket:
+                    for quote in parse(json.loads(raw)):
+                        yield quote
+        except (OSError, websockets.ConnectionClosed) as e:
+            logger.warning(f"Quote feed disconnected ({e}); reconnecting in {reconnect_delay}s")
+            await asyncio.sleep(reconnect_delay)
+
+async def print_updates(subscription: Subscription, every: float = 1.0) -> None:
+    """
+    Print portfolio value and gains from a subscription, at most once per `every` seconds.
+    """
+    last = 0.0
+    async for snapshot in subscription:
+        if snapshot['time'] - last >= every:
+            print(f"[{snapshot['seq']}] Total Portfolio Value: ${snapshot['total_value']:.2f}, "
+                  f"Total Gains: ${snapshot['gains']:.2f}")
+            last = snapshot['time']
+
+# Example usage: stream 200k simulated quotes in bursts through a 3-stock portfolio
+if __name__ == "__main__":
+    portfolio = {
+        "AAPL": {"shares": 50, "purchase_price": 150.00},
+        "TSLA": {"shares": 30, "purchase_price": 700.00},
+        "MSFT": {"shares": 20, "purchase_price": 250.00},
+    }
+    start_prices = {"AAPL": 190.0, "TSLA": 250.0, "MSFT": 410.0}
+
+    async def demo():
+        stream = StreamingPortfolio(portfolio, start_prices)
+        printer = asyncio.create_task(print_updates(stream.subscribe(), every=0.5))
+        await stream.run(simulated_quotes(start_prices, n_ticks=200000, rate=0, burst=50))
+        await printer
+        print(stream.stats())
+
+    asyncio.run(demo())
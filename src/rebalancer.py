@@ -0,0 +1,252 @@
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from portfolio_valuation import PortfolioBook
+
+# Set up logging for better error tracking
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Order:
+    """
+    One rebalancing order.
+
+    side: 'buy' or 'sell'
+    quantity: Positive number of shares, a multiple of the lot size
+    price: Reference price the order was sized at
+    """
+    symbol: str
+    side: str
+    quantity: float
+    price: float
+
+    @property
+    def signed_quantity(self) -> float:
+        return self.quantity if self.side == 'buy' else -self.quantity
+
+class IncrementalRebalancer:
+    """
+    Keeps portfolio weights current as single price ticks arrive and decides when to rebalance.
+
+    A tick updates the ticked holding's value and the running total in O(1). Because the other
+    holdings' values are unchanged, each of them stays inside its drift band exactly while the
+    total value V stays inside an interval [lo_i, hi_i]; the rebalancer keeps the intersection of
+    those intervals, so most ticks decide with a couple of comparisons. Only when V leaves that
+    (possibly conservative) interval is the whole book rescanned, vectorized, to confirm a breach.
+    """
+
+    def __init__(self, symbols: Iterable[str], shares, prices, target_weights: Dict[str, float],
+                 cash: float = 0.0, band: float = 0.05, lot_size: int = 1):
+        """
+        :param symbols: Stock symbols
+        :param shares: Share counts aligned with symbols
+        :param prices: Current prices aligned with symbols (all must be known)
+        :param target_weights: symbol -> target weight; symbols not listed target 0
+        :param cash: Uninvested cash, part of the portfolio value
+        :param band: Absolute weight drift that triggers a rebalance
+        :param lot_size: Orders are rounded down to multiples of this many shares
+        """
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.shares = np.asarray(shares, dtype=float).copy()
+        self.prices = np.asarray(prices, dtype=float).copy()
+        if not (len(self.symbols) == len(self.shares) == len(self.prices)):
+            raise ValueError("symbols, shares and prices must have the same length.")
+        if np.isnan(self.prices).any() or (self.prices <= 0).any():
+            raise ValueError("Every holding needs a positive starting price.")
+        self.targets = np.array([target_weights.get(s, 0.0) for s in self.symbols], dtype=float)
+        if self.targets.sum() > 1 + 1e-9:
+            raise ValueError("Target weights must not sum to more than 1.")
+        self.cash = float(cash)
+        self.band = band
+        self.lot_size = max(1, int(lot_size))
+        self.pending = False
+        self.ticks = 0
+        self.rescans = 0
+        # Band edges in weight space; a non-positive lower edge can never be breached
+        self._upper = self.targets + band
+        self._lower = np.where(self.targets - band > 0, self.targets - band, 0.0)
+        self._rescan()
+
+    @classmethod
+    def from_portfolio(cls, portfolio: Dict[str, Dict[str, float]], prices: Dict[str, float],
+                       target_weights: Optional[Dict[str, float]] = None, **kwargs) -> "IncrementalRebalancer":
+        """
+        Build a rebalancer from the trading_script `portfolio` mapping.
+
+        :param portfolio: {symbol: {"shares": ..., "purchase_price": ...}}
+        :param prices: symbol -> current price
+        :param target_weights: symbol -> weight, defaults to equal weight
+        :return: IncrementalRebalancer
+        """
+        book = PortfolioBook.from_dict(portfolio)
+        symbols = list(book.symbols)
+        if target_weights is None:
+            target_weights = {symbol: 1.0 / len(symbols) for symbol in symbols}
+        return cls(symbols, book.shares, book.price_vector(prices), target_weights, **kwargs)
+
+    def _intervals(self, values: np.ndarray):
+        # Weight v/V is within [lower, upper] exactly while V is within [v/upper, v/lower]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lo = values / self._upper
+            hi = np.where(self._lower > 0, values / self._lower, np.inf)
+        return lo, hi
+
+    def _rescan(self) -> None:
+        """
+        Recompute values, the running total and the safe interval exactly, in one vectorized pass.
+        """
+        self.rescans += 1
+        self.values = self.shares * self.prices
+        self.total = float(self.values.sum()) + self.cash
+        self._lo, self._hi = self._intervals(self.values)
+        self._lo_max = float(self._lo.max()) if len(self._lo) else 0.0
+        self._hi_min = float(self._hi.min()) if len(self._hi) else np.inf
+
+    def weights(self) -> np.ndarray:
+        """
+        :return: Current weight of every holding, aligned with self.symbols
+        """
+        return self.values / self.total if self.total > 0 else np.zeros(len(self.values))
+
+    def drift(self) -> np.ndarray:
+        """
+        :return: Current weight minus target weight for every holding
+        """
+        return self.weights() - self.targets
+
+    def on_tick(self, symbol: str, price: float) -> List[Order]:
+        """
+        Apply one price update and decide whether to rebalance.
+
+        :param symbol: Stock symbol
+        :param price: New price
+        :return: Orders to send, empty when every weight is within its band (or orders are pending)
+        """
+        i = self.index[symbol]
+        value = self.shares[i] * price
+        self.total += value - self.values[i]
+        self.values[i] = value
+        self.prices[i] = price
+        self.ticks += 1
+
+        # The ticked holding's interval moved; widen or narrow the cached bounds in O(1)
+        upper, lower = self._upper[i], self._lower[i]
+        lo_i = value / upper
+        hi_i = value / lower if lower > 0 else np.inf
+        self._lo[i], self._hi[i] = lo_i, hi_i
+        if lo_i > self._lo_max:
+            self._lo_max = lo_i
+        if hi_i < self._hi_min:
+            self._hi_min = hi_i
+
+        if self.pending or self._lo_max <= self.total <= self._hi_min:
+            return []
+        # Cached bounds can be stale (too tight); confirm against exact values
+        self._rescan()
+        if self._lo_max <= self.total <= self._hi_min:
+            return []
+        return self.orders()
+
+    def orders(self) -> List[Order]:
+        """
+        Minimal order list: only holdings outside their band are traded, back to their targets,
+        rounded toward zero to whole lots. If their sells and the cash cannot fund their buys,
+        overweight holdings inside the band are trimmed too, and any remaining shortfall scales buys down.
+
+        :return: List of orders, sells first
+        """
+        weights = self.weights()
+        breached = np.flatnonzero((weights > self._upper) | (weights < self._lower))
+        if not len(breached):
+            return []
+        delta = self.targets[breached] * self.total / self.prices[breached] - self.shares[breached]
+        notional = delta * self.prices[breached]
+        sells = -notional[notional < 0].sum()
+        buys = notional[notional > 0].sum()
+        if buys > sells + self.cash:
+            # Underweights cannot be funded by the breached sells alone; also trim in-band overweights
+            breached = np.union1d(breached, np.flatnonzero(weights > self.targets))
+            delta = self.targets[breached] * self.total / self.prices[breached] - self.shares[breached]
+            notional = delta * self.prices[breached]
+            sells = -notional[notional < 0].sum()
+            buys = notional[notional > 0].sum()
+            if buys > sells + self.cash:
+                scale = max(0.0, sells + self.cash) / buys
+                delta = np.where(delta > 0, delta * scale, delta)
+        lots = np.trunc(delta / self.lot_size) * self.lot_size
+        # Never sell more than is held
+        lots = np.maximum(lots, -self.shares[breached])
+        orders = [Order(self.symbols[i], 'buy' if q > 0 else 'sell', float(abs(q)), float(self.prices[i]))
+                  for i, q in zip(breached, lots) if q != 0]
+        orders.sort(key=lambda order: order.side != 'sell')
+        self.pending = bool(orders)
+        return orders
+
+    def apply_fills(self, fills: Iterable[Order]) -> None:
+        """
+        Book executed orders (quantity and fill price) and clear the pending flag.
+
+        :param fills: Filled orders
+        """
+        for fill in fills:
+            i = self.index[fill.symbol]
+            self.shares[i] += fill.signed_quantity
+            self.cash -= fill.signed_quantity * fill.price
+        self.pending = False
+        self._rescan()
+
+    def cancel_pending(self) -> None:
+        """
+        Forget outstanding orders so the next tick may emit a fresh order list.
+        """
+        self.pending = False
+
+def benchmark(n_positions: int = 10000, n_ticks: int = 200000, band: float = 1e-5,
+              volatility: float = 0.01, seed: int = 0) -> Dict[str, float]:
+    """
+    Tick-to-decision latency on a large equal-weight book, with fills applied immediately.
+
+    :param band: Absolute drift band (1e-5 is 10% of each holding's 1e-4 target at 10k positions)
+    :param volatility: Log-return standard deviation of each tick
+
+    :return: Dictionary with latency percentiles (microseconds), rescans, rebalances and orders
+    """
+    rng = np.random.default_rng(seed)
+    symbols = [f"SYM{i}" for i in range(n_positions)]
+    prices = rng.uniform(20, 500, n_positions)
+    targets = {symbol: 1.0 / n_positions for symbol in symbols}
+    shares = np.floor(1e9 / n_positions / prices)
+    rebalancer = IncrementalRebalancer(symbols, shares, prices, targets, cash=1e9 - shares @ prices, band=band)
+
+    which = rng.integers(0, n_positions, n_ticks)
+    moves = np.exp(rng.normal(0, volatility, n_ticks))
+    latencies = np.empty(n_ticks)
+    rebalances = orders_sent = 0
+    for k in range(n_ticks):
+        i = which[k]
+        price = rebalancer.prices[i] * moves[k]
+        start = time.perf_counter()
+        orders = rebalancer.on_tick(symbols[i], price)
+        latencies[k] = time.perf_counter() - start
+        if orders:
+            rebalances += 1
+            orders_sent += len(orders)
+            rebalancer.apply_fills(orders)
+
+    p50, p99, p999 = np.percentile(latencies, [50, 99, 99.9]) * 1e6
+    return {'positions': n_positions, 'ticks': n_ticks, 'p50_us': float(p50), 'p99_us': float(p99),
+            'p999_us': float(p999), 'max_us': float(latencies.max() * 1e6), 'rescans': rebalancer.rescans,
+            'rebalances': rebalances, 'orders': orders_sent}
+
+# Example usage: tick-to-decision latency at 10k positions
+if __name__ == "__main__":
+    result = benchmark()
+    print(f"{result['positions']} positions, {result['ticks']} ticks: p50 {result['p50_us']:.1f}us, "
+          f"p99 {result['p99_us']:.1f}us, p99.9 {result['p999_us']:.1f}us, max {result['max_us']:.1f}us; "
+          f"{result['rescans']} rescans, {result['rebalances']} rebalances, {result['orders']} orders")
@@ -0,0 +1,244 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import logging
+
+# Set up logging for better error tracking
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Time-to-live in seconds per dataset: earnings change a few times a year, intraday prices change constantly
+DEFAULT_TTLS = {
+    'earnings': 7 * 24 * 3600,
+    'stock_data': 24 * 3600,
+    'prices': 60,
+}
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "balancing-wheel", "responses")
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache for API responses with per-dataset TTLs and an LRU size cap.
+
+    Entries are JSON files named by the SHA-256 of (dataset, source, symbol, period). Writes go
+    through a temporary file and os.replace so several processes can share one directory.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=256 * 1024 * 1024, ttls=None):
+        """
+        :param directory: Cache directory, created if missing
+        :param max_bytes: Size cap; least recently used entries are evicted above it
+        :param ttls: Optional dictionary of dataset -> TTL seconds, merged over DEFAULT_TTLS
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._lock = threading.Lock()
+        self._approx_bytes = None
+        self.counters = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0, 'errors': 0}
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(dataset, symbol, period, source=""):
+        """
+        Content address for a response.
+
+        :return: Hex SHA-256 digest
+        """
+        raw = json.dumps([dataset, source, symbol, period], separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def get(self, dataset, symbol, period, source=""):
+        """
+        Look up a cached response.
+
+        :param dataset: Dataset name, selects the TTL (e.g. 'earnings', 'prices')
+        :param symbol: Stock symbol
+        :param period: Period the response covers
+        :param source: Optional source identifier (e.g. API base URL)
+        :return: Cached value or None on miss/expiry
+        """
+        path = self._path(self.key(dataset, symbol, period, source))
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Discarding unreadable cache entry {path}: {e}")
+            self._count('errors')
+            self._remove(path)
+            self._count('misses')
+            return None
+
+        ttl = self.ttls.get(dataset)
+        if ttl is not None and time.time() - entry.get('stored_at', 0) > ttl:
+            self._count('expired')
+            self._count('misses')
+            self._remove(path)
+            return None
+
+        # Touch the file so eviction sees it as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count('hits')
+        return entry.get('value')
+
+    def put(self, dataset, symbol, period, value, source=""):
+        """
+        Store a JSON-serialisable response atomically.
+
+        :param dataset: Dataset name
+        :param symbol: Stock symbol
+        :param period: Period the response covers
+        :param value: JSON-serialisable value; None is never cached
+        :param source: Optional source identifier
+        """
+        if value is None:
+            return
+        path = self._path(self.key(dataset, symbol, period, source))
+        try:
+            payload = json.dumps({'stored_at': time.time(), 'dataset': dataset, 'value': value}).encode("utf-8")
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Not caching unserialisable {dataset} value for {symbol}: {e}")
+            self._count('errors')
+            return
+        try:
+            previous_size = os.path.getsize(path)
+        except OSError:
+            previous_size = 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Failed to write cache entry for {symbol}: {e}")
+            self._count('errors')
+            return
+        self._count('stores')
+
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._scan_size()
+            else:
+                # An overwritten entry no longer takes up its old size
+                self._approx_bytes += len(payload) - previous_size
+            over = self._approx_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def evict(self, target_ratio=0.9):
+        """
+        Remove least recently used entries until the cache is below target_ratio * max_bytes.
+
+        :return: Number of entries removed
+        """
+        entries = sorted(self._entries(), key=lambda e: e[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * target_ratio
+        removed = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            if self._remove(path):
+                total -= size
+                removed += 1
+        with self._lock:
+            self._approx_bytes = total
+            self.counters['evictions'] += removed
+        return removed
+
+    def clear(self):
+        """
+        Remove every cache entry.
+        """
+        for path, _, _ in list(self._entries()):
+            self._remove(path)
+        with self._lock:
+            self._approx_bytes = 0
+
+    def stats(self):
+        """
+        Snapshot of hit/miss counters.
+
+        :return: Dictionary of counter name -> value
+        """
+        with self._lock:
+            return dict(self.counters)
+
+    def metrics_text(self, prefix="response_cache"):
+        """
+        Render counters in Prometheus text exposition format.
+
+        :param prefix: Metric name prefix
+        :return: String suitable for a /metrics endpoint
+        """
+        lines = []
+        for name, value in self.stats().items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+def get_default_cache():
+    """
+    Return the process-wide cache, creating it on first use.
+
+    :return: ResponseCache
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+    return _default_cache
+
+def resolve_cache(cache):
+    """
+    Normalise a `cache` argument: None means the default cache, False disables caching.
+
+    :param cache: ResponseCache, None or False
+    :return: ResponseCache or None
+    """
+    if cache is False:
+        return None
+    if cache is None:
+        return get_default_cache()
+    return cache
@@ -0,0 +1,253 @@
+import math
+import time
+import logging
+from statistics import NormalDist
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from portfolio_valuation import PortfolioBook
+
+# Set up logging for better error tracking
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+
+def _symmetric_kernels():
+    """
+    :return: (syr, symv) BLAS routines for in-place symmetric rank-1 updates, or (None, None) without SciPy
+    """
+    try:
+        from scipy.linalg import blas
+    except ImportError:
+        return None, None
+    return blas.dsyr, blas.dsymv
+
+class RiskEngine:
+    """
+    Incremental portfolio risk state.
+
+    Each new bar updates an exponentially weighted mean and covariance of returns with one
+    rank-1 update (O(N^2), no full recompute), appends the bar's returns to a fixed-size ring
+    buffer for historical VaR, and extends the portfolio equity curve for drawdown.
+    """
+
+    def __init__(self, symbols: Iterable[str], decay: float = 0.94, window: int = 250,
+                 periods_per_year: int = TRADING_DAYS):
+        """
+        :param symbols: Stock symbols, in the column order of the price vectors passed to update()
+        :param decay: EW decay factor lambda (0.94 is the RiskMetrics daily value)
+        :param window: Bars of returns kept for historical VaR
+        :param periods_per_year: Bars per year, for annualised volatility
+        """
+        if not 0 < decay < 1:
+            raise ValueError("decay must be between 0 and 1.")
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        n = len(self.symbols)
+        self.decay = decay
+        self.window = window
+        self.periods_per_year = periods_per_year
+        self.mean = np.zeros(n)
+        # Fortran order so the BLAS update can write in place; only the upper triangle is kept current
+        self._cov = np.zeros((n, n), order='F')
+        self.returns = np.zeros((window, n))
+        self.bars = 0
+        self.last_prices: Optional[np.ndarray] = None
+        self.shares = np.zeros(n)
+        self.cash = 0.0
+        self.equity_peak = -np.inf
+        self.max_drawdown = 0.0
+        self.equity = np.nan
+        self._syr, self._symv = _symmetric_kernels()
+
+    def set_holdings(self, portfolio, cash: float = 0.0) -> None:
+        """
+        Set the holdings whose risk is reported.
+
+        Equity is re-marked at the last prices and the drawdown tracking restarts from it, so a
+        change of holdings is not recorded as a drawdown or a new peak.
+
+        :param portfolio: {symbol: {"shares", "purchase_price"}} (trading_script format) or a PortfolioBook
+        :param cash: Uninvested cash
+        """
+        book = portfolio if isinstance(portfolio, PortfolioBook) else PortfolioBook.from_dict(portfolio)
+        unknown = [s for s in book.symbols if s not in self.index]
+        if unknown:
+            raise ValueError(f"Holdings not covered by the risk engine: {unknown}")
+        self.shares = np.zeros(len(self.symbols))
+        self.shares[[self.index[s] for s in book.symbols]] = book.shares
+        self.cash = float(cash)
+        self.equity_peak = -np.inf
+        self.max_drawdown = 0.0
+        if self.last_prices is not None:
+            self._mark_to_market()
+
+    def update(self, prices) -> None:
+        """
+        Fold one bar of prices into the risk state.
+
+        :param prices: Prices aligned with self.symbols (NaN keeps the previous price, i.e. a zero return)
+        """
+        prices = np.asarray(prices, dtype=float)
+        if self.last_prices is None:
+            self.last_prices = np.where(np.isnan(prices), 0.0, prices)
+            self._mark_to_market()
+            return
+        prices = np.where(np.isnan(prices), self.last_prices, prices)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = np.where(self.last_prices > 0, prices / self.last_prices - 1, 0.0)
+        self.last_prices = prices
+
+        alpha = 1 - self.decay
+        if self.bars == 0:
+            self.mean[:] = r
+        else:
+            diff = r - self.mean
+            self.mean += alpha * diff
+            # S <- lambda * (S + alpha * diff diff^T)
+            self._cov *= self.decay
+            if self._syr is not None:
+                self._syr(self.decay * alpha, diff, a=self._cov, overwrite_a=1)
+            else:
+                self._cov += (self.decay * alpha) * np.outer(diff, diff)
+        self.returns[self.bars % self.window] = r
+        self.bars += 1
+        self._mark_to_market()
+
+    def _mark_to_market(self) -> None:
+        self.equity = float(self.shares @ self.last_prices) + self.cash
+        if self.equity > self.equity_peak:
+            self.equity_peak = self.equity
+        elif self.equity_peak > 0:
+            self.max_drawdown = max(self.max_drawdown, (self.equity_peak - self.equity) / self.equity_peak)
+
+    def covariance(self) -> np.ndarray:
+        """
+        :return: Full (symmetric) EW covariance matrix of per-bar returns
+        """
+        if self._syr is None:
+            return np.array(self._cov)
+        upper = np.triu(self._cov)
+        return upper + np.triu(upper, 1).T
+
+    def weights(self) -> np.ndarray:
+        """
+        :return: Holding weights (fraction of portfolio value incl. cash) aligned with self.symbols
+        """
+        if self.last_prices is None or not self.equity:
+            return np.zeros(len(self.symbols))
+        return self.shares * self.last_prices / self.equity
+
+    def portfolio_variance(self, weights: Optional[np.ndarray] = None) -> float:
+        """
+        :return: Per-bar variance of portfolio returns, w^T S w
+        """
+        w = self.weights() if weights is None else np.asarray(weights, dtype=float)
+        if self._symv is not None:
+            return float(w @ self._symv(1.0, self._cov, w))
+        return float(w @ (self._cov @ w))
+
+    def report(self, confidence: float = 0.99, horizon: int = 1) -> Dict[str, float]:
+        """
+        Risk numbers for the current holdings.
+
+        :param confidence: VaR confidence level
+        :param horizon: VaR horizon in bars (square-root-of-time scaling for the parametric VaR)
+        :return: Dictionary with value, volatility (per bar and annualised), parametric and historical
+                 VaR/expected shortfall in currency, and max drawdown
+        """
+        w = self.weights()
+        sigma = math.sqrt(max(self.portfolio_variance(w), 0.0))
+        mu = float(w @ self.mean)
+        z = NormalDist().inv_cdf(confidence)
+        value = self.equity if self.bars else 0.0
+        parametric = max(0.0, z * sigma * math.sqrt(horizon) - mu * horizon) * value
+        parametric_es = max(0.0, sigma * math.sqrt(horizon) * math.exp(-z * z / 2) / (math.sqrt(2 * math.pi) * (1 - confidence))
+                            - mu * horizon) * value
+
+        history = self.returns[:min(self.bars, self.window)] @ w
+        if len(history):
+            cutoff = float(np.quantile(history, 1 - confidence))
+            historical = max(0.0, -cutoff) * math.sqrt(horizon) * value
+            tail = history[history <= cutoff]
+            historical_es = max(0.0, -float(tail.mean())) * math.sqrt(horizon) * value if len(tail) else historical
+        else:
+            historical = historical_es = 0.0
+        return {
+            'value': value,
+            'volatility': sigma,
+            'annualized_volatility': sigma * math.sqrt(self.periods_per_year),
+            'parametric_var': parametric,
+            'parametric_es': parametric_es,
+            'historical_var': historical,
+            'historical_es': historical_es,
+            'max_drawdown': self.max_drawdown,
+            'bars': self.bars,
+        }
+
+def portfolio_risk(close: np.ndarray, symbols: Iterable[str], portfolio, cash: float = 0.0, **kwargs) -> Dict[str, float]:
+    """
+    Replay a price history through a RiskEngine and report risk for the holdings.
+
+    :param close: Price matrix (n_bars, n_symbols), e.g. MarketData.close from the backtester
+    :param symbols: Column symbols of close
+    :param portfolio: {symbol: {"shares", "purchase_price"}} as in trading_script
+    :param cash: Uninvested cash
+    :param kwargs: Options for RiskEngine
+    :return: Output of RiskEngine.report()
+    """
+    engine = RiskEngine(symbols, **kwargs)
+    engine.set_holdings(portfolio, cash)
+    for row in np.asarray(close, dtype=float):
+        engine.update(row)
+    return engine.report()
+
+def benchmark(sizes=(100, 1000, 3000), bars: int = 100, window: int = 250, seed: int = 0) -> list:
+    """
+    Per-bar cost of the incremental update versus recomputing an EW covariance from the
+    return window, at several universe sizes.
+
+    :return: List of result dictionaries, one per size
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for n in sizes:
+        symbols = [f"SYM{i}" for i in range(n)]
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, size=(window + bars, n)), axis=0))
+        engine = RiskEngine(symbols, window=window)
+        engine.set_holdings({s: {'shares': 10, 'purchase_price': 100.0} for s in symbols})
+        for row in prices[:window]:
+            engine.update(row)
+
+        start = time.perf_counter()
+        for row in prices[window:]:
+            engine.update(row)
+        update_ms = (time.perf_counter() - start) / bars * 1000
+
+        start = time.perf_counter()
+        report = engine.report()
+        report_ms = (time.perf_counter() - start) * 1000
+
+        # Full recompute of an EW covariance over the window, as a from-scratch risk cycle would do
+        weights = engine.decay ** np.arange(window)[::-1]
+        weights /= weights.sum()
+        full_runs = 3
+        start = time.perf_counter()
+        for _ in range(full_runs):
+            centered = engine.returns - weights @ engine.returns
+            (centered * weights[:, None]).T @ centered
+        full_ms = (time.perf_counter() - start) / full_runs * 1000
+
+        results.append({'symbols': n, 'update_ms': update_ms, 'report_ms': report_ms, 'full_recompute_ms': full_ms,
+                        'annualized_volatility': report['annualized_volatility'],
+                        'parametric_var': report['parametric_var'], 'historical_var': report['historical_var']})
+    return results
+
+# Example usage: incremental update cost at 100, 1,000 and 3,000 symbols
+if __name__ == "__main__":
+    for row in benchmark():
+        print(f"{row['symbols']:>5} symbols: update {row['update_ms']:.2f} ms/bar, report {row['report_ms']:.2f} ms, "
+              f"full recompute {row['full_recompute_ms']:.1f} ms; vol {row['annualized_volatility']:.2%}, "
+              f"99% VaR param {row['parametric_var']:,.0f} hist {row['historical_var']:,.0f}")
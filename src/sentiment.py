@@ -0,0 +1,208 @@
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentation import count, timed
+
+# Setup logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def analyze_sentiment(text):
+    """
+    Analyze sentiment of text using TextBlob.
+
+    :param text: Text to analyze
+    :return: Sentiment polarity (-1 to 1)
+    """
+    from textblob import TextBlob
+
+    blob = TextBlob(text)
+    return blob.sentiment.polarity
+
+def _score_chunk(texts):
+    return [analyze_sentiment(text) for text in texts]
+
+def text_key(text):
+    """
+    Stable hash used to cache scores by article text.
+
+    :param text: Article text
+    :return: 16-byte digest
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+class SentimentEngine:
+    """
+    Batch sentiment scorer with a score cache keyed by text hash.
+
+    A batch is deduplicated, cached scores are reused, and only unseen texts are scored;
+    large numbers of unseen texts are split into chunks and scored across worker processes.
+    """
+
+    def __init__(self, cache_size=100000, max_workers=None, parallel_threshold=2000, chunk_size=500):
+        """
+        :param cache_size: Maximum number of cached scores (least recently used are dropped)
+        :param max_workers: Worker processes for large batches, defaults to os.cpu_count()
+        :param parallel_threshold: Minimum number of unseen texts before using worker processes
+        :param chunk_size: Texts per worker task
+        """
+        self.cache_size = cache_size
+        self.max_workers = max_workers
+        self.parallel_threshold = parallel_threshold
+        self.chunk_size = chunk_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+        self.hits = 0
+        self.misses = 0
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def close(self):
+        """
+        Shut down the worker pool, if one was started.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _score_unseen(self, texts):
+        if len(texts) < self.parallel_threshold:
+            return _score_chunk(texts)
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        scores = []
+        for chunk_scores in self._get_pool().map(_score_chunk, chunks):
+            scores.extend(chunk_scores)
+        return scores
+
+    @timed("sentiment_score")
+    def score_texts(self, texts):
+        """
+        Score a whole list of texts at once.
+
+        :param texts: Iterable of strings; None or empty strings score 0
+        :return: float64 NumPy array of polarities aligned with texts
+        """
+        texts = list(texts)
+        scores = np.zeros(len(texts))
+        keys = [text_key(text) if text else None for text in texts]
+
+        unseen = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key is None:
+                    continue
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+                    scores[i] = cached
+                    self.hits += 1
+                elif key in unseen:
+                    unseen[key][1].append(i)
+                    self.hits += 1
+                else:
+                    unseen[key] = (texts[i], [i])
+                    self.misses += 1
+
+        count("sentiment_texts", len(texts))
+        count("sentiment_cache_misses", len(unseen))
+        if unseen:
+            new_scores = self._score_unseen([text for text, _ in unseen.values()])
+            with self._lock:
+                for (key, (_, positions)), score in zip(unseen.items(), new_scores):
+                    scores[positions] = score
+                    self._cache[key] = score
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def score(self, text):
+        """
+        Score a single text through the cache.
+
+        :param text: Text to analyze
+        :return: Sentiment polarity (-1 to 1)
+        """
+        return float(self.score_texts([text])[0])
+
+    def stats(self):
+        """
+        :return: Dictionary with cache hits, misses and size
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'cached': len(self._cache)}
+
+_default_engine = None
+_default_lock = threading.Lock()
+
+def get_default_engine():
+    """
+    Return the process-wide sentiment engine, creating it on first use.
+
+    :return: SentimentEngine
+    """
+    global _default_engine
+    with _default_lock:
+        if _default_engine is None:
+            _default_engine = SentimentEngine()
+    return _default_engine
+
+def synthetic_headlines(n, unique_ratio=0.3, seed=0):
+    """
+    Generate headline-like texts with a share of repeats, for benchmarking.
+
+    :return: List of strings
+    """
+    rng = np.random.default_rng(seed)
+    words = ["stock", "surges", "plunges", "strong", "weak", "earnings", "beat", "miss", "great", "terrible",
+             "guidance", "raised", "cut", "record", "revenue", "growth", "concerns", "optimistic", "bad", "good"]
+    n_unique = max(1, int(n * unique_ratio))
+    unique = [" ".join(rng.choice(words, size=10)) + f" #{i}" for i in range(n_unique)]
+    return [unique[i] for i in rng.integers(0, n_unique, size=n)]
+
+def benchmark(sizes=(1000, 10000), unique_ratio=0.3):
+    """
+    Compare the per-article TextBlob loop with the batch engine (cold and warm cache).
+
+    :return: List of result dictionaries, one per size
+    """
+    results = []
+    for n in sizes:
+        texts = synthetic_headlines(n, unique_ratio)
+        start = time.perf_counter()
+        baseline = [analyze_sentiment(text) for text in texts]
+        per_article = time.perf_counter() - start
+
+        engine = SentimentEngine(parallel_threshold=1000)
+        start = time.perf_counter()
+        batched = engine.score_texts(texts)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        engine.score_texts(texts)
+        warm = time.perf_counter() - start
+        engine.close()
+
+        results.append({
+            'texts': n,
+            'per_article_seconds': per_article,
+            'batch_cold_seconds': cold,
+            'batch_warm_seconds': warm,
+            'max_abs_diff': float(np.max(np.abs(batched - np.asarray(baseline)))),
+        })
+    return results
+
+# Example usage: benchmark against the per-article TextBlob path
+if __name__ == "__main__":
+    for row in benchmark():
+        print(f"{row['texts']:>6} texts: per-article {row['per_article_seconds']:.2f}s, "
+              f"batch cold {row['batch_cold_seconds']:.2f}s, warm {row['batch_warm_seconds']:.3f}s, "
+              f"max diff {row['max_abs_diff']:.1e}")
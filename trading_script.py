@@ -1,8 +1,11 @@
-import yfinance as yf
-import pandas as pd
-from datetime import datetime, timedelta
+import sys
+import asyncio
 import logging
 
+from instrumentation import instrument_run
+from price_fetcher import fetch_prices_batched
+from portfolio_valuation import PortfolioBook, valuation_totals, valuation_to_breakdown
+
 # Set up logging for better error tracking
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -13,68 +16,56 @@ portfolio = {
     "MSFT": {"shares": 20, "purchase_price": 250.00}
 }
 
-def get_prices(symbols, period="1d"):
+def get_prices(symbols, period="1d", transport=None, batch_size=50, max_workers=8, batch_timeout=30.0,
+               cache=None):
     """
     Retrieve the latest closing prices for given stock symbols.
 
+    Symbols are fetched in concurrent multi-ticker batches; a failing symbol or a
+    batch that exceeds its deadline only yields None for the affected symbols.
+
     :param symbols: List of stock symbols
     :param period: Time period for historical data, default is '1d'
+    :param transport: Optional callable (symbols, period) -> {symbol: price}, defaults to yfinance
+    :param batch_size: Number of symbols per multi-ticker request
+    :param max_workers: Maximum number of batches in flight at once
+    :param batch_timeout: Seconds a batch may take before its symbols are reported as None
+    :param cache: Optional ResponseCache, None uses the default cache and False disables caching
     :return: Dictionary with stock symbols as keys and their latest prices as values
     """
-    prices = {}
-    for symbol in symbols:
-        try:
-            data = yf.Ticker(symbol).history(period=period)
-            if not data.empty:
-                prices[symbol] = data["Close"].iloc[-1]
-            else:
-                logging.warning(f"No price data available for {symbol}")
-                prices[symbol] = None
-        except Exception as e:
-            logging.error(f"Error fetching data for {symbol}: {e}")
-            prices[symbol] = None
-    return prices
+    return fetch_prices_batched(symbols, period=period, transport=transport, batch_size=batch_size,
+                                max_workers=max_workers, batch_timeout=batch_timeout, cache=cache)
 
 def calculate_portfolio_value(prices, portfolio):
     """
     Calculate the current value of the portfolio.
 
-    :param prices: Dictionary of current stock prices
-    :param portfolio: Dictionary containing shares and purchase price for each stock
+    The valuation runs as one vectorized pass over a columnar PortfolioBook; holdings
+    without a price are excluded from the totals and reported as "N/A" in the breakdown.
+
+    :param prices: Dictionary (or Series) of current stock prices
+    :param portfolio: Dictionary containing shares and purchase price for each stock, or a PortfolioBook
     :return: Total portfolio value, gains, and detailed breakdown
     """
-    total_value = 0
-    gains = 0
-    breakdown = []
-    
-    for symbol, details in portfolio.items():
-        if prices[symbol] is not None:
-            current_value = details['shares'] * prices[symbol]
-            purchase_value = details['shares'] * details['purchase_price']
-            gain = current_value - purchase_value
-            gains += gain
-            total_value += current_value
-            breakdown.append({
-                'symbol': symbol,
-                'current_price': prices[symbol],
-                'shares': details['shares'],
-                'current_value': current_value,
-                'purchase_value': purchase_value,
-                'gain': gain,
-                'percentage_gain': (gain / purchase_value) * 100 if purchase_value != 0 else 0
-            })
-        else:
-            breakdown.append({
-                'symbol': symbol,
-                'current_price': "N/A",
-                'shares': details['shares'],
-                'current_value': "N/A",
-                'purchase_value': details['shares'] * details['purchase_price'],
-                'gain': "N/A",
-                'percentage_gain': "N/A"
-            })
-    
-    return total_value, gains, breakdown
+    book = portfolio if isinstance(portfolio, PortfolioBook) else PortfolioBook.from_dict(portfolio)
+    valuation = book.valuate(prices)
+    total_value, gains = valuation_totals(valuation)
+    return total_value, gains, valuation_to_breakdown(valuation)
+
+def calculate_portfolio_risk(close, symbols, portfolio, cash=0.0, **kwargs):
+    """
+    Risk of the portfolio over a price history: EW volatility, parametric and historical VaR, max drawdown.
+
+    :param close: Price matrix (bars x symbols), e.g. from backtester.load_market_data
+    :param symbols: Column symbols of close
+    :param portfolio: Dictionary containing shares and purchase price for each stock
+    :param cash: Uninvested cash
+    :param kwargs: Options for risk_engine.RiskEngine (decay, window, ...)
+    :return: Dictionary of risk numbers (see RiskEngine.report)
+    """
+    from risk_engine import portfolio_risk
+
+    return portfolio_risk(close, symbols, portfolio, cash, **kwargs)
 
 def display_portfolio(portfolio_breakdown, total_value, gains):
     """
@@ -97,23 +88,55 @@ def display_portfolio(portfolio_breakdown, total_value, gains):
     print(f"\nTotal Portfolio Value: ${total_value:.2f}")
     print(f"Total Gains: ${gains:.2f}")
 
-if __name__ == "__main__":
-    symbols = list(portfolio.keys())
-    current_prices = get_prices(symbols, period="1d")  # Fetching daily closing prices
-    total_value, gains, portfolio_breakdown = calculate_portfolio_value(current_prices, portfolio)
+def stream_portfolio(portfolio, feed=None, initial_prices=None, print_every=1.0):
+    """
+    Long-running mode: revalue the portfolio on every quote from a stream and print updates.
 
-    display_portfolio(portfolio_breakdown, total_value, gains)
+    :param portfolio: Dictionary containing shares and purchase price for each stock
+    :param feed: Async iterator of (symbol, price, timestamp) quotes, defaults to the local simulator
+    :param initial_prices: Starting prices, defaults to the latest closes from get_prices
+    :param print_every: Seconds between printed updates
+    :return: Streaming stats (tick counts and per-tick latency)
+    """
+    from quote_stream import StreamingPortfolio, simulated_quotes, print_updates
 
-    from earningsPredictionModel import earnings_prediction_model
+    if initial_prices is None:
+        initial_prices = get_prices(list(portfolio.keys()), period="1d")
+    priced = {symbol: price for symbol, price in initial_prices.items() if price is not None}
+    feed = feed if feed is not None else simulated_quotes(priced or {s: 100.0 for s in portfolio})
 
-from earningsPredictionModel import earnings_prediction_model
+    async def run():
+        stream = StreamingPortfolio(portfolio, priced)
+        printer = asyncio.create_task(print_updates(stream.subscribe(), every=print_every))
+        try:
+            await stream.run(feed)
+        finally:
+            await printer
+            logging.info(f"Streaming stats: {stream.stats()}")
+        return stream.stats()
+
+    return asyncio.run(run())
+
+if __name__ == "__main__" and "--stream" in sys.argv:
+    stream_portfolio(portfolio)
+elif __name__ == "__main__":
+    with instrument_run():
+        symbols = list(portfolio.keys())
+        current_prices = get_prices(symbols, period="1d")  # Fetching daily closing prices
+        total_value, gains, portfolio_breakdown = calculate_portfolio_value(current_prices, portfolio)
+
+        display_portfolio(portfolio_breakdown, total_value, gains)
 
 def main():
+    # Imported on use: the earnings model pulls in sklearn, which valuation and streaming do not need
+    from earningsPredictionModel import earnings_prediction_model
+
     symbol = 'AAPL'
     token = 'YOUR_API_TOKEN'
     api_url = 'https://cloud.iexapis.com/stable'
     
-    model = earnings_prediction_model(symbol, token, api_url)
+    with instrument_run():
+        model = earnings_prediction_model(symbol, token, api_url)
     if model:
         # Here you would use the model results in your trading logic
         print(f"Model created for {symbol}. You can now use this model for trading decisions.")